@@ -1,4 +1,5 @@
 import os
+import sys
 from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, StorageContext, Settings
 from llama_index.core.indices.vector_store import VectorIndexRetriever
 from llama_index.core.query_engine import RetrieverQueryEngine
@@ -8,7 +9,6 @@ from llama_index.vector_stores.pinecone import PineconeVectorStore
 from llama_index.llms.nvidia import NVIDIA
 from llama_index.core.node_parser import SentenceSplitter
 from dotenv import load_dotenv
-from transformers import GPT2Tokenizer
 from llama_index.core.query_pipeline import (
     QueryPipeline,
     InputComponent,
@@ -22,6 +22,11 @@ from llama_index.core.llms import ChatMessage
 from llama_index.core.query_pipeline import CustomQueryComponent
 from llama_index.core.schema import NodeWithScore
 
+# Make the server package importable so the offline scripts share its helpers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from app.services.embedding_cache import CachedEmbedding
+
 # Load environment variables
 load_dotenv()
 
@@ -33,22 +38,11 @@ pinecone_api_key = os.getenv("PINECONE_API_KEY")
 if not nvidia_api_key or not pinecone_api_key:
     raise EnvironmentError("NVIDIA or Pinecone API key not found. Check your .env file.")
 
-# Initialize tokenizer for text chunking
-tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
-
-
-# Function to truncate or split text into chunks of max 512 tokens
-def truncate_text(text, max_tokens=500):
-    tokens = tokenizer.tokenize(text)
-    if len(tokens) > max_tokens:
-        tokens = tokens[:max_tokens]
-    return tokenizer.convert_tokens_to_string(tokens)
-
 
 # Setup NVIDIA embedding and LLM with proper error handling
 try:
     Settings.text_splitter = SentenceSplitter(chunk_size=400)
-    Settings.embed_model = NVIDIAEmbedding(api_key=nvidia_api_key)
+    Settings.embed_model = CachedEmbedding(NVIDIAEmbedding(api_key=nvidia_api_key))
     Settings.llm = NVIDIA(model='meta/llama3-70b-instruct', api_key=nvidia_api_key)
 except Exception as e:
     print(f"Error setting up NVIDIA model: {str(e)}")
@@ -1,12 +1,31 @@
+import argparse
 import os
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, StorageContext, Settings
+import sys
+from llama_index.core import VectorStoreIndex, Settings
 from pinecone import Pinecone
 from llama_index.embeddings.nvidia import NVIDIAEmbedding
 from llama_index.vector_stores.pinecone import PineconeVectorStore
 from llama_index.llms.nvidia import NVIDIA
-from llama_index.core.node_parser import SentenceSplitter
 from dotenv import load_dotenv
-from transformers import GPT2Tokenizer
+
+# Make the server package importable so the offline scripts share its helpers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from app.db.index_paths import KEYWORD_INDEX_DIR, LOCAL_VECTOR_STORE_DIR, RAG_DATA_DIR, RAG_SOURCE_DIR
+from app.db.local_vector_store import LocalVectorStore
+from app.services.embedding_cache import CachedEmbedding
+from app.services.semantic_cache import bump_index_generation
+from app.utils.chunking import MarkdownChunker
+from ingestion import IngestionManifest, IngestionPipeline, build_keyword_index
+
+parser = argparse.ArgumentParser(
+    description="Populate the Aarogyam RAG index from the Markdown corpus in RAG_DATA_DIR/md",
+    epilog="Runs are incremental: a manifest records the vectors written for each file. An index populated "
+           "before the manifest existed holds vectors no run can match to their files, so the first run "
+           "against it must be --full, which empties the index and re-embeds the corpus.",
+)
+parser.add_argument("--full", action="store_true", help="Re-embed the whole corpus instead of only the changes")
+args = parser.parse_args()
 
 # Load environment variables
 load_dotenv()
@@ -15,60 +34,96 @@ load_dotenv()
 nvidia_api_key = os.getenv("NVIDIA_API_KEY")
 pinecone_api_key = os.getenv("PINECONE_API_KEY")
 
+# "pinecone" or "local", must match the server's VECTOR_STORE
+vector_store_type = os.getenv("VECTOR_STORE", "pinecone")
+
 # Check if API keys are correctly loaded
-if not nvidia_api_key or not pinecone_api_key:
+if not nvidia_api_key or (vector_store_type == "pinecone" and not pinecone_api_key):
     raise EnvironmentError("NVIDIA or Pinecone API key not found. Check your .env file.")
 
-# Initialize tokenizer for text chunking
-tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
-
-
-# Function to truncate or split text into chunks of max 512 tokens
-def truncate_text(text, max_tokens=500):
-    tokens = tokenizer.tokenize(text)
-    if len(tokens) > max_tokens:
-        tokens = tokens[:max_tokens]
-    return tokenizer.convert_tokens_to_string(tokens)
-
 
 # Setup NVIDIA embedding and LLM with proper error handling
 try:
-    Settings.text_splitter = SentenceSplitter(chunk_size=400)
-    Settings.embed_model = NVIDIAEmbedding(api_key=nvidia_api_key)
+    Settings.embed_model = CachedEmbedding(NVIDIAEmbedding(api_key=nvidia_api_key))
     Settings.llm = NVIDIA(model='meta/llama3-70b-instruct', api_key=nvidia_api_key)
 except Exception as e:
     print(f"Error setting up NVIDIA model: {str(e)}")
     exit(1)
 
 # Initialize Pinecone
-try:
-    pc = Pinecone(api_key=pinecone_api_key)
-    pinecone_index = pc.Index("aarogyam-chat-rag")
-except Exception as e:
-    print(f"Error initializing Pinecone: {str(e)}")
-    exit(1)
+if vector_store_type == "pinecone":
+    try:
+        pc = Pinecone(api_key=pinecone_api_key)
+        pinecone_index = pc.Index("aarogyam-chat-rag")
+    except Exception as e:
+        print(f"Error initializing Pinecone: {str(e)}")
+        exit(1)
 
-# Load documents and truncate text properly
-documents = SimpleDirectoryReader("../rag_data/md").load_data()
+# Set up the Vector Store
+if vector_store_type == "local":
+    if args.full or not os.path.exists(os.path.join(LOCAL_VECTOR_STORE_DIR, "nodes.jsonl")):
+        vector_store = LocalVectorStore(persist_dir=LOCAL_VECTOR_STORE_DIR)
+    else:
+        vector_store = LocalVectorStore.from_persist_dir(LOCAL_VECTOR_STORE_DIR, mmap=False)
+    index_size = len(vector_store)
+else:
+    vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
+    index_size = pinecone_index.describe_index_stats().total_vector_count
 
-# Modify the text content of document objects without breaking them
-for doc in documents:
-    doc.text = truncate_text(doc.text)  # Modify the document's text in place
+# The manifest remembers what is already in the vector store, one per store type
+manifest_path = os.getenv("INGESTION_MANIFEST", os.path.join(RAG_DATA_DIR, f"manifest_{vector_store_type}.json"))
+if not args.full and index_size and not os.path.exists(manifest_path):
+    # Nothing says which of these vectors belong to which file, an incremental run would leave them all in place
+    print(f"The index holds {index_size} vectors but there is no manifest at {manifest_path}. "
+          f"Run with --full to rebuild the index from scratch.")
+    exit(1)
 
-# Set up Pinecone Vector Store and Storage Context
-vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
-storage_context = StorageContext.from_defaults(vector_store=vector_store)
+manifest = IngestionManifest(manifest_path)
+if args.full or index_size == 0:
+    manifest.reset()
+    if vector_store_type == "pinecone" and args.full:
+        vector_store.clear()
 
-# Create Vector Store Index from processed documents
+# Embed and upsert only the new or changed chunks, delete the ones that disappeared
+pipeline = IngestionPipeline(
+    vector_store,
+    Settings.embed_model,
+    MarkdownChunker(),
+    embed_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "64")),
+    max_concurrency=int(os.getenv("EMBED_CONCURRENCY", "4")),
+    upsert_batch_size=int(os.getenv("UPSERT_BATCH_SIZE", "200")),
+    # The manifest (and a local store) are saved as files complete, and when the run fails
+    checkpoint_every=int(os.getenv("INGESTION_CHECKPOINT_FILES", "50")),
+    on_checkpoint=vector_store.persist if vector_store_type == "local" else None,
+)
 try:
-    index = VectorStoreIndex.from_documents(documents, storage_context=storage_context)
+    stats = pipeline.run(RAG_SOURCE_DIR, manifest)
 except Exception as e:
     print(f"Error creating index: {str(e)}")
+    print(f"Progress saved to {manifest.path}, re-run to resume.")
     exit(1)
 
-# Convert index to query engine
-query_engine = index.as_query_engine()
+if vector_store_type == "local":
+    print(f"Local vector store written to {LOCAL_VECTOR_STORE_DIR}")
+print(stats)
+
+changed = stats["chunks_embedded"] or stats["chunks_deleted"]
+if changed or args.full or not os.path.isdir(KEYWORD_INDEX_DIR):
+    keyword_index = build_keyword_index(RAG_SOURCE_DIR, MarkdownChunker())
+    keyword_index.persist(KEYWORD_INDEX_DIR)
+    print(f"Keyword index of {len(keyword_index)} chunks written to {KEYWORD_INDEX_DIR}")
+
+# Cached chat answers were generated from the previous index, so drop them
+if changed and os.getenv("MONGO_URI") and os.getenv("DB_NAME"):
+    from app.db.mongodb import get_db
+
+    bump_index_generation(get_db())
+    print("Semantic cache invalidated.")
+elif changed:
+    print("MONGO_URI or DB_NAME not set, semantic cache not invalidated.")
 
 # Example query
+index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
+query_engine = index.as_query_engine()
 response = query_engine.query("What is ayurveda?")
 print(response)
@@ -0,0 +1,103 @@
+import argparse
+import os
+import sys
+import time
+
+# Make the server package importable so the offline scripts share its helpers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from app.db.index_paths import RAG_SOURCE_DIR
+from app.utils.chunking import MarkdownChunker, split_sections
+from app.utils.tokenizer import count_tokens_batch
+from ingestion import list_source_files
+
+
+def load_corpus(data_dir):
+    texts = []
+    for rel_path in list_source_files(data_dir):
+        with open(os.path.join(data_dir, rel_path), encoding="utf-8") as file:
+            texts.append(file.read())
+    return texts
+
+
+def benchmark(texts, chunker, batch_size):
+    started_at = time.perf_counter()
+    chunks = []
+    for start in range(0, len(texts), batch_size):
+        chunks.extend(chunker.chunk_batch(texts[start:start + batch_size]))
+    return chunks, time.perf_counter() - started_at
+
+
+def coverage(texts, chunks):
+    """
+    The share of the section text (non-whitespace characters) found in at least one chunk.
+
+    Args:
+        texts (list): The documents.
+        chunks (list): One list of chunks per document, in document order.
+    """
+    covered = total = 0
+    for text, document_chunks in zip(texts, chunks):
+        remaining = iter(document_chunks)
+        chunk = next(remaining, None)
+        for _, body in split_sections(text)[1]:
+            mask = bytearray(len(body))
+            position = 0
+            # Chunks are slices of their section, in order, each starting after the previous one's start
+            while chunk is not None:
+                start = body.find(chunk["text"], position)
+                if start < 0:
+                    break
+                mask[start:start + len(chunk["text"])] = b"\x01" * len(chunk["text"])
+                position = start + 1
+                chunk = next(remaining, None)
+            total += sum(not char.isspace() for char in body)
+            covered += sum(1 for char, hit in zip(body, mask) if hit and not char.isspace())
+    return covered / max(total, 1)
+
+
+def benchmark_slow_tokenizer(texts):
+    # The GPT2Tokenizer pass the old truncate_text ran over every document
+    from transformers import GPT2Tokenizer
+
+    tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
+    started_at = time.perf_counter()
+    for text in texts:
+        tokenizer.tokenize(text)
+    return time.perf_counter() - started_at
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure chunking throughput over the Markdown corpus")
+    parser.add_argument("data_dir", nargs="?", default=RAG_SOURCE_DIR)
+    parser.add_argument("--batch-size", type=int, default=256, help="Documents per batch encode call")
+    parser.add_argument("--compare-slow", action="store_true", help="Also time the old GPT2Tokenizer pass")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.data_dir)
+    if not texts:
+        print(f"No Markdown files found in {args.data_dir}")
+        exit(1)
+
+    chunker = MarkdownChunker()
+    chunker.chunk(texts[0])  # Load the tokenizer outside of the timed run
+
+    chunks, elapsed = benchmark(texts, chunker, args.batch_size)
+
+    document_tokens = count_tokens_batch(texts)
+    total_tokens = sum(document_tokens)
+    truncated_tokens = sum(min(tokens, 500) for tokens in document_tokens)
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+
+    print(f"Documents:          {len(texts)}")
+    print(f"Chunks:             {sum(len(document_chunks) for document_chunks in chunks)}")
+    print(f"Corpus tokens:      {total_tokens}")
+    print(f"Chunking time:      {elapsed:.2f}s")
+    print(f"Throughput:         {len(texts) / elapsed:.1f} docs/s, {megabytes / elapsed:.2f} MB/s, "
+          f"{total_tokens / elapsed:.0f} tokens/s")
+    print(f"Coverage:           {100 * coverage(texts, chunks):.2f}% of section text "
+          f"(truncate_text kept {100 * truncated_tokens / max(total_tokens, 1):.1f}% of tokens)")
+
+    if args.compare_slow:
+        slow_elapsed = benchmark_slow_tokenizer(texts)
+        print(f"GPT2Tokenizer pass: {slow_elapsed:.2f}s ({slow_elapsed / elapsed:.1f}x the chunking time)")
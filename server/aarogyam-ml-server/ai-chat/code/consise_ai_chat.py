@@ -1,15 +1,19 @@
 import os
+import sys
 from llama_index.core import VectorStoreIndex, Settings
 from llama_index.core.indices.vector_store import VectorIndexRetriever
-from llama_index.core.query_engine import RetrieverQueryEngine
 from pinecone import Pinecone
 from llama_index.embeddings.nvidia import NVIDIAEmbedding
 from llama_index.vector_stores.pinecone import PineconeVectorStore
 from llama_index.llms.nvidia import NVIDIA
 from dotenv import load_dotenv
-from transformers import GPT2Tokenizer
 from llama_index.core.llms import ChatMessage
 
+# Make the server package importable so the offline scripts share its helpers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from app.services.embedding_cache import CachedEmbedding
+
 # Load environment variables
 load_dotenv()
 
@@ -21,20 +25,9 @@ pinecone_api_key = os.getenv("PINECONE_API_KEY")
 if not nvidia_api_key or not pinecone_api_key:
     raise EnvironmentError("NVIDIA or Pinecone API key not found. Check your .env file.")
 
-# Initialize tokenizer for text chunking
-tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
-
-
-# Function to truncate or split text into chunks of max 512 tokens
-def truncate_text(text, max_tokens=500):
-    tokens = tokenizer.tokenize(text)
-    if len(tokens) > max_tokens:
-        tokens = tokens[:max_tokens]
-    return tokenizer.convert_tokens_to_string(tokens)
-
 
 try:
-    Settings.embed_model = NVIDIAEmbedding(api_key=nvidia_api_key)
+    Settings.embed_model = CachedEmbedding(NVIDIAEmbedding(api_key=nvidia_api_key))
     Settings.llm = NVIDIA(model='meta/llama3-70b-instruct', api_key=nvidia_api_key)
 except Exception as e:
     print(f"Error setting up NVIDIA model: {str(e)}")
@@ -55,9 +48,6 @@ vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
 index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
 retriever = VectorIndexRetriever(index=index, similarity_top_k=5)
 
-# Create Query Engine
-query_engine = RetrieverQueryEngine(retriever=retriever)
-
 # Define the context prompt template
 DEFAULT_CONTEXT_PROMPT = """
 You are an expert in Ayurveda, providing answers based on the context provided. Below is some relevant context that might help:
@@ -77,8 +67,8 @@ If the context doesn't fully answer the question, provide additional information
 # Function to handle user input and generate response
 def chat_with_model(query):
     # Retrieve context nodes from the index
-    query_result = query_engine.query(query)
-    source_nodes = [node.get_content() for node in query_result.source_nodes]
+    nodes = retriever.retrieve(query)
+    source_nodes = [node.get_content() for node in nodes]
 
     # Format context from retrieved nodes
     node_context = "\n".join([f"Context Chunk {i + 1}: {content}" for i, content in enumerate(source_nodes)])
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from llama_index.core.schema import MetadataMode, NodeRelationship, RelatedNodeInfo, TextNode
+
+from app.db.keyword_index import KeywordIndex
+from app.services.upstream import is_transient
+from app.utils.tokenizer import count_tokens
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(rel_path, section, text):
+    # Deterministic: the same chunk of the same file always maps to the same vector id
+    return hashlib.sha256(f"{rel_path}\0{section}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+class IngestionManifest:
+    def __init__(self, path):
+        """
+        Records, per source file, its content hash and the vector ids of its chunks, so a re-run
+        only embeds what changed since the last successful ingestion.
+
+        Args:
+            path (str): The JSON file the manifest is stored in.
+        """
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.files = json.load(file).get("files", {})
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"files": self.files}, file)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.files = {}
+
+
+def list_source_files(data_dir, extensions=(".md",)):
+    """
+    Returns the paths of the corpus files relative to data_dir, sorted for stable runs.
+    """
+    paths = []
+    for root, _, names in os.walk(data_dir):
+        for name in names:
+            if name.endswith(extensions):
+                paths.append(os.path.relpath(os.path.join(root, name), data_dir))
+    return sorted(paths)
+
+
+def build_nodes(rel_path, text, chunker):
+    """
+    Splits one file into TextNodes whose ids are derived from their content.
+
+    Args:
+        rel_path (str): The file path relative to the corpus directory, used as the ref doc id.
+        text (str): The file content.
+        chunker (MarkdownChunker): Splits the text into chunks with their heading metadata.
+
+    Returns:
+        list: The TextNodes of the file, without embeddings.
+    """
+    nodes = []
+    for chunk in chunker.chunk(text):
+        node = TextNode(
+            id_=chunk_id(rel_path, chunk["metadata"]["section"], chunk["text"]),
+            text=chunk["text"],
+            metadata={"file_path": rel_path, "file_name": os.path.basename(rel_path), **chunk["metadata"]},
+            excluded_embed_metadata_keys=["file_path"],
+            excluded_llm_metadata_keys=["file_path"],
+        )
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=rel_path)
+        nodes.append(node)
+
+    # A file can repeat a chunk verbatim, keep one copy
+    return list({node.node_id: node for node in nodes}.values())
+
+
+def build_keyword_index(data_dir, chunker):
+    """
+    Builds the BM25 index over the whole corpus. Chunking is cheap next to embedding, so the index
+    is rebuilt from scratch, with the same chunks and node ids as the vector store.
+    """
+    nodes = []
+    for rel_path in list_source_files(data_dir):
+        with open(os.path.join(data_dir, rel_path), encoding="utf-8") as file:
+            nodes.extend(build_nodes(rel_path, file.read(), chunker))
+    return KeywordIndex.from_nodes(nodes)
+
+
+def with_retry(func, *args, max_retries=5, backoff=1.0):
+    """
+    Calls func, retrying with jittered exponential backoff when it fails transiently (connection
+    errors, timeouts, overload statuses). Any other error is raised right away.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt == max_retries or not is_transient(e):
+                raise
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            print(f"{getattr(func, '__name__', 'call')} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class IngestionPipeline:
+    def __init__(self, vector_store, embed_model, chunker, embed_batch_size=64,
+                 max_concurrency=4, upsert_batch_size=200, max_retries=5, backoff=1.0,
+                 count_tokens=count_tokens, checkpoint_every=50, on_checkpoint=None):
+        """
+        Streaming ingestion: files are read and chunked lazily, new chunks are embedded in batches
+        by a bounded pool of concurrent requests, and embedded chunks are upserted in large batches.
+
+        Args:
+            vector_store (BasePydanticVectorStore): The vector store to update.
+            embed_model (BaseEmbedding): Embeds the new chunks.
+            chunker (MarkdownChunker): Splits files into chunks.
+            embed_batch_size (int): Chunks per embedding request.
+            max_concurrency (int): Embedding requests in flight at once.
+            upsert_batch_size (int): Chunks per vector store upsert.
+            max_retries (int): Retries for a failed embedding or upsert call.
+            backoff (float): Base delay in seconds between retries.
+            count_tokens (callable): Counts the tokens of a chunk for the throughput report.
+            checkpoint_every (int): Completed files between two saves of the manifest.
+            on_checkpoint (callable, optional): Called before each manifest save, e.g. to persist a
+                local vector store, so the manifest never lists chunks the store has not written.
+        """
+        self.vector_store = vector_store
+        self.embed_model = embed_model
+        self.chunker = chunker
+        self.embed_batch_size = embed_batch_size
+        self.max_concurrency = max_concurrency
+        self.upsert_batch_size = upsert_batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.count_tokens = count_tokens
+        self.checkpoint_every = checkpoint_every
+        self.on_checkpoint = on_checkpoint
+        self._files_since_checkpoint = 0
+
+    def plan(self, data_dir, manifest, stats):
+        """
+        Lazily yields one plan per new or changed file: its hash, the chunks to embed, the
+        chunks already in the store and the stale vector ids to delete.
+        """
+        current_files = list_source_files(data_dir)
+
+        for rel_path in current_files:
+            digest = file_hash(os.path.join(data_dir, rel_path))
+            previous = manifest.files.get(rel_path)
+            if previous is not None and previous["hash"] == digest:
+                stats["files_unchanged"] += 1
+                continue
+
+            with open(os.path.join(data_dir, rel_path), encoding="utf-8") as file:
+                nodes = build_nodes(rel_path, file.read(), self.chunker)
+
+            old_chunks = previous["chunks"] if previous else {}
+            kept = {node.node_id: old_chunks[node.node_id] for node in nodes if node.node_id in old_chunks}
+            yield {
+                "rel_path": rel_path,
+                "hash": digest,
+                "new_nodes": [node for node in nodes if node.node_id not in old_chunks],
+                "kept": kept,
+                "stale": [vector_id for node_id, vector_id in old_chunks.items() if node_id not in kept],
+            }
+
+        for rel_path in set(manifest.files) - set(current_files):
+            yield {"rel_path": rel_path, "hash": None, "new_nodes": [], "kept": {},
+                   "stale": list(manifest.files[rel_path]["chunks"].values())}
+
+    def run(self, data_dir, manifest):
+        """
+        Brings the vector store in line with the corpus directory, updating the manifest file by
+        file as each one is fully upserted. The manifest is saved every checkpoint_every files and
+        when the run ends, successfully or not, so a failed run is resumed where it stopped.
+
+        Returns:
+            dict: File and chunk counts plus the chunks/s and tokens/s throughput.
+        """
+        stats = {"files_unchanged": 0, "files_updated": 0, "files_deleted": 0, "chunks_embedded": 0,
+                 "chunks_kept": 0, "chunks_deleted": 0, "tokens_embedded": 0}
+        started_at = time.perf_counter()
+
+        pending_files = {}  # rel_path -> [plan, chunks not yet upserted]
+        batch, in_flight, to_upsert = [], set(), []
+        self._files_since_checkpoint = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                for plan in self.plan(data_dir, manifest, stats):
+                    pending_files[plan["rel_path"]] = [plan, len(plan["new_nodes"])]
+                    if not plan["new_nodes"]:
+                        self._complete_file(plan, manifest, stats)
+                        del pending_files[plan["rel_path"]]
+
+                    for node in plan["new_nodes"]:
+                        batch.append(node)
+                        if len(batch) >= self.embed_batch_size:
+                            in_flight.add(executor.submit(self._embed, batch))
+                            batch = []
+
+                        # Bounded concurrency: wait for a batch to finish before reading further
+                        while len(in_flight) >= self.max_concurrency:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            self._collect(done, to_upsert, pending_files, manifest, stats)
+
+                if batch:
+                    in_flight.add(executor.submit(self._embed, batch))
+                while in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._collect(done, to_upsert, pending_files, manifest, stats)
+
+            self._upsert(to_upsert, pending_files, manifest, stats)
+        finally:
+            # Files only enter the manifest once complete, a half-upserted one is redone next run
+            self.checkpoint(manifest)
+
+        elapsed = time.perf_counter() - started_at
+        stats["seconds"] = round(elapsed, 2)
+        stats["chunks_per_second"] = round(stats["chunks_embedded"] / elapsed, 1) if elapsed else 0.0
+        stats["tokens_per_second"] = round(stats["tokens_embedded"] / elapsed, 1) if elapsed else 0.0
+        return stats
+
+    def checkpoint(self, manifest):
+        # The store first: the manifest must never list chunks the store has not written
+        if self.on_checkpoint is not None:
+            self.on_checkpoint()
+        manifest.save()
+        self._files_since_checkpoint = 0
+
+    def _embed(self, nodes):
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = with_retry(self.embed_model.get_text_embedding_batch, texts,
+                                max_retries=self.max_retries, backoff=self.backoff)
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        return nodes, sum(self.count_tokens(text) for text in texts)
+
+    def _collect(self, done, to_upsert, pending_files, manifest, stats):
+        for future in done:
+            nodes, tokens = future.result()
+            to_upsert.extend(nodes)
+            stats["tokens_embedded"] += tokens
+
+        while len(to_upsert) >= self.upsert_batch_size:
+            self._upsert(to_upsert[:self.upsert_batch_size], pending_files, manifest, stats)
+            del to_upsert[:self.upsert_batch_size]
+
+    def _upsert(self, nodes, pending_files, manifest, stats):
+        if not nodes:
+            return
+        vector_ids = with_retry(self.vector_store.add, nodes, max_retries=self.max_retries, backoff=self.backoff)
+        stats["chunks_embedded"] += len(nodes)
+
+        for node, vector_id in zip(nodes, vector_ids):
+            rel_path = node.metadata["file_path"]
+            entry = pending_files[rel_path]
+            entry[0]["kept"][node.node_id] = vector_id
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._complete_file(entry[0], manifest, stats)
+                del pending_files[rel_path]
+
+    def _complete_file(self, plan, manifest, stats):
+        # Every new chunk of the file is in the store, the old ones can go
+        if plan["stale"]:
+            with_retry(self.vector_store.delete_nodes, plan["stale"], max_retries=self.max_retries,
+                       backoff=self.backoff)
+        stats["chunks_deleted"] += len(plan["stale"])
+
+        if plan["hash"] is None:
+            manifest.files.pop(plan["rel_path"], None)
+            stats["files_deleted"] += 1
+        else:
+            stats["chunks_kept"] += len(plan["kept"]) - len(plan["new_nodes"])
+            manifest.files[plan["rel_path"]] = {"hash": plan["hash"], "chunks": plan["kept"]}
+            stats["files_updated"] += 1
+
+        self._files_since_checkpoint += 1
+        if self._files_since_checkpoint >= self.checkpoint_every:
+            self.checkpoint(manifest)
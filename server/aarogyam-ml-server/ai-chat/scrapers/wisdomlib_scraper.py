@@ -1,104 +1,418 @@
+import asyncio
+import json
 import os
+import random
+import re
+import time
 import uuid
+from urllib.parse import urljoin, urlparse
 
-import requests
+import httpx
 from bs4 import BeautifulSoup
-import re
+
+try:
+    from lxml import html as lxml_html
+    from lxml.etree import ParserError, XPath
+except ImportError:
+    lxml_html = None
+
+CHECKPOINT_FILE = ".scrape_checkpoint.json"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+USER_AGENT = "AarogyamScraper/1.0 (+https://github.com/aarogyam)"
+
+HEADING_CLASS = 'h2 pt-2'
+BREADCRUMB_CLASS = 'col col-sm px-2 text-center order-2 order-sm-2'
+NEXT_CLASS = 'col-auto col-sm-auto order-3 order-sm-3'
+# Verse numbers in front of a paragraph ("12. ", "3) "), then fractions and superscripts left behind
+VERSE_NUMBER = re.compile(r'^\d+[\.\-\)\(\:\;\,\!\?\s]*')
+VERSE_NUMBER_MARKS = re.compile(r'^\d+[\.\-\)\(\:\;\,\!\?\s¹²³¼½¾]*')
+
+if lxml_html is not None:
+    # BeautifulSoup's get_text() leaves out the strings of these elements, so does the lxml path
+    _TEXT_EXCLUDED = "ancestor::script or ancestor::style or ancestor::template or ancestor::rt or ancestor::rp"
+    _TEXT_NODES = XPath(f".//text()[not({_TEXT_EXCLUDED})]")
+    _HEADING = XPath(f"//h1[normalize-space(@class)='{HEADING_CLASS}']")
+    _CONTENT = XPath("//div[@id='scontent']")
+    _CONTENT_BLOCKS = XPath(".//*[self::p or self::h2]")
+    _BREADCRUMB = XPath(f"//nav[normalize-space(@class)='{BREADCRUMB_CLASS}']")
+    _NEXT = XPath(f"//div[normalize-space(@class)='{NEXT_CLASS}']")
+    _FIRST_SPAN = XPath("(.//span)[1]")
+    _FIRST_LINK = XPath("(.//a[@href])[1]/@href")
+    _LINKS = XPath("//a/@href")
+
+
+def clean_paragraph(text):
+    # Remove any additional formatting issues
+    return VERSE_NUMBER_MARKS.sub('', VERSE_NUMBER.sub('', text))
+
+
+def to_markdown(heading, content):
+    # The file saved for a chapter
+    return f"# {heading}\n\n{content or ''}"
+
+
+def parse_page(html, parser=None):
+    """
+    Extracts the chapter text and navigation links from a wisdomlib page.
+
+    Args:
+        html (bytes): The page HTML.
+        parser (str): "lxml" or "html.parser" (BeautifulSoup). Defaults to lxml when it is installed.
+
+    Returns:
+        dict: heading, content (Markdown), parent_text, next_href and toc_href (None when missing).
+    """
+    if parser is None:
+        parser = "lxml" if lxml_html is not None else "html.parser"
+    if parser == "lxml":
+        return _parse_page_lxml(html)
+    return _parse_page_soup(html)
+
+
+def _parse_page_soup(html):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract the heading
+    heading = soup.find('h1', class_=HEADING_CLASS)
+    heading = heading.text.strip() if heading else None
+
+    # Extract the actual data
+    content_div = soup.find('div', id='scontent')
+    content = None
+    if content_div:
+        parts = []
+        for tag in content_div.find_all(['p', 'h2']):
+            # Convert headings to Markdown headers
+            if tag.name == 'h2':
+                parts.append(f"## {tag.get_text(strip=True)}")
+            else:
+                parts.append(clean_paragraph(tag.get_text(strip=True)))
+
+        # Join the content to preserve formatting
+        content = "\n\n".join(parts)
+
+    # The breadcrumb names the part of the book and links to its table of contents
+    parent_text, toc_href = '', None
+    breadcrumb = soup.find('nav', class_=BREADCRUMB_CLASS)
+    if breadcrumb:
+        parent_text_tag = breadcrumb.find('span')
+        parent_text = parent_text_tag.get_text(strip=True) if parent_text_tag else ''
+        toc_link = breadcrumb.find('a', href=True)
+        toc_href = toc_link['href'] if toc_link else None
+
+    next_href = None
+    next_div = soup.find('div', class_=NEXT_CLASS)
+    if next_div:
+        next_link = next_div.find('a', href=True)
+        next_href = next_link['href'] if next_link else None
+
+    return {"heading": heading, "content": content, "parent_text": parent_text, "next_href": next_href,
+            "toc_href": toc_href}
+
+
+def _text(element, strip=False):
+    # Same strings as BeautifulSoup's .text / get_text(strip=True)
+    if strip:
+        return "".join(text.strip() for text in _TEXT_NODES(element))
+    return "".join(_TEXT_NODES(element))
+
+
+def _parse_tree(html):
+    if isinstance(html, bytes):
+        try:
+            html = html.decode("utf-8")
+        except UnicodeDecodeError:
+            # Let libxml2 go by the page's declared charset
+            pass
+    try:
+        return lxml_html.document_fromstring(html)
+    except ParserError:
+        # Empty document
+        return lxml_html.document_fromstring("<html></html>")
+
+
+def _parse_page_lxml(html):
+    # libxml2 builds the tree in C, the XPath queries only visit the few elements that are used
+    tree = _parse_tree(html)
+
+    headings = _HEADING(tree)
+    heading = _text(headings[0]).strip() if headings else None
+
+    content = None
+    content_divs = _CONTENT(tree)
+    if content_divs:
+        parts = []
+        for tag in _CONTENT_BLOCKS(content_divs[0]):
+            if tag.tag == 'h2':
+                parts.append(f"## {_text(tag, strip=True)}")
+            else:
+                parts.append(clean_paragraph(_text(tag, strip=True)))
+        content = "\n\n".join(parts)
+
+    parent_text, toc_href = '', None
+    breadcrumbs = _BREADCRUMB(tree)
+    if breadcrumbs:
+        spans = _FIRST_SPAN(breadcrumbs[0])
+        parent_text = _text(spans[0], strip=True) if spans else ''
+        toc_links = _FIRST_LINK(breadcrumbs[0])
+        toc_href = str(toc_links[0]) if toc_links else None
+
+    next_href = None
+    next_divs = _NEXT(tree)
+    if next_divs:
+        next_links = _FIRST_LINK(next_divs[0])
+        next_href = str(next_links[0]) if next_links else None
+
+    return {"heading": heading, "content": content, "parent_text": parent_text, "next_href": next_href,
+            "toc_href": toc_href}
+
+
+def parse_toc_links(html, book_prefix):
+    """
+    Returns the chapter links of a table of contents page, in page order.
+    """
+    if lxml_html is not None:
+        hrefs = (str(href) for href in _LINKS(_parse_tree(html)))
+    else:
+        hrefs = (a['href'] for a in BeautifulSoup(html, 'html.parser').find_all('a', href=True))
+    pattern = re.compile(rf"^{re.escape(book_prefix)}/d/doc\d+\.html$")
+    return list(dict.fromkeys(href for href in hrefs if pattern.match(href)))
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        """
+        Spaces request starts at least 1 / rate seconds apart, across all workers.
+        """
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
 
 
 class WisdomLibScraper:
-    def __init__(self, start_url, save_dir):
+    def __init__(self, start_url, save_dir, base_url="https://www.wisdomlib.org", concurrency=4, rate=2.0,
+                 max_retries=4, backoff=1.0, timeout=30.0, refresh=False):
         """
         Initializes the WisdomLibScraper with the base URL, starting URL, and directory to save files.
 
         Args:
             start_url (str): The starting URL for scraping.
             save_dir (str): The directory where the scraped content will be saved.
+            base_url (str): The site to scrape, overridable to point at a local fixture server.
+            concurrency (int): Pages fetched at once.
+            rate (float): The maximum number of requests started per second.
+            max_retries (int): Retries for a failed request before the page is recorded as failed.
+            backoff (float): Base delay in seconds between retries.
+            timeout (float): Seconds before a request is abandoned.
+            refresh (bool): Revalidate pages saved by an earlier run (conditional requests) instead of skipping them.
         """
-        self.base_url = "https://www.wisdomlib.org"
+        self.base_url = base_url
         self.start_url = f"{self.base_url}{start_url}"
         self.save_dir = save_dir
+        self.concurrency = concurrency
+        self.rate = rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.refresh = refresh
+        self.checkpoint_path = os.path.join(save_dir, CHECKPOINT_FILE)
+        # "/hinduism/book/<book>" of the start page, chapter links of other books are ignored
+        self.book_prefix = urlparse(self.start_url).path.split("/d/")[0]
         os.makedirs(self.save_dir, exist_ok=True)
 
+        self.pages = {}
+        # Start URL -> the chapter URLs read from its table of contents
+        self.discovered = {}
+        self.failed = {}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as file:
+                checkpoint = json.load(file)
+            self.pages = checkpoint.get("pages", {})
+            self.discovered = checkpoint.get("discovered", {})
+
+    def scrape(self):
+        """
+        Scrapes every chapter from the initial URL onwards, resuming from the checkpoint of an
+        earlier run.
+        """
+        return asyncio.run(self.ascrape())
+
     def scrape_page(self, url):
         """
         Scrapes a single page and saves the content to a file.
 
-        Args:
-            url (str): The URL of the page to scrape.
-
         Returns:
             str or None: The URL of the next page to scrape, or None if there is no next page.
         """
-        try:
-            response = requests.get(url)
-            response.raise_for_status()  # Raise HTTPError for bad responses
-        except requests.RequestException as e:
-            print(f"Error fetching {url}: {e}")
+        async def run():
+            async with self._client() as client:
+                return await self._scrape_page(client, RateLimiter(self.rate), url)
+
+        return asyncio.run(run())
+
+    async def ascrape(self):
+        started_at = time.perf_counter()
+        limiter = RateLimiter(self.rate)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._client() as client:
+            seeds, start_response = await self._discover(client, limiter)
+            print(f"Discovered {len(seeds)} pages")
+
+            seen = set(seeds)
+            pending = set()
+
+            async def crawl(url):
+                # The start page was already downloaded to find the table of contents
+                response = start_response if url == self.start_url else None
+                async with semaphore:
+                    next_url = await self._scrape_page(client, limiter, url, response=response)
+                # The table of contents may miss pages, the "next" chain fills the gaps
+                if next_url and next_url not in seen:
+                    seen.add(next_url)
+                    pending.add(asyncio.ensure_future(crawl(next_url)))
+
+            pending.update(asyncio.ensure_future(crawl(url)) for url in seeds)
+            try:
+                while pending:
+                    done = [task for task in pending if task.done()]
+                    pending.difference_update(done)
+                    for task in done:
+                        task.result()
+                    if pending:
+                        await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        self._save_checkpoint()
+            finally:
+                self._save_checkpoint()
+
+        elapsed = time.perf_counter() - started_at
+        print(f"Scraped {len(seen) - len(self.failed)} pages in {elapsed:.1f}s, {len(self.failed)} failed")
+        for url, error in self.failed.items():
+            print(f"Failed: {url} ({error})")
+        return {"pages": len(seen), "failed": len(self.failed), "seconds": round(elapsed, 2)}
+
+    def _client(self):
+        # One pooled session for the whole crawl, connections are reused between pages
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        return httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT})
+
+    async def _discover(self, client, limiter):
+        """
+        Finds the chapter URLs from the start page onwards, in book order, read from the table of
+        contents linked by the start page. Falls back to the start page alone. A resumed run
+        reuses the URLs found by the earlier one, unless refreshing.
+
+        Returns:
+            tuple: The URLs, and the start page's response (None if it was not downloaded).
+        """
+        if self.start_url in self.discovered and not self.refresh:
+            return self.discovered[self.start_url], None
+
+        response = await self._fetch(client, limiter, self.start_url)
+        if response is None:
+            return [self.start_url], None
+        toc_href = parse_page(response.content)["toc_href"]
+        if not toc_href:
+            self.discovered[self.start_url] = [self.start_url]
+            return [self.start_url], response
+
+        toc_response = await self._fetch(client, limiter, urljoin(self.start_url, toc_href))
+        if toc_response is None:
+            # Not remembered, the next run tries the table of contents again
+            return [self.start_url], response
+
+        urls = [urljoin(self.base_url, href) for href in parse_toc_links(toc_response.content, self.book_prefix)]
+        urls = urls[urls.index(self.start_url):] if self.start_url in urls else [self.start_url]
+        self.discovered[self.start_url] = urls
+        return urls, response
+
+    async def _fetch(self, client, limiter, url, headers=None):
+        for attempt in range(self.max_retries + 1):
+            await limiter.wait()
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code != 304:
+                        response.raise_for_status()  # Raise HTTPError for bad responses
+                    return response
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            except httpx.HTTPStatusError as e:
+                # Client errors will not get better with a retry
+                self.failed[url] = str(e)
+                return None
+            except httpx.TransportError as e:
+                error, retry_after = str(e) or type(e).__name__, None
+
+            if attempt == self.max_retries:
+                self.failed[url] = error
+                print(f"Error fetching {url}: {error}")
+                return None
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else \
+                self.backoff * (2 ** attempt) * (0.5 + random.random())
+            await asyncio.sleep(delay)
+
+    async def _scrape_page(self, client, limiter, url, response=None):
+        previous = self.pages.get(url)
+        if previous and not self.refresh:
+            # Saved by an earlier run
+            return previous.get("next_url")
+
+        if response is None:
+            headers = {}
+            if previous and previous.get("etag"):
+                headers["If-None-Match"] = previous["etag"]
+            if previous and previous.get("last_modified"):
+                headers["If-Modified-Since"] = previous["last_modified"]
+            response = await self._fetch(client, limiter, url, headers=headers)
+        if response is None:
             return None
+        if response.status_code == 304:
+            # Unchanged since the last run, the saved file is current
+            return previous.get("next_url")
+
+        # Parsing is CPU work, keep it off the event loop while other pages download
+        page = await asyncio.get_running_loop().run_in_executor(None, parse_page, response.content)
+        if page["content"] is None:
+            print(f"Content div not found: {url}")
+        next_url = urljoin(url, page["next_href"]) if page["next_href"] else None
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Extract the heading
-        heading = soup.find('h1', class_='h2 pt-2')
-        if heading:
-            heading = heading.text.strip()
-        else:
-            print("Heading not found.")
-            heading = uuid.uuid4()
-
-        # Extract the actual data
-        # content_div = soup.find('div', class_='col-12 mt-3 mb-5 chapter-content')
-        content_div = soup.find('div', id='scontent')
-
-        if content_div:
-            content = []
-            for tag in content_div.find_all(['p', 'h2']):
-                # Convert headings to Markdown headers
-                if tag.name == 'h2':
-                    content.append(f"## {tag.get_text(strip=True)}")
-                else:
-                    # Remove any additional formatting issues
-                    content.append(re.sub(r'^\d+[\.\-\)\(\:\;\,\!\?\s\u00B9\u00B2\u00B3\u00BC\u00BD\u00BE]*', '',
-                                          re.sub(r'^\d+[\.\-\)\(\:\;\,\!\?\s]*', '', tag.get_text(strip=True))))
-
-            # Join the content to preserve formatting
-            joined_content = "\n\n".join(content)
-        else:
-            print("Content div not found.")
-            joined_content = ""
+        heading = page["heading"]
+        if heading is None:
+            print(f"Heading not found: {url}")
+            heading = str(uuid.uuid4())
 
         # Create a file name from the heading
         file_name = heading.replace(' ', '_').replace('-', '_').replace('/', '_').lower() + '.md'
 
-        try:
-            parent_text_tag = soup.find('nav', class_='col col-sm px-2 text-center order-2 order-sm-2').find('span')
-            parent_text = parent_text_tag.get_text(strip=True) if parent_text_tag else ''
-        except:
-            parent_text = ''
-
         # Create full path for the file
-        dir_save = os.path.join(self.save_dir, parent_text)
-
+        dir_save = os.path.join(self.save_dir, page["parent_text"])
         os.makedirs(dir_save, exist_ok=True)
         file_path = os.path.join(dir_save, file_name)
         # Save the content to a file
         with open(file_path, 'w', encoding='utf-8') as file:
-            file.write(f"# {heading}\n\n{joined_content}")
+            file.write(to_markdown(heading, page["content"]))
 
         print(f"Saved: {file_name}")
+        self.pages[url] = {
+            "file": os.path.relpath(file_path, self.save_dir),
+            "next_url": next_url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        return next_url
 
-        # Find the next page URL
-        next_link = soup.find('div', class_='col-auto col-sm-auto order-3 order-sm-3').find('a')
-        if next_link:
-            next_url = self.base_url + next_link['href']
-            return next_url
-        return None
-
-    def scrape(self):
-        """
-        Starts scraping from the initial URL and follows pagination.
-        """
-        url = self.start_url
-        while url:
-            url = self.scrape_page(url)
+    def _save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"pages": self.pages, "discovered": self.discovered}, file)
+        os.replace(tmp_path, self.checkpoint_path)
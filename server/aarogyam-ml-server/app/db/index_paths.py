@@ -0,0 +1,14 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Where ai-chat/code/ai_chat_populate.py writes the indexes the server reads, by default ai-chat/rag_data
+# next to the app package whatever the working directory of either process
+RAG_DATA_DIR = os.getenv("RAG_DATA_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "ai-chat", "rag_data"))
+# The Markdown corpus
+RAG_SOURCE_DIR = os.path.join(RAG_DATA_DIR, "md")
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", os.path.join(RAG_DATA_DIR, "vector_store"))
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", os.path.join(RAG_DATA_DIR, "keyword_index"))
@@ -0,0 +1,175 @@
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+from llama_index.core.schema import MetadataMode, NodeWithScore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+POSTINGS_FILE = "postings.npz"
+VOCABULARY_FILE = "vocabulary.json"
+NODES_FILE = "nodes.jsonl"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Latin diacritics: "harītakī" and "haritaki" are the same term
+DIACRITICS = re.compile("[\u0300-\u036f]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i in is it its my of on or that the their this to "
+    "was what when where which who why will with".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercased word tokens with Latin diacritics folded and English stopwords dropped.
+    """
+    text = DIACRITICS.sub("", unicodedata.normalize("NFKD", text.lower()))
+    return [token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS]
+
+
+class KeywordIndex:
+    """
+    BM25 over the corpus chunks, for the exact terms (dosha and herb names) that embeddings
+    handle poorly. Postings are stored CSR-style in flat arrays: the documents of term t are
+    doc_ids[offsets[t]:offsets[t + 1]], with their term frequencies at the same positions, so a
+    query is a few array slices and a vectorised score update per query term.
+    """
+
+    def __init__(self, vocabulary, offsets, doc_ids, term_freqs, doc_lengths, node_dicts, k1=1.2, b=0.75):
+        self.term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.node_dicts = node_dicts
+        self.k1 = k1
+        self.b = b
+
+        self.doc_count = len(doc_lengths)
+        average_length = float(doc_lengths.mean()) if self.doc_count else 0.0
+        # The document length part of the BM25 denominator, fixed once the index is built
+        self._length_norms = (k1 * (1 - b + b * doc_lengths / max(average_length, 1.0))).astype(np.float32)
+
+    @classmethod
+    def from_nodes(cls, nodes, **kwargs):
+        """
+        Builds the index over the text and embedded metadata (title, section) of the nodes.
+
+        Args:
+            nodes (list): The TextNodes of the corpus.
+
+        Returns:
+            KeywordIndex: The index.
+        """
+        postings = {}
+        doc_lengths = np.zeros(len(nodes), dtype=np.int32)
+        for doc_id, node in enumerate(nodes):
+            tokens = tokenize(node.get_content(metadata_mode=MetadataMode.EMBED))
+            doc_lengths[doc_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in vocabulary])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        term_freqs = np.empty(offsets[-1], dtype=np.uint16)
+        for term_id, term in enumerate(vocabulary):
+            entries = np.array(postings[term], dtype=np.int64).reshape(-1, 2)
+            doc_ids[offsets[term_id]:offsets[term_id + 1]] = entries[:, 0]
+            term_freqs[offsets[term_id]:offsets[term_id + 1]] = np.minimum(entries[:, 1], np.iinfo(np.uint16).max)
+
+        node_dicts = [{"id": node.node_id,
+                       "metadata": node_to_metadata_dict(node, remove_text=False, flat_metadata=False)}
+                      for node in nodes]
+        return cls(vocabulary, offsets, doc_ids, term_freqs, doc_lengths, node_dicts, **kwargs)
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir, **kwargs):
+        """
+        Loads an index written by ``persist``.
+        """
+        with np.load(os.path.join(persist_dir, POSTINGS_FILE)) as arrays:
+            offsets, doc_ids = arrays["offsets"], arrays["doc_ids"]
+            term_freqs, doc_lengths = arrays["term_freqs"], arrays["doc_lengths"]
+        with open(os.path.join(persist_dir, VOCABULARY_FILE), encoding="utf-8") as file:
+            vocabulary = json.load(file)
+        with open(os.path.join(persist_dir, NODES_FILE), encoding="utf-8") as file:
+            node_dicts = [json.loads(line) for line in file]
+        return cls(vocabulary, offsets, doc_ids, term_freqs, doc_lengths, node_dicts, **kwargs)
+
+    def __len__(self):
+        return self.doc_count
+
+    def persist(self, persist_dir):
+        os.makedirs(persist_dir, exist_ok=True)
+        vocabulary = sorted(self.term_ids, key=self.term_ids.get)
+
+        np.savez(os.path.join(persist_dir, POSTINGS_FILE), offsets=self.offsets, doc_ids=self.doc_ids,
+                 term_freqs=self.term_freqs, doc_lengths=self.doc_lengths)
+        with open(os.path.join(persist_dir, VOCABULARY_FILE), "w", encoding="utf-8") as file:
+            json.dump(vocabulary, file)
+        with open(os.path.join(persist_dir, NODES_FILE), "w", encoding="utf-8") as file:
+            for node_dict in self.node_dicts:
+                file.write(json.dumps(node_dict) + "\n")
+
+    def scores(self, query):
+        """
+        Returns the BM25 score of every document for the query, as a float32 array.
+        """
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end].astype(np.float32)
+
+            idf = math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            # A document appears once in a term's postings, so the fancy-indexed add is safe
+            scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + self._length_norms[docs])
+        return scores
+
+    def search(self, query, top_k):
+        """
+        Returns the top_k best matching nodes, best first, leaving out documents without a query term.
+        """
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [NodeWithScore(node=metadata_dict_to_node(self.node_dicts[doc]["metadata"]), score=float(scores[doc]))
+                for doc in matched]
+
+
+def reciprocal_rank_fusion(result_lists, top_k, k=60):
+    """
+    Merges ranked NodeWithScore lists: a node scores sum(1 / (k + rank)) over the lists it appears
+    in, so agreement between retrievers counts for more than any single raw score.
+
+    Args:
+        result_lists (list): Ranked lists of NodeWithScore, best first.
+        top_k (int): The number of nodes returned.
+        k (int): Dampens the weight of the top ranks, 60 as in the original paper.
+
+    Returns:
+        list: The fused NodeWithScore list, best first, scored by RRF.
+    """
+    fused, nodes = {}, {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            node_id = result.node.node_id
+            fused[node_id] = fused.get(node_id, 0.0) + 1.0 / (k + rank)
+            # Keep the first retriever's copy (the dense one carries the vector store's metadata)
+            nodes.setdefault(node_id, result.node)
+
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [NodeWithScore(node=nodes[node_id], score=fused[node_id]) for node_id in ranked]
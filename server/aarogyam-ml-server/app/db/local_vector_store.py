@@ -0,0 +1,281 @@
+import json
+import os
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+EMBEDDINGS_FILE = "embeddings.npy"
+QUANTIZED_FILE = "embeddings_int8.npy"
+SCALES_FILE = "scales.npy"
+NODES_FILE = "nodes.jsonl"
+
+# Rows scored per step in int8 mode, bounds the temporary float32 copy
+QUANTIZED_BLOCK_ROWS = 8192
+# Rows allocated for the first added embeddings, the buffers double from there
+MIN_CAPACITY = 256
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def quantize_rows(matrix):
+    # Symmetric per-row int8 quantisation: row ~= int8_row * scale
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def reserve(rows, buffer, size):
+    """
+    Returns a writable buffer of at least ``size`` rows starting with ``rows``: ``buffer`` itself
+    when it is large enough, else a new one of twice the size, so appends copy each row O(1)
+    times on average. A memory-mapped array is copied the first time it is modified.
+
+    Args:
+        rows (np.ndarray): The rows in use, ``buffer[:len(rows)]`` when there is a buffer.
+        buffer (np.ndarray, optional): The current buffer.
+        size (int): The number of rows needed.
+
+    Returns:
+        np.ndarray: The buffer to write to.
+    """
+    if buffer is not None and len(buffer) >= size:
+        return buffer
+    grown = np.empty((max(size, 2 * len(rows), MIN_CAPACITY),) + rows.shape[1:], dtype=rows.dtype)
+    grown[:len(rows)] = rows
+    return grown
+
+
+class LocalVectorStore(BasePydanticVectorStore):
+    """
+    In-process vector store for a corpus that fits in RAM. Embeddings are kept L2-normalized
+    in a float32 matrix (memory-mapped when loaded from disk), so a query is one matrix-vector
+    product followed by an argpartition for the top k. With ``quantize`` the scores are computed
+    from an int8 copy of the matrix, four times smaller on disk and in the page cache. Added rows
+    go into over-allocated buffers (the matrices are views of their first rows), and only they
+    are quantized.
+    """
+
+    stores_text: bool = True
+    persist_dir: Optional[str] = None
+    quantize: bool = False
+
+    _matrix: Any = PrivateAttr(default=None)
+    _quantized: Any = PrivateAttr(default=None)
+    _scales: Any = PrivateAttr(default=None)
+    _matrix_buffer: Any = PrivateAttr(default=None)
+    _quantized_buffer: Any = PrivateAttr(default=None)
+    _scales_buffer: Any = PrivateAttr(default=None)
+    _node_dicts: List[dict] = PrivateAttr(default_factory=list)
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _rows: dict = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalVectorStore"
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir, quantize=False, mmap=True):
+        """
+        Loads a store written by ``persist``.
+
+        Args:
+            persist_dir (str): The directory holding the store files.
+            quantize (bool): Score queries against the int8 matrix instead of the float32 one.
+            mmap (bool): Memory-map the matrices instead of reading them into memory.
+
+        Returns:
+            LocalVectorStore: The loaded store.
+        """
+        store = cls(persist_dir=persist_dir, quantize=quantize)
+        mmap_mode = "r" if mmap else None
+
+        with open(os.path.join(persist_dir, NODES_FILE), encoding="utf-8") as file:
+            store._node_dicts = [json.loads(line) for line in file]
+        store._ids = [node_dict["id"] for node_dict in store._node_dicts]
+        store._rows = {node_id: row for row, node_id in enumerate(store._ids)}
+
+        if quantize and os.path.exists(os.path.join(persist_dir, QUANTIZED_FILE)):
+            store._quantized = np.load(os.path.join(persist_dir, QUANTIZED_FILE), mmap_mode=mmap_mode)
+            store._scales = np.load(os.path.join(persist_dir, SCALES_FILE))
+        else:
+            store._matrix = np.load(os.path.join(persist_dir, EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+            if quantize:
+                store._quantized, store._scales = quantize_rows(np.asarray(store._matrix))
+        return store
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+
+        embeddings = normalize_rows(np.array([node.get_embedding() for node in nodes], dtype=np.float32))
+
+        rows = []
+        for node in nodes:
+            node_dict = {
+                "id": node.node_id,
+                "ref_doc_id": node.ref_doc_id,
+                "metadata": node_to_metadata_dict(node, remove_text=False, flat_metadata=False),
+            }
+            row = self._rows.get(node.node_id)
+            if row is not None:
+                # Upsert: overwrite the existing row in place
+                self._node_dicts[row] = node_dict
+            else:
+                row = self._rows[node.node_id] = len(self._ids)
+                self._ids.append(node.node_id)
+                self._node_dicts.append(node_dict)
+            rows.append(row)
+
+        self._write_rows(rows, embeddings)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._remove_rows([row for row, node_dict in enumerate(self._node_dicts)
+                           if node_dict["ref_doc_id"] == ref_doc_id])
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Any = None, **delete_kwargs: Any) -> None:
+        if filters is not None:
+            raise NotImplementedError("LocalVectorStore does not support metadata filters.")
+        self._remove_rows([self._rows[node_id] for node_id in node_ids or [] if node_id in self._rows])
+
+    def clear(self) -> None:
+        self._node_dicts, self._ids, self._rows = [], [], {}
+        self._matrix = self._quantized = self._scales = None
+        self._matrix_buffer = self._quantized_buffer = self._scales_buffer = None
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise NotImplementedError("LocalVectorStore does not support metadata filters.")
+        if query.query_embedding is None:
+            raise ValueError("LocalVectorStore needs a query embedding.")
+        if not self._ids:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        scores = self._scores(normalize_rows(np.array([query.query_embedding], dtype=np.float32))[0])
+
+        if query.node_ids:
+            mask = np.full(scores.shape, -np.inf, dtype=np.float32)
+            rows = [self._rows[node_id] for node_id in query.node_ids if node_id in self._rows]
+            mask[rows] = 0.0
+            scores = scores + mask
+
+        k = min(query.similarity_top_k, len(scores))
+        if k <= 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = [row for row in top if np.isfinite(scores[row])]
+
+        return VectorStoreQueryResult(
+            nodes=[metadata_dict_to_node(self._node_dicts[row]["metadata"]) for row in top],
+            similarities=[float(scores[row]) for row in top],
+            ids=[self._ids[row] for row in top],
+        )
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        # Sub-millisecond in-process work, no need for a thread hop
+        return self.query(query, **kwargs)
+
+    def persist(self, persist_path: Optional[str] = None, fs: Any = None) -> None:
+        """
+        Writes the matrices and node data to ``persist_path`` (a directory, defaults to persist_dir).
+        """
+        persist_dir = persist_path or self.persist_dir
+        os.makedirs(persist_dir, exist_ok=True)
+
+        matrix = self._float_matrix()
+        if matrix is None:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        np.save(os.path.join(persist_dir, EMBEDDINGS_FILE), matrix)
+
+        if self._quantized is not None:
+            quantized, scales = self._quantized, self._scales
+        elif len(matrix):
+            quantized, scales = quantize_rows(matrix)
+        else:
+            quantized, scales = matrix.astype(np.int8), np.zeros(0, dtype=np.float32)
+        np.save(os.path.join(persist_dir, QUANTIZED_FILE), quantized)
+        np.save(os.path.join(persist_dir, SCALES_FILE), scales)
+
+        with open(os.path.join(persist_dir, NODES_FILE), "w", encoding="utf-8") as file:
+            for node_dict in self._node_dicts:
+                file.write(json.dumps(node_dict) + "\n")
+
+    def _scores(self, embedding):
+        if self._quantized is None:
+            return np.asarray(self._matrix @ embedding, dtype=np.float32)
+
+        scores = np.empty(len(self._quantized), dtype=np.float32)
+        for start in range(0, len(self._quantized), QUANTIZED_BLOCK_ROWS):
+            block = self._quantized[start:start + QUANTIZED_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ embedding
+        return scores * self._scales
+
+    def _float_matrix(self):
+        if self._matrix is not None:
+            return self._matrix
+        if self._quantized is not None:
+            return normalize_rows(self._quantized.astype(np.float32) * self._scales[:, None])
+        return None
+
+    def _write_rows(self, rows, embeddings):
+        # len(self._ids) already counts the new rows
+        size, dim = len(self._ids), embeddings.shape[1]
+
+        # A store loaded from its int8 matrix alone keeps no float32 one
+        if self._matrix is not None or self._quantized is None:
+            if self._matrix is None or not len(self._matrix):
+                self._matrix = np.empty((0, dim), dtype=np.float32)
+            self._matrix_buffer = reserve(self._matrix, self._matrix_buffer, size)
+            self._matrix_buffer[rows] = embeddings
+            self._matrix = self._matrix_buffer[:size]
+
+        if self.quantize:
+            if self._quantized is None or not len(self._quantized):
+                self._quantized, self._scales = np.empty((0, dim), dtype=np.int8), np.empty(0, dtype=np.float32)
+            self._quantized_buffer = reserve(self._quantized, self._quantized_buffer, size)
+            self._scales_buffer = reserve(self._scales, self._scales_buffer, size)
+            self._quantized_buffer[rows], self._scales_buffer[rows] = quantize_rows(embeddings)
+            self._quantized, self._scales = self._quantized_buffer[:size], self._scales_buffer[:size]
+
+    def _remove_rows(self, rows):
+        if not rows:
+            return
+        size = len(self._ids)
+        keep = np.setdiff1d(np.arange(size), rows)
+        # Rows before the first removed one stay where they are, the ones after it move up
+        first = int(np.min(rows))
+        moved = keep[keep > first]
+
+        for name in ("_matrix", "_quantized", "_scales"):
+            array = getattr(self, name)
+            if array is None:
+                continue
+            buffer = reserve(array, getattr(self, f"{name}_buffer"), size)
+            buffer[first:first + len(moved)] = buffer[moved]
+            setattr(self, f"{name}_buffer", buffer)
+            setattr(self, name, buffer[:len(keep)])
+
+        self._node_dicts = [self._node_dicts[row] for row in keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {node_id: row for row, node_id in enumerate(self._ids)}
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+
+from app.db.mongodb import get_db
+from app.services.metrics import MESSAGE_STORE_PENDING, STAGE_SECONDS
+from app.utils.log import get_logger, log_event
+
+load_dotenv()
+
+logger = get_logger("message_store")
+
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "100"))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.5"))
+MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", "10000"))
+MESSAGE_MAX_RETRIES = int(os.getenv("MESSAGE_MAX_RETRIES", "3"))
+
+MESSAGE_COLLECTION = "message"
+
+
+def run_in_executor(func, *args):
+    return asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+class MessageStore:
+    def __init__(self, collection=None, batch_size=MESSAGE_BATCH_SIZE, flush_interval=MESSAGE_FLUSH_INTERVAL,
+                 max_pending=MESSAGE_QUEUE_SIZE, max_retries=MESSAGE_MAX_RETRIES):
+        """
+        Write-behind persistence for chat messages. save() only enqueues the document; a
+        background task drains the queue into insert_many calls of up to batch_size documents,
+        at most flush_interval seconds after the first one arrived, on the default executor so
+        pymongo never blocks the event loop. When Mongo falls behind and the queue is full,
+        save() waits for room instead of buffering without bound.
+
+        Args:
+            collection (Collection, optional): The pymongo collection, defaults to the "message" collection.
+            batch_size (int): The maximum number of documents per insert_many call.
+            flush_interval (float): The maximum seconds a document waits for its batch to fill.
+            max_pending (int): The maximum number of queued documents before save() waits.
+            max_retries (int): Retries for a failed insert_many before the batch is dropped.
+        """
+        self._collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+
+        self._queue = None
+        self._worker = None
+        self._stats = {"saved": 0, "batches": 0, "dropped": 0, "retries": 0}
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = get_db()[MESSAGE_COLLECTION]
+        return self._collection
+
+    def ensure_indexes(self):
+        # A user's history newest first, and time-range scans across users
+        self.collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+        self.collection.create_index([("created_at", DESCENDING)])
+
+    async def start(self):
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._worker = asyncio.create_task(self._run())
+        try:
+            await run_in_executor(self.ensure_indexes)
+        except Exception as e:
+            log_event(logger, "message_index_failed", level=logging.WARNING, error=str(e))
+
+    async def save(self, document):
+        """
+        Queues a message document for insertion, stamping it with created_at.
+        """
+        if self._worker is None:
+            await self.start()
+        document.setdefault("created_at", datetime.now(timezone.utc))
+        await self._queue.put(document)
+        MESSAGE_STORE_PENDING.set(self._queue.qsize())
+
+    async def stop(self):
+        """
+        Flushes every queued document and stops the background task.
+        """
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    def recent(self, user_id, limit):
+        """
+        Returns the user's last ``limit`` messages, oldest first.
+        """
+        cursor = (self.collection.find({"user_id": user_id}, {"message": 1, "reply": 1})
+                  .sort("created_at", DESCENDING).limit(limit))
+        return list(cursor)[::-1]
+
+    def stats(self):
+        return {**self._stats, "pending": self._queue.qsize() if self._queue else 0}
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            document = await self._queue.get()
+            if document is None:
+                break
+
+            batch = [document]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    document = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if document is None:
+                    stopping = True
+                    break
+                batch.append(document)
+
+            await self._insert(batch)
+
+    async def _insert(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                started_at = time.perf_counter()
+                await run_in_executor(self._insert_many, batch)
+                # Observed directly: the writer task is not part of any one chat turn
+                STAGE_SECONDS.labels("mongo_write").observe(time.perf_counter() - started_at)
+                MESSAGE_STORE_PENDING.set(self._queue.qsize())
+                self._stats["saved"] += len(batch)
+                self._stats["batches"] += 1
+                return
+            except BulkWriteError as e:
+                # Unordered insert: everything but the failed documents was written, don't retry duplicates
+                failed = len(e.details.get("writeErrors", []))
+                self._stats["saved"] += len(batch) - failed
+                self._stats["dropped"] += failed
+                log_event(logger, "messages_failed", level=logging.ERROR, count=failed, error=str(e))
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._stats["dropped"] += len(batch)
+                    log_event(logger, "messages_dropped", level=logging.ERROR, count=len(batch),
+                              attempts=attempt + 1, error=str(e))
+                    return
+                self._stats["retries"] += 1
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    def _insert_many(self, batch):
+        self.collection.insert_many(batch, ordered=False)
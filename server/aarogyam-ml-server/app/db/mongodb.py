@@ -1,25 +1,50 @@
+import logging
 import os
+from functools import lru_cache
 
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
 
+from app.utils.log import get_logger, log_event
+
 load_dotenv()
 
+logger = get_logger("mongodb")
+
 # Get the MongoDB URI and database name from environment variables
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
 
-if not MONGO_URI or not DB_NAME:
-    raise EnvironmentError("Please ensure both MONGO_URI and DB_NAME are set in environment variables.")
 
-try:
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    Creates the MongoClient on first use, so importing this module never touches the network.
+    """
+    if not MONGO_URI or not DB_NAME:
+        raise EnvironmentError("Please ensure both MONGO_URI and DB_NAME are set in environment variables.")
+
     # Create a MongoClient to the running MongoDB instance
-    client = MongoClient(MONGO_URI)
+    return MongoClient(MONGO_URI)
+
 
+def get_db():
     # Access the specified database
-    db = client[DB_NAME]
-    print(f"Successfully connected to the database: {DB_NAME}")
+    return get_client()[DB_NAME]
+
+
+def ping():
+    try:
+        get_client().admin.command("ping")
+        log_event(logger, "mongodb_connected", database=DB_NAME)
+        return True
+    except ServerSelectionTimeoutError as e:
+        log_event(logger, "mongodb_connection_failed", level=logging.ERROR, error=str(e))
+        return False
+
 
-except ServerSelectionTimeoutError as e:
-    print(f"Failed to connect to MongoDB: {e}")
+def close_client():
+    if get_client.cache_info().currsize:
+        get_client().close()
+        get_client.cache_clear()
@@ -1,11 +1,27 @@
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
+from app.resources import resources
 from app.routers import ml_router, chatbot_router
+from app.utils.log import configure_logging
 
 load_dotenv()  # Load environment variables from .env file
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models and clients are built lazily, warm-up runs in the background once the worker is up
+    await resources.startup()
+    yield
+    await resources.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(ml_router.router, prefix="/api/ml_service/v1/predict")
 app.include_router(chatbot_router.router, prefix="/chatbot")
@@ -14,3 +30,24 @@ app.include_router(chatbot_router.router, prefix="/chatbot")
 @app.get("/api/ml_service/v1")
 async def root():
     return {"message": "ML SERVER Working"}
+
+
+@app.get("/api/ml_service/v1/ready")
+async def ready():
+    content = {"ready": resources.ready, "components": resources.components, "timings": resources.timings}
+    return JSONResponse(content=content, status_code=200 if resources.ready else 503)
+
+
+@app.get("/api/ml_service/v1/ready/{component}")
+async def component_ready(component: str):
+    # "models" for the predict routes, "chat" for the chatbot: each can be routed on its own readiness
+    status = resources.components.get(component)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown component {component}")
+    return JSONResponse(content={"component": component, **status}, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus scrape endpoint
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
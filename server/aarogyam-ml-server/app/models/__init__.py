@@ -1 +1,7 @@
-from .aarogyam_chat import AarogyamChat
\ No newline at end of file
+def __getattr__(name):
+    # AarogyamChat pulls in llama-index, only import it when it is asked for
+    if name == "AarogyamChat":
+        from .aarogyam_chat import AarogyamChat
+
+        return AarogyamChat
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
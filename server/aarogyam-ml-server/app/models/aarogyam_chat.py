@@ -2,20 +2,164 @@
 
 import os
 import asyncio
+import functools
+import hashlib
+import time
 from dotenv import load_dotenv
-from transformers import GPT2Tokenizer
-from llama_index.core import VectorStoreIndex, Settings
+from llama_index.core import VectorStoreIndex, Settings, QueryBundle
 from llama_index.core.indices.vector_store import VectorIndexRetriever
-from llama_index.core.query_engine import RetrieverQueryEngine
 from pinecone import Pinecone
 from llama_index.embeddings.nvidia import NVIDIAEmbedding
 from llama_index.vector_stores.pinecone import PineconeVectorStore
 from llama_index.llms.nvidia import NVIDIA
-from llama_index.core.llms import ChatMessage
+from llama_index.core.llms import ChatMessage, ChatResponse
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+
+from app.db.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from app.db.index_paths import KEYWORD_INDEX_DIR, LOCAL_VECTOR_STORE_DIR
+from app.db.local_vector_store import LocalVectorStore
+from app.services.admission import upstream_slots
+from app.services.context_assembler import ContextAssembler
+from app.services.embedding_cache import CachedEmbedding
+from app.services.metrics import PROMPT_TOKENS, SEMANTIC_CACHE_LOOKUPS, UPSTREAM_CALLS, annotate, observe_stage
+from app.services.reranker import get_reranker
+from app.services.single_flight import SingleFlight, StreamFanout
+from app.services.upstream import (
+    UPSTREAM_READ_TIMEOUT,
+    UpstreamUnavailable,
+    embed_policy,
+    get_async_http_client,
+    get_http_client,
+    llm_policy,
+    retrieval_policy,
+)
+from app.utils.tokenizer import count_tokens_batch
+
+load_dotenv()
+
+# An on-premises NIM (e.g. http://nim:8000/v1), the hosted NVIDIA API when unset
+NVIDIA_BASE_URL = os.getenv("NVIDIA_BASE_URL")
+LLM_MODEL = os.getenv("LLM_MODEL", "meta/llama3-70b-instruct")
+# The hosted default, the corpus in the vector store was embedded with it
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nvidia/nv-embedqa-e5-v5")
+# Keep-alive connections to the Pinecone index, shared by the retrieval worker threads
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "32"))
+
+# "pinecone" or "local" (an in-process index written by ai_chat_populate.py)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+LOCAL_VECTOR_STORE_QUANTIZE = os.getenv("LOCAL_VECTOR_STORE_QUANTIZE", "false").lower() == "true"
+
+# "simple" (top 5 by vector similarity) or "rerank" (raw and rewritten query retrieval, ColBERT rerank)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "simple")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "5"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+
+# Hybrid retrieval: BM25 over the index written by ai_chat_populate.py, fused with the dense results
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "false").lower() == "true"
+# Candidates taken from each retriever before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Per-call timeouts in seconds, a timed out call is cancelled together with its HTTP request
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "20"))
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "15"))
+
+# Identical questions asked at the same time, after the same history, share one retrieval and LLM call
+COALESCE_QUERIES = os.getenv("COALESCE_QUERIES", "true").lower() == "true"
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """
+    Runs a blocking callable in the default thread pool so the event loop stays free.
+
+    Args:
+        func (callable): The synchronous function to run.
+        *args: Positional arguments passed to ``func``.
+        **kwargs: Keyword arguments passed to ``func``.
+
+    Returns:
+        Any: Whatever ``func`` returns.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+async def aclose_stream(stream):
+    # Closing the generator closes the upstream HTTP response too
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+def normalize_query(query):
+    # "What is Ayurveda?" and "what is  ayurveda" are the same question
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+def history_digest(chat_history):
+    # Turns are only coalesced when they would send the LLM the same prompt, history included
+    if not chat_history:
+        return ""
+    digest = hashlib.blake2b(digest_size=16)
+    for message in chat_history:
+        digest.update(f"{message['role']}\0{message['content']}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_nvidia_llm(api_key):
+    # Retries are left to the upstream policy, the SDK's own would multiply with them
+    base_url = {"base_url": NVIDIA_BASE_URL} if NVIDIA_BASE_URL else {}
+    return NVIDIA(model=LLM_MODEL, api_key=api_key, max_retries=0, timeout=UPSTREAM_READ_TIMEOUT,
+                  http_client=get_http_client(), async_http_client=get_async_http_client(), **base_url)
+
+
+def build_nvidia_embedding(api_key):
+    embedding = NVIDIAEmbedding(model=EMBED_MODEL, api_key=api_key, base_url=NVIDIA_BASE_URL)
+    # NVIDIAEmbedding takes no http client, its OpenAI clients are rebuilt on the shared pools
+    embedding._client = embedding._client.with_options(http_client=get_http_client(), max_retries=0)
+    embedding._aclient = embedding._aclient.with_options(http_client=get_async_http_client(), max_retries=0)
+    return embedding
+
+
+def build_pinecone_index(api_key, name):
+    pc = Pinecone(api_key=api_key)
+    pc.openapi_config.connection_pool_maxsize = PINECONE_POOL_SIZE
+    # No urllib3 retries either, the retrieval policy retries and hedges the query as a whole
+    pc.openapi_config.retries = 0
+    return pc, pc.Index(name)
+
+
+def has_native_aquery(vector_store):
+    # The base class "aquery" just calls the blocking "query" (Pinecone does not override it)
+    return type(vector_store).aquery is not BasePydanticVectorStore.aquery
 
 
 class AarogyamChat:
-    def __init__(self):
+    def __init__(self, llm=None, embed_model=None, vector_store=None, semantic_cache=None,
+                 retrieval_mode=RETRIEVAL_MODE, reranker=None, keyword_index=None, context_assembler=None,
+                 coalesce=COALESCE_QUERIES, upstream=None, policies=None):
+        """
+        Initializes the chat pipeline. Any component that is not passed in is built from the
+        NVIDIA / Pinecone defaults, so tests and benchmarks can inject local stand-ins.
+
+        Args:
+            llm (LLM, optional): The LLM used to generate answers.
+            embed_model (BaseEmbedding, optional): The embedding model used for retrieval.
+            vector_store (BasePydanticVectorStore, optional): The vector store holding the corpus.
+            semantic_cache (SemanticCache, optional): Answers reused for near-duplicate questions.
+            retrieval_mode (str): "simple" or "rerank".
+            reranker (ColbertReranker, optional): The reranker used in "rerank" mode, defaults to the shared one.
+            keyword_index (KeywordIndex, optional): Enables hybrid retrieval, loaded from KEYWORD_INDEX_DIR when
+                HYBRID_SEARCH is set.
+            context_assembler (ContextAssembler, optional): Dedupes and budgets the context chunks.
+            coalesce (bool): Let concurrent identical questions share one pipeline run.
+            upstream (FairSemaphore, optional): Bounds the LLM and embedding calls in flight, defaults to
+                the worker's shared one.
+            policies (dict, optional): UpstreamPolicy overrides for "llm", "embed" and "vector_store",
+                defaults to the worker's shared ones.
+        """
         # Load environment variables
         load_dotenv()
 
@@ -24,34 +168,62 @@ class AarogyamChat:
         self.pinecone_api_key = os.getenv("PINECONE_API_KEY")
 
         # Check if API keys are correctly loaded
-        if not self.nvidia_api_key or not self.pinecone_api_key:
+        needs_nvidia = llm is None or embed_model is None
+        needs_pinecone = vector_store is None and VECTOR_STORE == "pinecone"
+        if (needs_nvidia and not self.nvidia_api_key) or (needs_pinecone and not self.pinecone_api_key):
             raise EnvironmentError("NVIDIA or Pinecone API key not found. Check your .env file.")
 
-        # Initialize tokenizer for text chunking
-        self.tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
-
         # Set up NVIDIA embedding and LLM with proper error handling
         try:
-            Settings.embed_model = NVIDIAEmbedding(api_key=self.nvidia_api_key)
-            Settings.llm = NVIDIA(model='meta/llama3-70b-instruct', api_key=self.nvidia_api_key)
+            Settings.embed_model = embed_model or CachedEmbedding(build_nvidia_embedding(self.nvidia_api_key))
+            Settings.llm = llm or build_nvidia_llm(self.nvidia_api_key)
         except Exception as e:
             raise Exception(f"Error setting up NVIDIA model: {str(e)}")
+        self.llm = Settings.llm
+        self.embed_model = Settings.embed_model
+        self.semantic_cache = semantic_cache
+
+        if vector_store is None and VECTOR_STORE == "local":
+            vector_store = LocalVectorStore.from_persist_dir(LOCAL_VECTOR_STORE_DIR,
+                                                             quantize=LOCAL_VECTOR_STORE_QUANTIZE)
 
         # Initialize Pinecone vector store
-        try:
-            self.pc = Pinecone(api_key=self.pinecone_api_key)
-            self.pinecone_index = self.pc.Index("aarogyam-chat-rag")
-        except Exception as e:
-            raise Exception(f"Error initializing Pinecone: {str(e)}")
+        if vector_store is None:
+            try:
+                self.pc, self.pinecone_index = build_pinecone_index(self.pinecone_api_key, "aarogyam-chat-rag")
+            except Exception as e:
+                raise Exception(f"Error initializing Pinecone: {str(e)}")
+
+            vector_store = PineconeVectorStore(pinecone_index=self.pinecone_index)
 
-        self.vector_store = PineconeVectorStore(pinecone_index=self.pinecone_index)
+        self.vector_store = vector_store
 
         # Create Vector Store Index
         self.index = VectorStoreIndex.from_vector_store(vector_store=self.vector_store)
-        self.retriever = VectorIndexRetriever(index=self.index, similarity_top_k=5)
+        # Retrieval only: the answer is generated once, by chat_with_model, from the retrieved nodes
+        self.retrieval_mode = retrieval_mode
+        self.top_k = RERANK_CANDIDATES if retrieval_mode == "rerank" else 5
+
+        if keyword_index is None and HYBRID_SEARCH:
+            keyword_index = KeywordIndex.from_persist_dir(KEYWORD_INDEX_DIR)
+        self.keyword_index = keyword_index
 
-        # Create Query Engine
-        self.query_engine = RetrieverQueryEngine(retriever=self.retriever)
+        # With a keyword index both retrievers contribute more candidates, fusion keeps the best top_k
+        dense_top_k = max(self.top_k, HYBRID_CANDIDATES) if keyword_index is not None else self.top_k
+        self.retriever = VectorIndexRetriever(index=self.index, similarity_top_k=dense_top_k)
+        self.reranker = reranker
+        if retrieval_mode == "rerank" and reranker is None:
+            self.reranker = get_reranker()
+
+        self.context_assembler = context_assembler or ContextAssembler()
+        self.coalesce = coalesce
+        self.flights = SingleFlight()
+        self.upstream = upstream or upstream_slots
+        self.policies = {"llm": llm_policy, "embed": embed_policy, "vector_store": retrieval_policy,
+                         **(policies or {})}
+
+        # Count, total and max milliseconds per pipeline stage
+        self.stage_timings = {}
 
         # Define the context prompt template
         self.DEFAULT_CONTEXT_PROMPT = """
@@ -68,17 +240,242 @@ class AarogyamChat:
         If the context doesn't fully answer the question, provide additional information based on general Ayurvedic knowledge, but ensure the response is relevant.
         """
 
-    # Function to truncate or split text into chunks of max 512 tokens
-    def truncate_text(self, text, max_tokens=500):
-        tokens = self.tokenizer.tokenize(text)
-        if len(tokens) > max_tokens:
-            tokens = tokens[:max_tokens]
-        return self.tokenizer.convert_tokens_to_string(tokens)
+        # Turns a follow-up question into a standalone search query
+        self.REWRITE_PROMPT = """
+        Please generate a query for a semantic search engine based on the current conversation related to Ayurveda.
 
-    # Function to handle user input and generate response
-    async def chat_with_model(self, query):
-        query_result = self.query_engine.query(query)
-        source_nodes = [node.get_content() for node in query_result.source_nodes]
+        {chat_history_str}
+
+        Latest message: {query_str}
+        Query:"""
+
+        # Used to fold old exchanges of a long conversation into a short summary
+        self.SUMMARY_PROMPT = """
+        Summarize the following conversation between a user and an Ayurveda assistant in at most 150 words. Keep the user's symptoms, conditions, preferences and any advice already given.
+
+        Previous summary:
+        {summary}
+
+        Conversation:
+        {conversation}
+        """
+
+    def _record_timing(self, stage, started_at):
+        elapsed = time.perf_counter() - started_at
+        observe_stage(stage, elapsed)
+
+        elapsed_ms = elapsed * 1000
+        timing = self.stage_timings.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        timing["count"] += 1
+        timing["total_ms"] += elapsed_ms
+        timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+
+    def timing_stats(self):
+        return {
+            stage: {"count": timing["count"], "avg_ms": round(timing["total_ms"] / timing["count"], 2),
+                    "max_ms": round(timing["max_ms"], 2)}
+            for stage, timing in self.stage_timings.items()
+        }
+
+    async def _embed_query(self, query):
+        try:
+            return await self.embed_model.aget_query_embedding(query)
+        except NotImplementedError:
+            return await run_in_executor(self.embed_model.get_query_embedding, query)
+
+    async def _aembed(self, query):
+        """
+        Embeds the query. Returns None when the embedding upstream is down and the keyword index
+        can answer on its own, the turn then skips the semantic cache and dense retrieval.
+        """
+        started_at = time.perf_counter()
+        try:
+            # A cached embedding needs no upstream slot
+            cached_query_embedding = getattr(self.embed_model, "cached_query_embedding", None)
+            embedding = cached_query_embedding(query) if cached_query_embedding else None
+            if embedding is not None:
+                return embedding
+
+            async with self.upstream:
+                return await asyncio.wait_for(
+                    self.policies["embed"].call(functools.partial(self._embed_query, query)), EMBED_TIMEOUT)
+        except UpstreamUnavailable:
+            if self.keyword_index is None:
+                raise
+            self._degraded("embed")
+            return None
+        finally:
+            self._record_timing("embed", started_at)
+
+    def _degraded(self, upstream):
+        UPSTREAM_CALLS.labels(upstream, "degraded").inc()
+        annotate(degraded="keyword")
+
+    async def _aretrieve(self, query, embedding):
+        # The query is embedded once up front and shared by the semantic cache and the retriever
+        query_bundle = QueryBundle(query_str=query, embedding=embedding)
+
+        started_at = time.perf_counter()
+        try:
+            if embedding is None:
+                # The embedding upstream is down, the keyword index answers on its own
+                nodes = []
+            elif has_native_aquery(self.vector_store):
+                nodes = await self.retriever.aretrieve(query_bundle)
+            else:
+                # Pinecone only has a blocking query, so the whole retrieval runs on a worker thread there.
+                # The query is idempotent: retried, and hedged when it is slow.
+                nodes = await self.policies["vector_store"].call(
+                    functools.partial(run_in_executor, self.retriever.retrieve, query_bundle), hedge=True)
+        except UpstreamUnavailable:
+            if self.keyword_index is None:
+                raise
+            self._degraded("vector_store")
+            nodes = []
+        finally:
+            self._record_timing("retrieve", started_at)
+
+        if self.keyword_index is None:
+            return nodes
+
+        # In-process and sub-millisecond, no need for a thread hop
+        started_at = time.perf_counter()
+        keyword_nodes = self.keyword_index.search(query, HYBRID_CANDIDATES)
+        nodes = reciprocal_rank_fusion([nodes, keyword_nodes], self.top_k, k=RRF_K)
+        self._record_timing("keyword_search", started_at)
+        return nodes
+
+    async def _rewrite_and_retrieve(self, query, chat_history):
+        started_at = time.perf_counter()
+        chat_history_str = "\n".join(f"{message['role']}: {message['content']}" for message in chat_history)
+        prompt = self.REWRITE_PROMPT.format(chat_history_str=chat_history_str, query_str=query)
+        response = await self._achat([ChatMessage(role="user", content=prompt)])
+        rewritten = response.message.content.strip().strip('"') or query
+        self._record_timing("rewrite", started_at)
+
+        return rewritten, await self._aretrieve(rewritten, await self._aembed(rewritten))
+
+    async def _retrieve_nodes(self, query, embedding, chat_history=None):
+        if self.retrieval_mode != "rerank":
+            return await self._aretrieve(query, embedding)
+
+        # A follow-up question is also rewritten into a standalone query, both retrievals run at once
+        rerank_query = query
+        if chat_history:
+            nodes, (rerank_query, rewrite_nodes) = await asyncio.gather(
+                self._aretrieve(query, embedding), self._rewrite_and_retrieve(query, chat_history))
+            nodes = nodes + rewrite_nodes
+        else:
+            nodes = await self._aretrieve(query, embedding)
+
+        # The same chunk often comes back from both retrievals, score it once
+        unique_nodes = list({node.node.node_id: node for node in nodes}.values())
+
+        started_at = time.perf_counter()
+        nodes = await run_in_executor(self.reranker.rerank, rerank_query, unique_nodes, RERANK_TOP_N)
+        self._record_timing("rerank", started_at)
+        return nodes
+
+    async def _cache_lookup(self, embedding):
+        if self.semantic_cache is None or embedding is None:
+            return None
+
+        started_at = time.perf_counter()
+        cached = await run_in_executor(self.semantic_cache.lookup, embedding)
+        self._record_timing("cache_lookup", started_at)
+
+        SEMANTIC_CACHE_LOOKUPS.labels("hit" if cached is not None else "miss").inc()
+        annotate(cache_hit=cached is not None)
+        return cached
+
+    async def _cache_store(self, embedding, reply, source_nodes):
+        if self.semantic_cache is not None and embedding is not None:
+            await run_in_executor(self.semantic_cache.store, embedding, reply, source_nodes)
+
+    async def _llm_chat(self, messages):
+        try:
+            return await self.llm.achat(messages)
+        except NotImplementedError:
+            # A thread cannot be cancelled, the timeout only stops the wait
+            return await run_in_executor(self.llm.chat, messages)
+
+    async def _call_llm(self, messages):
+        # Nothing is sent to the client before the reply is complete, so a failed call can be retried
+        return await asyncio.wait_for(self.policies["llm"].call(functools.partial(self._llm_chat, messages)),
+                                      LLM_TIMEOUT)
+
+    async def _open_stream(self, messages):
+        # The request only goes out when the first chunk is read, so that is the part a retry covers
+        stream = await self.llm.astream_chat(messages)
+        try:
+            return stream, await stream.__anext__()
+        except StopAsyncIteration:
+            return stream, None
+        except BaseException:
+            await aclose_stream(stream)
+            raise
+
+    async def _achat(self, messages):
+        async with self.upstream:
+            return await self._call_llm(messages)
+
+    async def _astream_chat(self, messages):
+        started_at = time.perf_counter()
+        started = False
+        # The slot is held until the stream ends or its consumer goes away
+        async with self.upstream:
+            try:
+                stream, chunk = await asyncio.wait_for(
+                    self.policies["llm"].call(functools.partial(self._open_stream, messages)),
+                    LLM_FIRST_TOKEN_TIMEOUT)
+                try:
+                    # Once a delta has been sent a failure ends the reply, it is not retried
+                    while chunk is not None:
+                        if chunk.delta:
+                            if not started:
+                                self._record_timing("llm_first_token", started_at)
+                            started = True
+                            yield chunk.delta
+
+                        timeout = LLM_STREAM_IDLE_TIMEOUT if started else LLM_FIRST_TOKEN_TIMEOUT
+                        try:
+                            chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            break
+                finally:
+                    await aclose_stream(stream)
+            except NotImplementedError:
+                if started:
+                    raise
+                # No streaming support on this backend, send the whole reply as a single delta
+                response = await self._call_llm(messages)
+                self._record_timing("llm_first_token", started_at)
+                yield response.message.content
+        self._record_timing("llm_total", started_at)
+
+    async def _astream_and_cache(self, messages, embedding, source_nodes):
+        reply_parts = []
+        deltas = self._astream_chat(messages)
+        try:
+            async for delta in deltas:
+                reply_parts.append(delta)
+                yield delta
+        finally:
+            # async for does not close the inner generator when this one is closed early
+            await deltas.aclose()
+
+        await self._cache_store(embedding, "".join(reply_parts), source_nodes)
+
+    async def _replay(self, reply):
+        yield reply
+
+    async def _retrieve_context(self, query, embedding, chat_history=None, follow_up=False):
+        # Only a follow-up is rewritten, a session's first question stands on its own
+        nodes = await self._retrieve_nodes(query, embedding, chat_history if follow_up else None)
+
+        started_at = time.perf_counter()
+        # Overlapping chunks are sent once and the context is held to its token budget
+        source_nodes, context_stats = self.context_assembler.assemble(nodes)
 
         # Format context from retrieved nodes
         node_context = "\n".join([f"Context Chunk {i + 1}: {content}" for i, content in enumerate(source_nodes)])
@@ -86,11 +483,121 @@ class AarogyamChat:
         # Prepare the prompt with context
         prompt = self.DEFAULT_CONTEXT_PROMPT.format(node_context=node_context, query_str=query)
 
+        history = [ChatMessage(role=message["role"], content=message["content"]) for message in chat_history or []]
+        messages = history + [ChatMessage(role="user", content=prompt)]
+
+        prompt_tokens = sum(count_tokens_batch(message.content for message in messages))
+        PROMPT_TOKENS.labels("context").observe(context_stats["context_tokens"])
+        PROMPT_TOKENS.labels("total").observe(prompt_tokens)
+        annotate(prompt_tokens=prompt_tokens, context_tokens=context_stats["context_tokens"],
+                 context_duplicates=context_stats["duplicates"], context_trimmed=context_stats["trimmed"])
+        self._record_timing("prompt_build", started_at)
+
+        return messages, source_nodes
+
+    async def summarize_history(self, summary, turns):
+        """
+        Folds old exchanges into the running conversation summary.
+
+        Args:
+            summary (str): The current summary, possibly empty.
+            turns (list): The (question, reply) pairs to fold in, oldest first.
+
+        Returns:
+            str: The new summary.
+        """
+        conversation = "\n".join(f"User: {question}\nAssistant: {reply}" for question, reply in turns)
+        prompt = self.SUMMARY_PROMPT.format(summary=summary or "(none)", conversation=conversation)
+        response = await self._achat([ChatMessage(role="user", content=prompt)])
+        return response.message.content.strip()
+
+    # Function to handle user input and generate response
+    async def chat_with_model(self, query, chat_history=None, follow_up=None):
+        """
+        Answers a query from the retrieved context.
+
+        Args:
+            query (str): The user question.
+            chat_history (list, optional): The earlier messages of the user as {"role", "content"} dicts.
+            follow_up (bool, optional): Whether the question follows an exchange of the current session.
+                Defaults to whether there is a history; messages loaded from earlier sessions do not
+                make the first question of a new one a follow-up.
+
+        Returns:
+            tuple: The ChatResponse and the list of source node contents.
+        """
+        if follow_up is None:
+            follow_up = bool(chat_history)
+        if not self.coalesce:
+            return await self._chat_with_model(query, chat_history, follow_up)
+        # Followers get the leader's response object, they must not modify it
+        return await self.flights.do(("chat", normalize_query(query), follow_up, history_digest(chat_history)),
+                                     functools.partial(self._chat_with_model, query, chat_history, follow_up))
+
+    async def _chat_with_model(self, query, chat_history=None, follow_up=False):
+        embedding = await self._aembed(query)
+
+        # Near-duplicate question: skip retrieval and generation entirely. Follow-up questions
+        # depend on the conversation, so only a session's first question uses the cache.
+        cached = None if follow_up else await self._cache_lookup(embedding)
+        if cached is not None:
+            response = ChatResponse(message=ChatMessage(role="assistant", content=cached["reply"]))
+            return response, cached["source_nodes"]
+
+        messages, source_nodes = await self._retrieve_context(query, embedding, chat_history, follow_up)
+
         # Use NVIDIA LLM to generate a response
-        response = Settings.llm.chat([ChatMessage(role="user", content=prompt)])
+        started_at = time.perf_counter()
+        response = await self._achat(messages)
+        self._record_timing("llm_total", started_at)
+
+        # An answer written with someone's history in the prompt is not shared with other users
+        if not chat_history:
+            await self._cache_store(embedding, response.message.content, source_nodes)
 
         return response, source_nodes
 
+    async def stream_chat_with_model(self, query, chat_history=None, follow_up=None):
+        """
+        Retrieves the context for a query and starts streaming the LLM answer.
+
+        Args:
+            query (str): The user question.
+            chat_history (list, optional): The earlier messages of the user as {"role", "content"} dicts.
+            follow_up (bool, optional): Whether the question follows an exchange of the current session,
+                defaults to whether there is a history.
+
+        Returns:
+            tuple: An async generator of text deltas and the list of source node contents.
+        """
+        if follow_up is None:
+            follow_up = bool(chat_history)
+        if not self.coalesce:
+            return await self._start_stream(query, chat_history, follow_up)
+
+        # Every caller subscribes to the one stream, joining late replays the deltas produced so far
+        fanout, source_nodes = await self.flights.do(
+            ("stream", normalize_query(query), follow_up, history_digest(chat_history)),
+            functools.partial(self._start_shared_stream, query, chat_history, follow_up),
+            until=lambda result: result[0].finished, joinable=lambda result: not result[0].abandoned)
+        return fanout.subscribe(), source_nodes
+
+    async def _start_shared_stream(self, query, chat_history=None, follow_up=False):
+        deltas, source_nodes = await self._start_stream(query, chat_history, follow_up)
+        return StreamFanout(deltas), source_nodes
+
+    async def _start_stream(self, query, chat_history=None, follow_up=False):
+        embedding = await self._aembed(query)
+
+        cached = None if follow_up else await self._cache_lookup(embedding)
+        if cached is not None:
+            return self._replay(cached["reply"]), cached["source_nodes"]
+
+        messages, source_nodes = await self._retrieve_context(query, embedding, chat_history, follow_up)
+        if chat_history:
+            return self._astream_chat(messages), source_nodes
+        return self._astream_and_cache(messages, embedding, source_nodes), source_nodes
+
 
 # Example usage
 if __name__ == "__main__":
@@ -1,13 +1,71 @@
-# import numpy as np
-#
-#
-# # import tensorflow as tf
-#
-#
-# class MLModel:
-#     # def __init__(self, model_path: str):
-#     # self.model = tf.keras.models.load_model(model_path)
-#
-#     def predict(self, data: np.ndarray) -> np.ndarray:
-#         # return self.model.predict(data)
-#         return np.array([1, 2, 3])
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Threads per ONNX Runtime call; parallelism comes from batching and the inference thread pool
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
+
+MODEL_EXTENSIONS = (".onnx", ".joblib", ".pkl")
+
+
+class MLModel:
+    def __init__(self, name, predict_fn, input_dtype=np.float32):
+        """
+        A loaded model with a vectorised predict: one call scores a whole batch of rows.
+
+        Args:
+            name (str): The name the model is served under.
+            predict_fn (callable): Maps a (rows, ...) array to a (rows, ...) array of predictions.
+            input_dtype (np.dtype): The dtype the model expects its input in.
+        """
+        self.name = name
+        self._predict_fn = predict_fn
+        self.input_dtype = input_dtype
+
+    def predict(self, data: np.ndarray) -> np.ndarray:
+        predictions = np.asarray(self._predict_fn(np.asarray(data, dtype=self.input_dtype)))
+        if len(predictions) != len(data):
+            raise ValueError(f"Model {self.name} returned {len(predictions)} predictions for {len(data)} rows")
+        return predictions
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an ONNX model (.onnx, needs onnxruntime) or a pickled scikit-learn style
+        estimator (.joblib / .pkl).
+
+        Args:
+            path (str): The model file.
+
+        Returns:
+            MLModel: The loaded model, named after the file.
+        """
+        name, extension = os.path.splitext(os.path.basename(path))
+        if extension == ".onnx":
+            return cls._load_onnx(name, path)
+        if extension in (".joblib", ".pkl"):
+            import joblib
+
+            estimator = joblib.load(path)
+            return cls(name, estimator.predict, input_dtype=np.float64)
+        raise ValueError(f"Unsupported model format: {path}")
+
+    @classmethod
+    def _load_onnx(cls, name, path):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("Serving .onnx models needs onnxruntime: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+        session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+
+        def predict_fn(data):
+            return session.run(None, {input_name: data})[0]
+
+        return cls(name, predict_fn, input_dtype=np.float32)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from app.db import mongodb
+from app.db.message_store import MessageStore
+from app.services.model_registry import ModelRegistry
+from app.utils.tokenizer import get_tokenizer
+from app.utils.log import get_logger, log_event
+
+load_dotenv()
+
+# Build the chat pipeline in the background as soon as the worker starts, instead of on the first message
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+logger = get_logger("resources")
+
+
+class Resources:
+    def __init__(self):
+        """
+        Per-worker container for the expensive, shared objects (the chat pipeline, the MongoDB
+        client). Nothing is created at import time: each resource is built on first use or by
+        the warm-up hooks run from the FastAPI lifespan.
+        """
+        self._chat = None
+        self._chat_lock = None
+        self.message_store = MessageStore()
+        self.models = ModelRegistry()
+        # Warmed independently: the predict routes do not wait on (or fail with) the chat pipeline
+        self._warmup_hooks = {"chat": [self._warm_chat], "models": [self._warm_models]}
+        self._warmup_task = None
+        self.components = {name: {"ready": False, "error": None} for name in self._warmup_hooks}
+        self.timings = {}
+
+    @property
+    def ready(self):
+        """
+        Whether every component is warmed up.
+        """
+        return all(status["ready"] for status in self.components.values())
+
+    @property
+    def chat(self):
+        """
+        The chat pipeline if it has already been built, else None.
+        """
+        return self._chat
+
+    @chat.setter
+    def chat(self, chat):
+        # Lets tests and benchmarks inject a pipeline built from local stand-ins
+        self._chat = chat
+
+    def db(self):
+        return mongodb.get_db()
+
+    async def get_chat(self):
+        """
+        Returns the shared AarogyamChat, building it on first use. Concurrent callers wait for
+        the same build instead of starting their own.
+        """
+        if self._chat is not None:
+            return self._chat
+
+        if self._chat_lock is None:
+            self._chat_lock = asyncio.Lock()
+        async with self._chat_lock:
+            if self._chat is None:
+                started_at = time.perf_counter()
+                loop = asyncio.get_running_loop()
+                self._chat = await loop.run_in_executor(None, self._build_chat)
+                self.timings["chat_init_seconds"] = time.perf_counter() - started_at
+        return self._chat
+
+    def _build_chat(self):
+        # Imported here: llama-index and the NVIDIA/Pinecone clients are slow to import
+        from app.models import AarogyamChat
+        from app.services.semantic_cache import create_semantic_cache
+
+        return AarogyamChat(semantic_cache=create_semantic_cache(self.db))
+
+    def add_warmup_hook(self, hook, component="app"):
+        """
+        Registers an async callable run when the worker starts, after the earlier hooks of the
+        same component. Components are warmed concurrently and report their readiness apart.
+        """
+        self._warmup_hooks.setdefault(component, []).append(hook)
+        self.components.setdefault(component, {"ready": False, "error": None})
+
+    async def _warm_chat(self):
+        await self.get_chat()
+        # Conversation memory and context assembly count tokens from the first turn on
+        await asyncio.get_running_loop().run_in_executor(None, get_tokenizer)
+
+    async def _warm_models(self):
+        await asyncio.get_running_loop().run_in_executor(self.models.executor, self.models.load_all)
+
+    async def _warm_component(self, component, hooks):
+        started_at = time.perf_counter()
+        try:
+            for hook in hooks:
+                await hook()
+            self.components[component] = {"ready": True, "error": None}
+        except Exception as e:
+            self.components[component] = {"ready": False, "error": str(e)}
+            log_event(logger, "warmup_failed", level=logging.ERROR, exc_info=True, component=component, error=str(e))
+        self.timings[f"{component}_warmup_seconds"] = time.perf_counter() - started_at
+
+    async def warm_up(self):
+        started_at = time.perf_counter()
+        await asyncio.gather(*[self._warm_component(component, hooks)
+                               for component, hooks in self._warmup_hooks.items()])
+        self.timings["warmup_seconds"] = time.perf_counter() - started_at
+        log_event(logger, "warmup_finished", ready=self.ready,
+                  components={component: status["ready"] for component, status in self.components.items()},
+                  **self.timings)
+
+    async def startup(self):
+        if WARMUP_ON_STARTUP:
+            # Run in the background so the worker starts answering health checks right away
+            self._warmup_task = asyncio.create_task(self.warm_up())
+        else:
+            # Everything is built on first use
+            for status in self.components.values():
+                status["ready"] = True
+
+    async def shutdown(self):
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+
+        embed_model = getattr(self._chat, "embed_model", None)
+        if hasattr(embed_model, "persist"):
+            await asyncio.get_running_loop().run_in_executor(None, embed_model.persist)
+
+        # Write out the queued chat messages before the client goes away
+        await self.message_store.stop()
+        mongodb.close_client()
+        self.models.close()
+
+        if self._chat is not None:
+            from app.services.upstream import close_http_clients
+
+            await close_http_clients()
+
+    def cache_stats(self):
+        if self._chat is None:
+            return {"semantic_cache": None}
+
+        stats = {"semantic_cache": self._chat.semantic_cache.stats() if self._chat.semantic_cache else None}
+        if hasattr(self._chat.embed_model, "stats"):
+            stats["embedding_cache"] = self._chat.embed_model.stats()
+        stats["single_flight"] = self._chat.flights.stats()
+        return stats
+
+
+# One container per worker process
+resources = Resources()
@@ -1,64 +1,227 @@
+import logging
+import time
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException, status
-from app.db.mongodb import db
-from app.models import AarogyamChat  # Ensure AarogyamChat is correctly imported
-from app.services.jwt_service import verify_jwt
+from app.resources import resources
+from app.services.admission import MAX_WEBSOCKET_CONNECTIONS, Overloaded, upstream_slots, user_rate_limiter
+from app.services.chat_memory import ConversationMemory
+from app.services.jwt_service import authenticate
+from app.services.metrics import (
+    ADMISSION_REJECTIONS,
+    CHAT_TURNS,
+    WEBSOCKET_CONNECTIONS,
+    WEBSOCKET_EVENTS,
+    observe_stage,
+    track_request,
+)
+from app.utils.log import get_logger, log_event
 
 router = APIRouter()
+# Open WebSocket -> user id, a user may have several sessions
 active_connections = {}
+logger = get_logger("chatbot")
+
+
+async def save_message(user_id, user_message, reply, source_nodes):
+    started_at = time.perf_counter()
+    await resources.message_store.save({
+        "user_id": user_id,
+        "message": user_message,
+        "reply": reply,
+        "source_nodes": source_nodes,
+    })
+    observe_stage("mongo_enqueue", time.perf_counter() - started_at)
+
+
+async def shed(websocket: WebSocket, reason):
+    # 1013 "Try Again Later": clients should back off and reconnect
+    ADMISSION_REJECTIONS.labels(reason).inc()
+    WEBSOCKET_EVENTS.labels("shed").inc()
+    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Server overloaded, try again later")
+
+
+async def reject_turn(websocket: WebSocket, stream: bool, retry_after):
+    detail = f"Too many messages, try again in {retry_after:.0f}s."
+    if stream:
+        await websocket.send_json({"type": "error", "detail": detail, "retry_after": round(retry_after, 1)})
+    else:
+        await websocket.send_text(detail)
+
+
+def log_turn(user_id, mode, outcome, user_message, started_at, timings):
+    total = time.perf_counter() - started_at
+    observe_stage("turn", total)
+    CHAT_TURNS.labels(mode, outcome).inc()
+    log_event(logger, "chat_turn", user_id=user_id, mode=mode, outcome=outcome,
+              message_chars=len(user_message), total_ms=round(total * 1000, 2), **timings)
+
+
+async def stream_reply(websocket: WebSocket, user_id, user_message: str, memory: ConversationMemory):
+    """
+    Streams one AI reply over the socket as framed JSON messages:
+    start, delta (repeated), sources, end, or error if generation fails.
+
+    Args:
+        websocket (WebSocket): The client connection.
+        user_id: The id of the authenticated user.
+        user_message (str): The message received from the user.
+        memory (ConversationMemory): The history of the session.
+
+    Returns:
+        str: The outcome of the turn, "ok" or "error".
+    """
+    await websocket.send_json({"type": "start"})
+    started_at = time.perf_counter()
+
+    try:
+        chat = await resources.get_chat()
+        deltas, source_nodes = await chat.stream_chat_with_model(user_message, await memory.history(),
+                                                                 follow_up=memory.session_turns > 0)
+
+        reply_parts = []
+        try:
+            async for delta in deltas:
+                reply_parts.append(delta)
+                await websocket.send_json({"type": "delta", "content": delta})
+        finally:
+            # A send failing mid-stream (the client left) frees the upstream slot and the LLM stream now, not at GC
+            await deltas.aclose()
+
+        await websocket.send_json({"type": "sources", "source_nodes": source_nodes})
+    except (WebSocketDisconnect, Overloaded):
+        raise
+    except Exception as e:
+        log_event(logger, "stream_failed", level=logging.ERROR, user_id=user_id, error=str(e))
+        await websocket.send_json({"type": "error", "detail": "Failed to generate a response."})
+        return "error"
+
+    # Persist the assembled reply once the stream is complete
+    reply = "".join(reply_parts)
+    await save_message(user_id, user_message, reply, source_nodes)
+
+    await websocket.send_json({"type": "end"})
+    observe_stage("reply", time.perf_counter() - started_at)
+
+    # Summarising an over-budget history happens after the client has its answer
+    await memory.add_turn(user_message, reply, summarize=chat.summarize_history)
+    return "ok"
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    return resources.cache_stats()
+
+
+@router.get("/pipeline-stats")
+async def pipeline_stats():
+    return resources.chat.timing_stats() if resources.chat else {}
+
+
+@router.get("/message-stats")
+async def message_stats():
+    return resources.message_store.stats()
+
+
+@router.get("/upstream-stats")
+async def upstream_stats():
+    if resources.chat is None:
+        return {}
+    return {name: policy.stats() for name, policy in resources.chat.policies.items()}
+
+
+@router.get("/admission-stats")
+async def admission_stats():
+    return {**upstream_slots.stats(), "connections": len(active_connections),
+            "max_connections": MAX_WEBSOCKET_CONNECTIONS}
 
-# Instantiate AarogyamChat
-chat = AarogyamChat()
 
 @router.websocket("/")
-async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
+async def websocket_endpoint(websocket: WebSocket, token: str = Query(...), stream: bool = Query(False)):
     # Verify JWT token to authenticate the user
     try:
-        payload = verify_jwt(str(token))
+        payload = await authenticate(str(token))
         user_id_from_payload = payload.get("id")
         user_email = payload.get("email")
 
         if not user_id_from_payload:
             raise HTTPException(status_code=400, detail="Invalid token: User ID not found.")
     except Exception as e:
-        print(f"JWT Verification Error: {str(e)}")
+        WEBSOCKET_EVENTS.labels("rejected").inc()
+        log_event(logger, "jwt_verification_failed", level=logging.WARNING, error=str(e))
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
     # Accept WebSocket connection and register the user
     await websocket.accept()
-    active_connections[user_id_from_payload] = websocket
+    if len(active_connections) >= MAX_WEBSOCKET_CONNECTIONS or upstream_slots.should_shed():
+        await shed(websocket, "connections" if len(active_connections) >= MAX_WEBSOCKET_CONNECTIONS else "shed")
+        return
+    active_connections[websocket] = user_id_from_payload
+    memory = ConversationMemory(user_id_from_payload, message_store=resources.message_store)
+    WEBSOCKET_EVENTS.labels("accepted").inc()
+    WEBSOCKET_CONNECTIONS.inc()
+    connected_at = time.perf_counter()
+    mode = "stream" if stream else "plain"
 
     try:
         while True:
             # Receive user message
             user_message = await websocket.receive_text()
 
-            print(user_message)
+            retry_after = user_rate_limiter.acquire(user_id_from_payload)
+            if retry_after:
+                CHAT_TURNS.labels(mode, "rate_limited").inc()
+                await reject_turn(websocket, stream, retry_after)
+                continue
+            # Too many calls already queued for the LLM: refuse new turns instead of letting every one time out
+            if upstream_slots.should_shed():
+                CHAT_TURNS.labels(mode, "shed").inc()
+                await shed(websocket, "shed")
+                break
 
-            # Save the user message in the database
+            with track_request() as timings:
+                started_at = time.perf_counter()
 
+                if stream:
+                    outcome = await stream_reply(websocket, user_id_from_payload, user_message, memory)
+                    log_turn(user_id_from_payload, mode, outcome, user_message, started_at, timings)
+                    continue
 
-            # Generate AI response using chat_with_model
-            ai_response, source_nodes = await chat.chat_with_model(user_message)
+                # Generate AI response using chat_with_model
+                chat = await resources.get_chat()
+                ai_response, source_nodes = await chat.chat_with_model(user_message, await memory.history(),
+                                                                       follow_up=memory.session_turns > 0)
 
-            print(ai_response)
+                # Persist the AI response in the database
+                await save_message(user_id_from_payload, user_message, str(ai_response), source_nodes)
 
-            db.message.insert_one({
-                "user_id": user_id_from_payload,
-                "message": user_message,
-                "reply": str(ai_response),
-                "source_nodes": source_nodes,
-            })
-            # Persist the AI response in the database
+                # Send AI response back to the user
+                await websocket.send_text(str(ai_response))
+                observe_stage("reply", time.perf_counter() - started_at)
 
-            # Send AI response back to the user
-            await websocket.send_text(str(ai_response))
+                await memory.add_turn(user_message, ai_response.message.content, summarize=chat.summarize_history)
+                log_turn(user_id_from_payload, mode, "ok", user_message, started_at, timings)
 
     except WebSocketDisconnect:
-        # Remove the connection from the active connections on disconnect
-        del active_connections[user_id_from_payload]
+        WEBSOCKET_EVENTS.labels("disconnected").inc()
+
+    except Overloaded as e:
+        # No upstream slot for this turn (queue full or the wait timed out), or an upstream is down
+        CHAT_TURNS.labels(mode, "shed").inc()
+        log_event(logger, "turn_shed", level=logging.WARNING, user_id=user_id_from_payload, error=str(e))
+        await shed(websocket, "overloaded")
 
     except Exception as e:
         # Handle other exceptions and close the WebSocket connection
-        print(f"Error during WebSocket communication: {str(e)}")
+        WEBSOCKET_EVENTS.labels("error").inc()
+        CHAT_TURNS.labels(mode, "error").inc()
+        log_event(logger, "websocket_error", level=logging.ERROR, exc_info=True, user_id=user_id_from_payload,
+                  error=str(e))
         await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+
+    finally:
+        # Remove the connection from the active connections on disconnect
+        active_connections.pop(websocket, None)
+        WEBSOCKET_CONNECTIONS.dec()
+        log_event(logger, "websocket_closed", user_id=user_id_from_payload,
+                  connected_seconds=round(time.perf_counter() - connected_at, 2))
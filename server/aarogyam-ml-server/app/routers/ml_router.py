@@ -1,25 +1,135 @@
+import asyncio
+import json
+import logging
+import os
+
 import numpy as np
-from fastapi import APIRouter, HTTPException, Depends
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from app.resources import resources
 from app.services.jwt_service import verify_jwt
+from app.utils.array_stream import (
+    BulkFormatError,
+    encode_predictions,
+    file_chunks,
+    ndjson_arrays,
+    npy_arrays,
+    spool_body,
+)
+from app.utils.log import get_logger, log_event
+
+load_dotenv()
+
+# Rows scored per inference call by the bulk endpoint, bounds its memory use
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "4096"))
+# Bytes of a bulk upload held in memory, the rest of the body is spooled to a temporary file
+BULK_SPOOL_MEMORY = int(os.getenv("BULK_SPOOL_MEMORY", str(8 * 1024 * 1024)))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+NPY_TYPES = ("application/x-npy", "application/octet-stream")
 
 router = APIRouter(dependencies=[Depends(verify_jwt)])
+logger = get_logger("ml")
 
 
 class PredictionRequest(BaseModel):
     data: list
 
 
-class PredictionResponse(BaseModel):
-    prediction: dict
+class ModelPredictionResponse(BaseModel):
+    model: str
+    predictions: list
+
+
+@router.get("/models")
+async def list_models():
+    return {"models": resources.models.names(), "batching": resources.models.stats()}
+
+
+async def stream_predictions(model, first, arrays, body):
+    loop = asyncio.get_running_loop()
+    executor = resources.models.executor
+    chunk, rows = first, 0
+    try:
+        while chunk is not None:
+            predictions = await loop.run_in_executor(executor, model.predict, chunk)
+            yield await loop.run_in_executor(executor, encode_predictions, predictions)
+            rows += len(chunk)
+            try:
+                chunk = await arrays.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+    except Exception as e:
+        # The 200 status is already sent, report the failure as the last line
+        log_event(logger, "bulk_prediction_failed", level=logging.ERROR, model=model.name, rows=rows, error=str(e))
+        detail = str(e) if isinstance(e, BulkFormatError) else "Prediction failed"
+        yield json.dumps({"error": detail, "rows_scored": rows}) + "\n"
+        return
+    finally:
+        body.close()
+    log_event(logger, "bulk_prediction", model=model.name, rows=rows)
+
+
+@router.post("/{model_name}/bulk")
+async def bulk_predict(model_name: str, request: Request):
+    """
+    Scores a large NDJSON (one JSON array of numbers per line) or .npy payload. The body is
+    parsed and scored BULK_CHUNK_ROWS rows at a time and the predictions are streamed back as
+    NDJSON, one line per row, so memory stays flat however many rows are sent.
+
+    The body is spooled (to disk past BULK_SPOOL_MEMORY) before the response starts: while a
+    StreamingResponse is sent, Starlette reads the request's messages to notice a disconnect,
+    which would swallow the rest of a body still being read.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        parse = ndjson_arrays
+    elif content_type in NPY_TYPES:
+        parse = npy_arrays
+    else:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson or application/x-npy")
+
+    try:
+        model = await resources.models.aget(model_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
 
+    body = await spool_body(request.stream(), BULK_SPOOL_MEMORY)
+    arrays = parse(file_chunks(body), BULK_CHUNK_ROWS)
 
-@router.post("/test", response_model=PredictionResponse)
-async def predict(request: PredictionRequest, payload: dict = Depends(verify_jwt)):
-    data = np.array(request.data)
-    print(request)
+    # Parse the first chunk before the response starts, so a malformed payload still gets a 422
     try:
-        return PredictionResponse(prediction=payload)
+        first = await arrays.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BulkFormatError as e:
+        body.close()
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return StreamingResponse(stream_predictions(model, first, arrays, body), media_type="application/x-ndjson")
+
+
+@router.post("/{model_name}", response_model=ModelPredictionResponse)
+async def predict_with_model(model_name: str, request: PredictionRequest):
+    try:
+        rows = np.asarray(request.data, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="data must be a rectangular array of numbers")
+    if rows.ndim == 1:
+        # A single row
+        rows = rows[None, :]
+    if rows.ndim < 2 or len(rows) == 0:
+        raise HTTPException(status_code=422, detail="data must contain at least one row")
+
+    try:
+        predictions = await resources.models.predict(model_name, rows)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        log_event(logger, "prediction_failed", level=logging.ERROR, model=model_name, rows=len(rows), error=str(e))
+        raise HTTPException(status_code=500, detail="Prediction failed")
+
+    return ModelPredictionResponse(model=model_name, predictions=predictions.tolist())
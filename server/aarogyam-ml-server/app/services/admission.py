@@ -0,0 +1,145 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+from dotenv import load_dotenv
+
+from app.services.metrics import ADMISSION_REJECTIONS, UPSTREAM_IN_FLIGHT, UPSTREAM_QUEUE_DEPTH, observe_stage
+
+load_dotenv()
+
+# LLM and embedding calls in flight at once, per worker, and the calls allowed to queue for a slot
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "16"))
+UPSTREAM_QUEUE_SIZE = int(os.getenv("UPSTREAM_QUEUE_SIZE", "256"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "30"))
+# New chat turns are refused once this many calls are queued, so the turns already running
+# (which need a second slot for the LLM after embedding) can still finish
+SHED_QUEUE_DEPTH = int(os.getenv("SHED_QUEUE_DEPTH", "128"))
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", "20"))
+USER_BURST = int(os.getenv("USER_BURST", "5"))
+MAX_WEBSOCKET_CONNECTIONS = int(os.getenv("MAX_WEBSOCKET_CONNECTIONS", "1000"))
+
+
+class Overloaded(Exception):
+    """
+    Raised when a call cannot get an upstream slot: the queue is full or the wait timed out.
+    """
+
+
+class FairSemaphore:
+    def __init__(self, limit=UPSTREAM_CONCURRENCY, max_queue=UPSTREAM_QUEUE_SIZE, queue_timeout=UPSTREAM_QUEUE_TIMEOUT,
+                 shed_depth=SHED_QUEUE_DEPTH):
+        """
+        Bounds the upstream calls in flight. Callers over the limit wait in a strict FIFO queue, a
+        released slot is handed straight to the oldest waiter, so no caller can overtake another.
+
+        Args:
+            limit (int): Calls in flight at once.
+            max_queue (int): Callers allowed to wait, the next one gets Overloaded right away.
+            queue_timeout (float): Seconds a caller waits for a slot before getting Overloaded.
+            shed_depth (int): Queue depth from which should_shed() tells new work to stay away.
+        """
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.shed_depth = shed_depth
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def should_shed(self):
+        return self.queue_depth >= self.shed_depth
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            UPSTREAM_IN_FLIGHT.set(self.active)
+            return
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTIONS.labels("queue_full").inc()
+            raise Overloaded("The upstream queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        UPSTREAM_QUEUE_DEPTH.set(len(self._waiters))
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as this caller gave up, pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                ADMISSION_REJECTIONS.labels("queue_timeout").inc()
+                raise Overloaded(f"No upstream slot within {self.queue_timeout}s") from None
+            raise
+        finally:
+            UPSTREAM_QUEUE_DEPTH.set(len(self._waiters))
+            observe_stage("upstream_queue", time.perf_counter() - started_at)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot moves to the waiter, the in-flight count stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+        UPSTREAM_IN_FLIGHT.set(self.active)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self):
+        return {"in_flight": self.active, "limit": self.limit, "queue_depth": self.queue_depth,
+                "max_queue": self.max_queue}
+
+
+class UserRateLimiter:
+    def __init__(self, rate_per_minute=USER_RATE_PER_MINUTE, burst=USER_BURST, max_users=100000):
+        """
+        A token bucket per user: ``burst`` messages at once, refilled at ``rate_per_minute``.
+        Only the most recently active max_users buckets are kept.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = OrderedDict()
+
+    def acquire(self, user_id):
+        """
+        Takes a token from the user's bucket.
+
+        Returns:
+            float: 0.0 if the message is allowed, otherwise the seconds until the next token.
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.rate if self.rate else float("inf")
+            ADMISSION_REJECTIONS.labels("rate_limited").inc()
+
+        self._buckets[user_id] = (tokens, now)
+        while len(self._buckets) > self.max_users:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Shared by every connection of the worker
+upstream_slots = FairSemaphore()
+user_rate_limiter = UserRateLimiter()
@@ -0,0 +1,110 @@
+import asyncio
+
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, executor, max_batch_size=64, max_wait_ms=5.0, max_concurrent_batches=2):
+        """
+        Coalesces concurrent prediction requests into single vectorised calls. Requests are
+        collected until max_batch_size rows are queued or the first one has waited max_wait_ms,
+        then the rows are concatenated, scored by one predict_fn call on the executor and the
+        predictions are split back per request.
+
+        Args:
+            predict_fn (callable): Maps a (rows, ...) array to a (rows, ...) array of predictions.
+            executor (Executor): Runs predict_fn off the event loop.
+            max_batch_size (int): Rows per predict_fn call, a larger request is scored on its own.
+            max_wait_ms (float): The longest a request waits for its batch to fill.
+            max_concurrent_batches (int): Batches scored at once; the next one fills meanwhile.
+        """
+        self.predict_fn = predict_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._queue = None
+        self._slots = None
+        self._worker = None
+        self._stats = {"requests": 0, "rows": 0, "batches": 0, "errors": 0}
+
+    async def submit(self, rows):
+        """
+        Scores the rows of one request.
+
+        Args:
+            rows (np.ndarray): A (rows, ...) input array.
+
+        Returns:
+            np.ndarray: The predictions for these rows, in order.
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.ensure_future(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((rows, future))
+        return await future
+
+    def stats(self):
+        batches = self._stats["batches"]
+        return {**self._stats, "avg_batch_rows": round(self._stats["rows"] / batches, 2) if batches else 0.0}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            batch, size = [item], len(item[0])
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch_size:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+
+            await self._slots.acquire()
+            asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            # Only requests with the same row shape can share a call
+            groups = {}
+            for rows, future in batch:
+                if not future.cancelled():
+                    groups.setdefault((rows.shape[1:], rows.dtype), []).append((rows, future))
+            for items in groups.values():
+                await self._predict(items)
+        finally:
+            self._slots.release()
+
+    async def _predict(self, items):
+        data = items[0][0] if len(items) == 1 else np.concatenate([rows for rows, _ in items])
+        try:
+            predictions = await asyncio.get_running_loop().run_in_executor(self.executor, self.predict_fn, data)
+        except Exception as e:
+            self._stats["errors"] += 1
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._stats["requests"] += len(items)
+        self._stats["rows"] += len(data)
+        self._stats["batches"] += 1
+
+        offset = 0
+        for rows, future in items:
+            if not future.done():
+                future.set_result(predictions[offset:offset + len(rows)])
+            offset += len(rows)
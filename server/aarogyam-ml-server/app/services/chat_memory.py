@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+from collections import deque
+
+from dotenv import load_dotenv
+
+from app.utils.log import get_logger, log_event
+from app.utils.tokenizer import count_tokens
+
+load_dotenv()
+
+logger = get_logger("chat_memory")
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+MEMORY_HYDRATE_MESSAGES = int(os.getenv("MEMORY_HYDRATE_MESSAGES", "10"))
+
+
+class ConversationMemory:
+    def __init__(self, user_id, message_store=None, token_budget=MEMORY_TOKEN_BUDGET,
+                 hydrate_messages=MEMORY_HYDRATE_MESSAGES, count_tokens=count_tokens):
+        """
+        The chat history of one WebSocket session. Each exchange is kept as a (question, reply,
+        token count) tuple; once the history goes over the token budget the oldest exchanges are
+        folded into a running summary, so the prompt stays bounded however long the session runs.
+
+        Args:
+            user_id: The id of the authenticated user.
+            message_store (MessageStore, optional): Loads the previous messages of the user on first use.
+            token_budget (int): The maximum number of history tokens (summary included) sent to the LLM.
+            hydrate_messages (int): The number of stored messages loaded when the session starts.
+            count_tokens (callable): Counts the tokens of a string.
+        """
+        self.user_id = user_id
+        self.message_store = message_store
+        self.token_budget = token_budget
+        self.hydrate_messages = hydrate_messages
+        self.count_tokens = count_tokens
+
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turns = deque()
+        self.turn_tokens = 0
+        # Exchanges of this session, the ones loaded from earlier sessions are not counted
+        self.session_turns = 0
+        self._hydrated = message_store is None
+        self._lock = asyncio.Lock()
+
+    @property
+    def tokens(self):
+        return self.summary_tokens + self.turn_tokens
+
+    async def history(self):
+        """
+        Returns the history as a list of {"role", "content"} dicts, loading the stored messages
+        of the user the first time it is called.
+        """
+        async with self._lock:
+            if not self._hydrated:
+                await self._hydrate()
+
+            messages = []
+            if self.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+            for question, reply, _ in self.turns:
+                messages.append({"role": "user", "content": question})
+                messages.append({"role": "assistant", "content": reply})
+            return messages
+
+    async def add_turn(self, question, reply, summarize=None):
+        """
+        Records an exchange and compacts the history if it is over budget.
+
+        Args:
+            question (str): The user message.
+            reply (str): The assistant reply.
+            summarize (callable, optional): Async callable (summary, turns) -> new summary. Without
+                it, or if it fails, the oldest exchanges are simply dropped.
+        """
+        async with self._lock:
+            self._append(question, reply)
+            self.session_turns += 1
+            await self._compact(summarize)
+
+    def _append(self, question, reply):
+        tokens = self.count_tokens(question) + self.count_tokens(reply)
+        self.turns.append((question, reply, tokens))
+        self.turn_tokens += tokens
+
+    async def _hydrate(self):
+        self._hydrated = True
+        loop = asyncio.get_running_loop()
+        try:
+            documents = await loop.run_in_executor(None, self.message_store.recent, self.user_id,
+                                                   self.hydrate_messages)
+        except Exception as e:
+            log_event(logger, "history_load_failed", level=logging.WARNING, user_id=self.user_id, error=str(e))
+            return
+
+        for document in documents:
+            self._append(document.get("message", ""), document.get("reply", ""))
+        # No LLM call while the user waits for the first answer, just keep what fits
+        await self._compact(None)
+
+    async def _compact(self, summarize):
+        if self.tokens <= self.token_budget:
+            return
+
+        # Fold the oldest exchanges until the recent ones fit in half the budget
+        folded = []
+        while self.turns and self.turn_tokens > self.token_budget // 2:
+            turn = self.turns.popleft()
+            self.turn_tokens -= turn[2]
+            folded.append(turn[:2])
+
+        if summarize is not None:
+            try:
+                self.summary = await summarize(self.summary, folded)
+                self.summary_tokens = self.count_tokens(self.summary)
+            except Exception as e:
+                log_event(logger, "history_summary_failed", level=logging.WARNING, user_id=self.user_id,
+                          error=str(e))
+
+        if self.tokens > self.token_budget:
+            self.summary, self.summary_tokens = "", 0
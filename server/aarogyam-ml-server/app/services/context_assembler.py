@@ -0,0 +1,137 @@
+import os
+import re
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.utils.tokenizer import get_tokenizer
+
+load_dotenv()
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Estimated shingle Jaccard similarity above which a chunk counts as a repeat of a better one
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.8"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "4096"))
+
+# The "Context Chunk i: " label and the newline around every chunk
+CHUNK_OVERHEAD_TOKENS = 6
+# A truncated chunk shorter than this is not worth its label
+MIN_TRUNCATED_TOKENS = 64
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# The splitmix64 finalizer, uint64 arithmetic wraps around
+MIX_1 = np.uint64(0xbf58476d1ce4e5b9)
+MIX_2 = np.uint64(0x94d049bb133111eb)
+
+
+class ContextAssembler:
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, dedupe_threshold=CONTEXT_DEDUPE_THRESHOLD,
+                 shingle_size=5, num_perm=64, cache_size=CONTEXT_CACHE_SIZE, tokenizer=None):
+        """
+        Turns the retrieved nodes into the context chunks of the prompt: near-duplicates are
+        dropped (MinHash over word shingles) and the best nodes are kept until the token budget
+        is spent, the first one that does not fit being cut at a token boundary.
+
+        Args:
+            token_budget (int): The maximum number of context tokens in a prompt.
+            dedupe_threshold (float): Estimated Jaccard similarity at which a chunk is a duplicate.
+            shingle_size (int): Words per shingle.
+            num_perm (int): Hash functions per MinHash signature.
+            cache_size (int): Chunks whose token count and signature are kept between turns.
+            tokenizer (Tokenizer, optional): A fast tokenizer, defaults to the shared one.
+        """
+        self.token_budget = token_budget
+        self.dedupe_threshold = dedupe_threshold
+        self.shingle_size = shingle_size
+        self.cache_size = cache_size
+        self._tokenizer = tokenizer
+
+        # One seed per hash function, each shingle hash is mixed with every seed
+        self._seeds = np.random.default_rng(0).integers(0, np.iinfo(np.uint64).max, size=(num_perm, 1),
+                                                        dtype=np.uint64)
+
+        # Chunk ids are derived from their content, so an id always maps to the same text
+        self._cache = OrderedDict()
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = get_tokenizer()
+        return self._tokenizer
+
+    def signature(self, text):
+        """
+        The MinHash signature of the text's word shingles.
+        """
+        words = WORD_PATTERN.findall(text.lower())
+        shingles = {" ".join(words[i:i + self.shingle_size])
+                    for i in range(max(len(words) - self.shingle_size + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64,
+                             count=len(shingles))
+        mixed = hashes ^ self._seeds
+        mixed = (mixed ^ (mixed >> np.uint64(30))) * MIX_1
+        mixed = (mixed ^ (mixed >> np.uint64(27))) * MIX_2
+        return (mixed ^ (mixed >> np.uint64(31))).min(axis=1)
+
+    def _features(self, key, text):
+        features = self._cache.get(key)
+        if features is None:
+            features = (len(self.tokenizer.encode(text, add_special_tokens=False).ids), self.signature(text))
+            self._cache[key] = features
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return features
+
+    def truncate(self, text, max_tokens):
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        return text[:encoding.offsets[max_tokens - 1][1]].rstrip()
+
+    def assemble(self, nodes):
+        """
+        Selects the context chunks for a prompt.
+
+        Args:
+            nodes (list): The retrieved NodeWithScore list.
+
+        Returns:
+            tuple: The chunk texts, best first, and a dict with the context token count and the
+                number of chunks dropped as duplicates or over the budget.
+        """
+        # Retrievers return their nodes best first already, a stable sort keeps that order on ties
+        ranked = sorted(nodes, key=lambda node: node.score if node.score is not None else float("-inf"),
+                        reverse=True)
+
+        chunks, signatures = [], []
+        tokens, duplicates, trimmed, full = 0, 0, 0, False
+        for node in ranked:
+            if full:
+                trimmed += 1
+                continue
+
+            text = node.get_content()
+            chunk_tokens, signature = self._features(node.node.node_id, text)
+            if any(np.mean(signature == kept) >= self.dedupe_threshold for kept in signatures):
+                duplicates += 1
+                continue
+
+            remaining = self.token_budget - tokens - CHUNK_OVERHEAD_TOKENS
+            if chunk_tokens > remaining:
+                full = True
+                trimmed += 1
+                # The best chunk always goes in, a later one only if enough of it fits
+                if remaining >= MIN_TRUNCATED_TOKENS or (not chunks and remaining > 0):
+                    chunks.append(self.truncate(text, remaining))
+                    tokens += remaining + CHUNK_OVERHEAD_TOKENS
+                continue
+
+            chunks.append(text)
+            signatures.append(signature)
+            tokens += chunk_tokens + CHUNK_OVERHEAD_TOKENS
+
+        return chunks, {"context_tokens": tokens, "chunks": len(chunks), "duplicates": duplicates,
+                        "trimmed": trimmed}
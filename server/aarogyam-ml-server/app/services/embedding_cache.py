@@ -0,0 +1,218 @@
+import atexit
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, List
+
+import numpy as np
+from dotenv import load_dotenv
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")  # e.g. /data/embedding_cache.npz
+
+
+def normalize_text(text):
+    # Collapse whitespace and case so trivially different spellings of a query share an entry
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def cache_key(model_name, kind, text):
+    # The model is part of the key: a shared or persisted cache may hold the vectors of several models
+    key = f"{model_name}\0{kind}\0{normalize_text(text)}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingStore:
+    def __init__(self, max_entries):
+        """
+        Bounded LRU map from a 16-byte key to an embedding, stored as rows of one float32 matrix.
+
+        Args:
+            max_entries (int): The maximum number of embeddings kept in memory.
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()  # key -> row in self._matrix, least recently used first
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._matrix = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, key):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            self._rows.move_to_end(key)
+            return self._matrix[row].tolist()
+
+    def put(self, key, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._rows.clear()
+                self._free_rows = list(range(self.max_entries - 1, -1, -1))
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            row = self._rows.pop(key, None)
+            if row is None:
+                if not self._free_rows:
+                    _, evicted_row = self._rows.popitem(last=False)
+                    self._free_rows.append(evicted_row)
+                row = self._free_rows.pop()
+
+            self._matrix[row] = vector
+            self._rows[key] = row
+
+    def save(self, path):
+        with self._lock:
+            if self._matrix is None:
+                return
+            keys = np.array(list(self._rows.keys()), dtype="S16")
+            vectors = self._matrix[list(self._rows.values())]
+
+        # Write to a temporary file first so a crash never leaves a truncated cache behind
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, keys=keys, vectors=vectors)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        with np.load(path) as data:
+            keys, vectors = data["keys"], data["vectors"]
+        # Keep the most recently used entries if the file holds more than fits
+        for key, vector in zip(keys[-self.max_entries:], vectors[-self.max_entries:]):
+            self.put(bytes(key), vector)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model with an exact-match cache on the normalized text, so repeated
+    queries and unchanged chunks are never sent to the remote embedding API twice.
+    """
+
+    _model: BaseEmbedding = PrivateAttr()
+    _store: EmbeddingStore = PrivateAttr()
+    _persist_path: Any = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+    _miss_seconds: float = PrivateAttr(default=0.0)
+
+    def __init__(self, model, max_entries=EMBEDDING_CACHE_SIZE, persist_path=EMBEDDING_CACHE_PATH, **kwargs):
+        """
+        Args:
+            model (BaseEmbedding): The embedding model to cache.
+            max_entries (int): The maximum number of cached embeddings.
+            persist_path (str, optional): A .npz file the cache is loaded from and saved to at exit.
+        """
+        super().__init__(model_name=model.model_name, embed_batch_size=model.embed_batch_size, **kwargs)
+        self._model = model
+        self._store = EmbeddingStore(max_entries)
+        self._persist_path = persist_path
+
+        if persist_path:
+            if os.path.exists(persist_path):
+                self._store.load(persist_path)
+            atexit.register(self.persist)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def persist(self):
+        if self._persist_path:
+            self._store.save(self._persist_path)
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        avg_miss_ms = self._miss_seconds * 1000 / self._misses if self._misses else 0.0
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "entries": len(self._store),
+            "avg_miss_ms": avg_miss_ms,
+            "saved_ms": self._hits * avg_miss_ms,
+        }
+
+    def _lookup(self, kind, texts):
+        keys = [cache_key(self.model_name, kind, text) for text in texts]
+        embeddings = [self._store.get(key) for key in keys]
+
+        # Only the first occurrence of each uncached text is sent to the model
+        missing, seen = [], set()
+        for i, embedding in enumerate(embeddings):
+            if embedding is None and keys[i] not in seen:
+                seen.add(keys[i])
+                missing.append(i)
+
+        self._hits += len(texts) - len(missing)
+        self._misses += len(missing)
+        return keys, embeddings, missing
+
+    def _fill(self, keys, embeddings, missing, computed, started_at):
+        self._miss_seconds += time.perf_counter() - started_at
+        computed_by_key = {}
+        for i, embedding in zip(missing, computed):
+            self._store.put(keys[i], embedding)
+            computed_by_key[keys[i]] = embedding
+
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                embeddings[i] = computed_by_key[keys[i]]
+        return embeddings
+
+    def cached_query_embedding(self, query):
+        """
+        Returns the cached embedding of the query, or None without counting a miss (the call to
+        the model that follows counts it).
+        """
+        embedding = self._store.get(cache_key(self.model_name, "query", query))
+        if embedding is not None:
+            self._hits += 1
+        return embedding
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        keys, embeddings, missing = self._lookup("query", [query])
+        if missing:
+            started_at = time.perf_counter()
+            computed = [self._model.get_query_embedding(query)]
+            self._fill(keys, embeddings, missing, computed, started_at)
+        return embeddings[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        keys, embeddings, missing = self._lookup("query", [query])
+        if missing:
+            started_at = time.perf_counter()
+            computed = [await self._model.aget_query_embedding(query)]
+            self._fill(keys, embeddings, missing, computed, started_at)
+        return embeddings[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys, embeddings, missing = self._lookup("text", texts)
+        if missing:
+            started_at = time.perf_counter()
+            computed = self._model.get_text_embedding_batch([texts[i] for i in missing])
+            self._fill(keys, embeddings, missing, computed, started_at)
+        return embeddings
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys, embeddings, missing = self._lookup("text", texts)
+        if missing:
+            started_at = time.perf_counter()
+            computed = await self._model.aget_text_embedding_batch([texts[i] for i in missing])
+            self._fill(keys, embeddings, missing, computed, started_at)
+        return embeddings
@@ -1,4 +1,9 @@
+import asyncio
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 
 import jwt
 from dotenv import load_dotenv
@@ -9,14 +14,140 @@ load_dotenv()
 # Define the OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET")
+# HS256 with JWT_SECRET, or an asymmetric algorithm (RS256, ES256, ...) with the keys published at JWT_JWKS_URL
+JWT_JWKS_URL = os.getenv("JWT_JWKS_URL")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "RS256" if JWT_JWKS_URL else "HS256")
+JWT_JWKS_LIFESPAN = float(os.getenv("JWT_JWKS_LIFESPAN", "300"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "300"))
 
 
-def verify_jwt(token: str = Depends(oauth2_scheme)):
+class SecretVerifier:
+    # Pure CPU work, a few microseconds
+    blocking = False
+
+    def __init__(self, secret, algorithm="HS256"):
+        self.secret = secret
+        self.algorithm = algorithm
+
+    def decode(self, token):
+        return jwt.decode(token, self.secret, algorithms=[self.algorithm])
+
+
+class JWKSVerifier:
+    # Fetching an unknown key is a network call
+    blocking = True
+
+    def __init__(self, url, algorithm="RS256", lifespan=JWT_JWKS_LIFESPAN):
+        """
+        Verifies tokens signed with asymmetric keys. The key set and the keys picked from it are
+        cached, so the JWKS endpoint is only called again after ``lifespan`` seconds or for a new kid.
+        """
+        self.algorithm = algorithm
+        self.client = jwt.PyJWKClient(url, cache_keys=True, cache_jwk_set=True, lifespan=lifespan)
+
+    def decode(self, token):
+        key = self.client.get_signing_key_from_jwt(token).key
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+class TokenCache:
+    def __init__(self, max_entries=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL):
+        """
+        Size-bounded LRU of verified token payloads, keyed by the SHA-256 of the token. An entry
+        is kept for ``ttl`` seconds, and never past the token's own ``exp``.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() >= entry[1]:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return dict(entry[0])
+
+    def put(self, token, payload):
+        expires_at = time.time() + self.ttl
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(payload), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self._hits + self._misses
+        return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0}
+
+
+def create_verifier(jwks_url=JWT_JWKS_URL, algorithm=JWT_ALGORITHM, secret=JWT_SECRET_KEY):
+    if jwks_url:
+        # A public key read as an HMAC secret would fail every token, refuse to start instead
+        if algorithm.upper().startswith("HS"):
+            raise ValueError(f"JWT_ALGORITHM {algorithm} needs JWT_SECRET, JWT_JWKS_URL publishes asymmetric keys")
+        return JWKSVerifier(jwks_url, algorithm=algorithm)
+    return SecretVerifier(secret, algorithm=algorithm)
+
+
+verifier = create_verifier()
+token_cache = TokenCache()
+
+
+def verify_token(token):
+    """
+    Returns the payload of a valid token, raising a jwt.PyJWTError otherwise.
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verifier.decode(token)
+        token_cache.put(token, payload)
+    return payload
+
+
+async def authenticate(token):
+    """
+    verify_token for async callers: a cached token is answered on the event loop, a JWKS lookup
+    runs on the default executor.
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    if verifier.blocking:
+        payload = await asyncio.get_running_loop().run_in_executor(None, verifier.decode, token)
+    else:
+        payload = verifier.decode(token)
+    token_cache.put(token, payload)
+    return payload
+
+
+async def verify_jwt(token: str = Depends(oauth2_scheme)):
+    # FastAPI caches a dependency per request: the router-level and endpoint-level uses run it once
     try:
         # Decode the JWT token
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
-        return payload
+        payload = await authenticate(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+
+    return payload
@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# From cache hits and local retrieval (milliseconds) to long LLM generations (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prompt sizes, from a short context-only prompt to a long conversation
+TOKEN_BUCKETS = (128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 6144, 8192)
+
+STAGE_SECONDS = Histogram(
+    "aarogyam_chat_stage_seconds", "Latency of each stage of a chat turn.", ["stage"], buckets=LATENCY_BUCKETS,
+)
+CHAT_TURNS = Counter(
+    "aarogyam_chat_turns_total", "Chat turns handled, by delivery mode and outcome.", ["mode", "outcome"],
+)
+PROMPT_TOKENS = Histogram(
+    "aarogyam_chat_prompt_tokens", "Tokens sent to the LLM per chat turn, by prompt part.", ["part"],
+    buckets=TOKEN_BUCKETS,
+)
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "aarogyam_semantic_cache_lookups_total", "Semantic cache lookups, by result.", ["result"],
+)
+SINGLE_FLIGHT_CALLS = Counter(
+    "aarogyam_chat_single_flight_total",
+    "Chat queries by single-flight role: leader (ran the pipeline) or follower (shared a leader's result).",
+    ["role"],
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "aarogyam_websocket_connections", "Open chat WebSocket connections.",
+)
+WEBSOCKET_EVENTS = Counter(
+    "aarogyam_websocket_events_total", "WebSocket lifecycle events.", ["event"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "aarogyam_admission_rejections_total", "Chat turns and connections refused by admission control, by reason.",
+    ["reason"],
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "aarogyam_upstream_in_flight", "LLM and embedding calls in flight.",
+)
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    "aarogyam_upstream_queue_depth", "LLM and embedding calls waiting for a slot.",
+)
+UPSTREAM_CALLS = Counter(
+    "aarogyam_upstream_calls_total",
+    "Calls to the LLM, embedding and vector store upstreams, by outcome: ok, retry, hedged, error, "
+    "rejected (circuit open) or degraded (served by local retrieval).",
+    ["upstream", "outcome"],
+)
+UPSTREAM_CIRCUIT_STATE = Gauge(
+    "aarogyam_upstream_circuit_state", "Circuit breaker state per upstream: 0 closed, 1 half open, 2 open.",
+    ["upstream"],
+)
+MESSAGE_STORE_PENDING = Gauge(
+    "aarogyam_message_store_pending", "Chat messages queued for the write-behind Mongo writer.",
+)
+
+# The stage timings of the chat turn being handled, collected for its log line
+_request_timings = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def track_request():
+    """
+    Collects the stage timings (and any annotate() fields) recorded while the block runs.
+
+    Yields:
+        dict: Stage name + "_ms" -> milliseconds, plus the annotated fields.
+    """
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+    timings = _request_timings.get()
+    if timings is not None:
+        key = f"{stage}_ms"
+        timings[key] = round(timings.get(key, 0.0) + seconds * 1000, 2)
+
+
+def annotate(**fields):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.update(fields)
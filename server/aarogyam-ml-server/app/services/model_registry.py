@@ -0,0 +1,108 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from app.models.ml_model import MODEL_EXTENSIONS, MLModel
+from app.services.batching import MicroBatcher
+
+load_dotenv()
+
+ML_MODELS_DIR = os.getenv("ML_MODELS_DIR", "ml_models")
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(os.cpu_count() or 1)))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+
+class ModelRegistry:
+    def __init__(self, model_dir=ML_MODELS_DIR, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                 threads=INFERENCE_THREADS):
+        """
+        The models served by this worker, each loaded once from model_dir (files named
+        <model>.onnx, <model>.joblib or <model>.pkl) and fronted by its own MicroBatcher.
+
+        Args:
+            model_dir (str): The directory holding the model files.
+            max_batch_size (int): Rows per batched inference call.
+            max_wait_ms (float): The longest a request waits for its batch to fill.
+            threads (int): Inference threads shared by all models.
+        """
+        self.model_dir = model_dir
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.threads = threads
+
+        self._models = {}
+        self._batchers = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="inference")
+        return self._executor
+
+    def available(self):
+        """
+        Returns the model files found in model_dir, by model name.
+        """
+        if not os.path.isdir(self.model_dir):
+            return {}
+        return {os.path.splitext(name)[0]: os.path.join(self.model_dir, name)
+                for name in sorted(os.listdir(self.model_dir)) if name.endswith(MODEL_EXTENSIONS)}
+
+    def names(self):
+        return sorted(set(self.available()) | set(self._models))
+
+    def register(self, model):
+        """
+        Serves an already loaded MLModel, e.g. one built in memory by a benchmark.
+        """
+        with self._lock:
+            self._models[model.name] = model
+
+    def get(self, name):
+        """
+        Returns the model, loading it on first use. Raises KeyError for an unknown model.
+        """
+        with self._lock:
+            if name not in self._models:
+                path = self.available().get(name)
+                if path is None:
+                    raise KeyError(name)
+                self._models[name] = MLModel.load(path)
+            return self._models[name]
+
+    def load_all(self):
+        for name in self.available():
+            self.get(name)
+
+    async def aget(self, name):
+        if name not in self._models:
+            # Loading can take seconds, keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.get, name)
+        return self._models[name]
+
+    async def predict(self, name, rows):
+        """
+        Scores a request's rows with the named model, batched with concurrent requests.
+        """
+        await self.aget(name)
+
+        batcher = self._batchers.get(name)
+        if batcher is None:
+            batcher = MicroBatcher(self._models[name].predict, self.executor, max_batch_size=self.max_batch_size,
+                                   max_wait_ms=self.max_wait_ms, max_concurrent_batches=self.threads)
+            self._batchers[name] = batcher
+        return await batcher.submit(rows)
+
+    def stats(self):
+        return {name: batcher.stats() for name, batcher in self._batchers.items()}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,91 @@
+import os
+import threading
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "colbert-ir/colbertv2.0")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+
+
+class ColbertReranker:
+    def __init__(self, model_name=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE, query_max_length=32,
+                 doc_max_length=512):
+        """
+        Late-interaction (ColBERT MaxSim) reranker running on the CPU. The query is encoded once
+        and the candidate chunks are encoded in padded batches, so a rerank is a handful of
+        forward passes instead of one per chunk.
+
+        Args:
+            model_name (str): The Hugging Face Hub name of the ColBERT checkpoint.
+            batch_size (int): The number of chunks encoded per forward pass.
+            query_max_length (int): Query tokens kept for scoring.
+            doc_max_length (int): Chunk tokens kept for scoring.
+        """
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError:
+            raise ImportError("Reranking needs torch and transformers: pip install torch transformers")
+
+        self._torch = torch
+        self.batch_size = batch_size
+        self.query_max_length = query_max_length
+        self.doc_max_length = doc_max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        # One forward pass at a time, parallel calls would only fight over the same cores
+        self._lock = threading.Lock()
+
+    def _encode(self, texts, max_length):
+        encoding = self.tokenizer(texts, padding=True, truncation=True, max_length=max_length,
+                                  return_tensors="pt")
+        embeddings = self.model(**encoding).last_hidden_state
+        return self._torch.nn.functional.normalize(embeddings, dim=-1), encoding["attention_mask"].bool()
+
+    def score(self, query, texts):
+        """
+        Returns the MaxSim score of every text against the query, in input order.
+        """
+        torch = self._torch
+        scores = []
+        with self._lock, torch.inference_mode():
+            query_embeddings, query_mask = self._encode([query], self.query_max_length)
+            query_embeddings = query_embeddings[0][query_mask[0]]
+
+            for start in range(0, len(texts), self.batch_size):
+                doc_embeddings, doc_mask = self._encode(texts[start:start + self.batch_size], self.doc_max_length)
+                # (batch, query tokens, doc tokens) cosine similarities, padding masked out
+                similarities = torch.einsum("qh,bdh->bqd", query_embeddings, doc_embeddings)
+                similarities = similarities.masked_fill(~doc_mask[:, None, :], -1.0)
+                scores.extend(similarities.max(dim=2).values.mean(dim=1).tolist())
+        return scores
+
+    def rerank(self, query, nodes, top_n):
+        """
+        Orders retrieved nodes by their score against the query.
+
+        Args:
+            query (str): The search query.
+            nodes (list): NodeWithScore candidates.
+            top_n (int): The number of nodes to keep.
+
+        Returns:
+            list: The top_n best nodes, with their rerank score.
+        """
+        if not nodes:
+            return []
+
+        scores = self.score(query, [node.node.get_content() for node in nodes])
+        ranked = sorted(zip(nodes, scores), key=lambda pair: pair[1], reverse=True)[:top_n]
+        for node, score in ranked:
+            node.score = score
+        return [node for node, _ in ranked]
+
+
+@lru_cache(maxsize=None)
+def get_reranker(model_name=RERANK_MODEL):
+    # Loaded once per process, the model takes seconds to load and hundreds of MB of memory
+    return ColbertReranker(model_name)
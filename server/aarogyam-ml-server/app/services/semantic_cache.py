@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SEMANTIC_CACHE_BACKEND = os.getenv("SEMANTIC_CACHE_BACKEND", "memory")  # memory | mongodb | none
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+SEMANTIC_CACHE_GENERATION_CHECK = float(os.getenv("SEMANTIC_CACHE_GENERATION_CHECK", "30"))
+
+SEMANTIC_CACHE_COLLECTION = "semantic_cache"
+INDEX_META_COLLECTION = "rag_index_meta"
+INDEX_NAME = "aarogyam-chat-rag"
+
+
+def normalize(embedding):
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class InMemoryCacheBackend:
+    def __init__(self, max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        """
+        Size-bounded LRU store of cached answers. Embeddings live in one preallocated float32
+        matrix so a lookup is a single matrix-vector product.
+
+        Args:
+            max_entries (int): The maximum number of cached answers before the least recently used is evicted.
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> entry, least recently used first
+        self._rows = {}  # key -> row in self._matrix
+        self._row_keys = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._matrix = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def nearest(self, embedding):
+        """
+        Finds the cached entry whose embedding is most similar to the given normalized embedding.
+
+        Returns:
+            tuple: The entry (or None if the cache is empty) and its cosine similarity.
+        """
+        with self._lock:
+            if not self._entries or self._matrix is None or self._matrix.shape[1] != embedding.shape[0]:
+                return None, 0.0
+
+            scores = self._matrix @ embedding
+            scores[~self._valid] = -np.inf
+            row = int(np.argmax(scores))
+            return self._entries[self._row_keys[row]], float(scores[row])
+
+    def touch(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def put(self, entry):
+        """
+        Stores an entry, evicting the least recently used ones if the cache is full.
+
+        Returns:
+            list: The keys of the evicted entries.
+        """
+        embedding = entry["embedding"]
+        evicted = []
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != embedding.shape[0]:
+                # First entry (or the embedding model changed): size the matrix for this dimension
+                self._reset(embedding.shape[0])
+
+            while not self._free_rows:
+                old_key, _ = self._entries.popitem(last=False)
+                self._release(old_key)
+                evicted.append(old_key)
+
+            row = self._free_rows.pop()
+            self._matrix[row] = embedding
+            self._valid[row] = True
+            self._rows[entry["key"]] = row
+            self._row_keys[row] = entry["key"]
+            self._entries[entry["key"]] = entry
+        return evicted
+
+    def remove(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._release(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows.clear()
+            self._row_keys = [None] * self.max_entries
+            self._free_rows = list(range(self.max_entries - 1, -1, -1))
+            self._valid[:] = False
+
+    def _reset(self, dim):
+        self._entries.clear()
+        self._rows.clear()
+        self._row_keys = [None] * self.max_entries
+        self._free_rows = list(range(self.max_entries - 1, -1, -1))
+        self._valid[:] = False
+        self._matrix = np.zeros((self.max_entries, dim), dtype=np.float32)
+
+    def _release(self, key):
+        row = self._rows.pop(key)
+        self._row_keys[row] = None
+        self._valid[row] = False
+        self._free_rows.append(row)
+
+
+class MongoCacheBackend(InMemoryCacheBackend):
+    def __init__(self, collection, max_entries=SEMANTIC_CACHE_MAX_ENTRIES, ttl=SEMANTIC_CACHE_TTL):
+        """
+        Write-through MongoDB backend: entries are shared across workers and survive restarts,
+        while lookups are served from the in-process mirror loaded at start-up.
+
+        Args:
+            collection (Collection): The pymongo collection holding the cached answers.
+            max_entries (int): The maximum number of cached answers.
+            ttl (float): Seconds after which MongoDB expires an entry.
+        """
+        super().__init__(max_entries)
+        self.collection = collection
+        self.collection.create_index("created_at", expireAfterSeconds=int(ttl))
+
+        for doc in self.collection.find().sort("created_at", -1).limit(max_entries):
+            super().put({
+                "key": doc["_id"],
+                "embedding": np.frombuffer(doc["embedding"], dtype=np.float32),
+                "reply": doc["reply"],
+                "source_nodes": doc["source_nodes"],
+                "created_at": doc["created_at"].replace(tzinfo=timezone.utc).timestamp(),
+            })
+
+    def put(self, entry):
+        evicted = super().put(entry)
+        self.collection.insert_one({
+            "_id": entry["key"],
+            "embedding": entry["embedding"].tobytes(),
+            "reply": entry["reply"],
+            "source_nodes": entry["source_nodes"],
+            "created_at": datetime.fromtimestamp(entry["created_at"], tz=timezone.utc),
+        })
+        if evicted:
+            self.collection.delete_many({"_id": {"$in": evicted}})
+        return evicted
+
+    def remove(self, key):
+        super().remove(key)
+        self.collection.delete_one({"_id": key})
+
+    def clear(self):
+        super().clear()
+        self.collection.delete_many({})
+
+
+class SemanticCache:
+    def __init__(self, backend, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=SEMANTIC_CACHE_TTL,
+                 generation_source=None, generation_check_interval=SEMANTIC_CACHE_GENERATION_CHECK):
+        """
+        Caches chat answers keyed on the query embedding, so near-duplicate questions skip
+        retrieval and generation.
+
+        Args:
+            backend (InMemoryCacheBackend): Where the entries are stored.
+            threshold (float): Minimum cosine similarity for a cached answer to be reused.
+            ttl (float): Seconds a cached answer stays valid.
+            generation_source (callable, optional): Returns the current index generation; the cache
+                is cleared whenever it changes (i.e. the vector index was repopulated).
+            generation_check_interval (float): Seconds between two generation checks.
+        """
+        self.backend = backend
+        self.threshold = threshold
+        self.ttl = ttl
+        self.generation_source = generation_source
+        self.generation_check_interval = generation_check_interval
+        self.hits = 0
+        self.misses = 0
+        self._generation = generation_source() if generation_source else None
+        self._generation_checked_at = time.monotonic()
+
+    def lookup(self, embedding):
+        """
+        Returns the cached entry for a query embedding, or None on a miss.
+        """
+        self._check_generation()
+
+        entry, score = self.backend.nearest(normalize(embedding))
+        if entry is not None and time.time() - entry["created_at"] > self.ttl:
+            self.backend.remove(entry["key"])
+            entry = None
+
+        if entry is None or score < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.backend.touch(entry["key"])
+        return entry
+
+    def store(self, embedding, reply, source_nodes):
+        self.backend.put({
+            "key": uuid.uuid4().hex,
+            "embedding": normalize(embedding),
+            "reply": reply,
+            "source_nodes": source_nodes,
+            "created_at": time.time(),
+        })
+
+    def invalidate(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
+
+    def _check_generation(self):
+        if self.generation_source is None:
+            return
+        if time.monotonic() - self._generation_checked_at < self.generation_check_interval:
+            return
+
+        self._generation_checked_at = time.monotonic()
+        generation = self.generation_source()
+        if generation != self._generation:
+            self._generation = generation
+            self.invalidate()
+
+
+def get_index_generation(db):
+    doc = db[INDEX_META_COLLECTION].find_one({"_id": INDEX_NAME})
+    return doc["generation"] if doc else 0
+
+
+def bump_index_generation(db):
+    """
+    Marks the vector index as repopulated: every server drops its cached answers on its next
+    generation check, and the shared MongoDB cache is emptied right away.
+    """
+    db[INDEX_META_COLLECTION].update_one({"_id": INDEX_NAME}, {"$inc": {"generation": 1}}, upsert=True)
+    db[SEMANTIC_CACHE_COLLECTION].delete_many({})
+
+
+def create_semantic_cache(get_db):
+    """
+    Builds the semantic cache selected by SEMANTIC_CACHE_BACKEND, or None when it is disabled.
+
+    Args:
+        get_db (callable): Returns the MongoDB database. Called once the cache is built, to read
+            the index generation (both backends are cleared when the index is repopulated), and
+            for the mongodb backend's collection.
+
+    Returns:
+        SemanticCache: The cache, or None.
+    """
+    if SEMANTIC_CACHE_BACKEND == "none":
+        return None
+    if SEMANTIC_CACHE_BACKEND == "mongodb":
+        backend = MongoCacheBackend(get_db()[SEMANTIC_CACHE_COLLECTION])
+    elif SEMANTIC_CACHE_BACKEND == "memory":
+        backend = InMemoryCacheBackend()
+    else:
+        raise ValueError(f"Unknown SEMANTIC_CACHE_BACKEND: {SEMANTIC_CACHE_BACKEND}")
+
+    return SemanticCache(backend, generation_source=lambda: get_index_generation(get_db()))
@@ -0,0 +1,126 @@
+import asyncio
+import functools
+
+from app.services.metrics import SINGLE_FLIGHT_CALLS, annotate
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesces concurrent calls with the same key: the first caller (the leader) runs the
+        call, the callers arriving while it is in flight (the followers) await the same result.
+        """
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, func, until=None, joinable=None):
+        """
+        Runs func() unless a call with the same key is in flight, and returns its result.
+
+        Args:
+            key (Hashable): Identifies identical calls.
+            func (callable): A coroutine function, called without arguments.
+            until (callable, optional): Maps the result to an awaitable; the key stays in flight
+                until it completes, so late callers can still join (e.g. a stream still being produced).
+            joinable (callable, optional): Tells whether a finished call's result can still be shared;
+                when it returns False the call is run again (e.g. a stream every subscriber left, which
+                stays in flight until its upstream is closed).
+
+        Returns:
+            Any: Whatever func() returns, the same object for every caller.
+        """
+        future = self._calls.get(key)
+        if future is not None and joinable is not None and future.done() and not future.cancelled() \
+                and future.exception() is None and not joinable(future.result()):
+            # The new call takes the key over, _release leaves it alone when the old one ends
+            future = None
+        if future is None:
+            self.leaders += 1
+            SINGLE_FLIGHT_CALLS.labels("leader").inc()
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(functools.partial(self._finished, key, until))
+        else:
+            self.followers += 1
+            SINGLE_FLIGHT_CALLS.labels("follower").inc()
+            annotate(coalesced=True)
+
+        # A caller that goes away (a closed WebSocket) must not cancel the call the others wait for
+        return await asyncio.shield(future)
+
+    def _finished(self, key, until, future):
+        if until is None or future.cancelled() or future.exception() is not None:
+            self._release(key, future)
+            return
+        waiter = asyncio.ensure_future(until(future.result()))
+        waiter.add_done_callback(lambda _: self._release(key, future))
+
+    def _release(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    def stats(self):
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "followers": self.followers}
+
+
+class StreamFanout:
+    def __init__(self, source):
+        """
+        Reads an async iterator once, in a background task, and replays it to any number of
+        subscribers. A subscriber joining late first gets the items already produced. Production
+        stops if every subscriber leaves before the end.
+
+        Args:
+            source (AsyncIterator): The stream to share, e.g. the LLM's text deltas.
+        """
+        self._source = source
+        self._items = []
+        self._error = None
+        self._done = False
+        self._subscribers = 0
+        # Every subscriber left before the end, production is being stopped
+        self.abandoned = False
+        self._changed = asyncio.Event()
+        self.finished = asyncio.ensure_future(self._pump())
+
+    async def _pump(self):
+        try:
+            async for item in self._source:
+                self._items.append(item)
+                self._notify()
+        except asyncio.CancelledError:
+            self._error = ConnectionAbortedError("Every subscriber left the stream")
+        except Exception as e:
+            self._error = e
+        finally:
+            # Stops the upstream generation too when the stream is abandoned
+            aclose = getattr(self._source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self):
+        self._subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(self._items):
+                    position += 1
+                    yield self._items[position - 1]
+                elif self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._done:
+                self.abandoned = True
+                self.finished.cancel()
@@ -0,0 +1,284 @@
+import asyncio
+import os
+import random
+import time
+
+import httpx
+import openai
+import urllib3
+from dotenv import load_dotenv
+
+from app.services.admission import Overloaded
+from app.services.metrics import UPSTREAM_CALLS, UPSTREAM_CIRCUIT_STATE
+
+try:
+    import h2  # noqa: F401 (httpx needs it for HTTP/2)
+except ImportError:
+    h2 = None
+
+load_dotenv()
+
+# One keep-alive pool per worker for the NVIDIA endpoints, multiplexed over HTTP/2 when h2 is installed
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "64"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "32"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "60"))
+
+# Retries of a failed call, waiting a random time up to base * 2^attempt (capped) in between
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "2"))
+
+# Consecutive failures that open a circuit, and how long it stays open before one probe call is let through
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Per-attempt timeouts of the idempotent calls, so a hung request is retried within the turn's deadline
+EMBED_ATTEMPT_TIMEOUT = float(os.getenv("EMBED_ATTEMPT_TIMEOUT", "3"))
+RETRIEVAL_ATTEMPT_TIMEOUT = float(os.getenv("RETRIEVAL_ATTEMPT_TIMEOUT", "3"))
+# A vector store query still running after this many seconds gets a duplicate, 0 disables hedging
+RETRIEVAL_HEDGE_DELAY = float(os.getenv("RETRIEVAL_HEDGE_DELAY", "0.3"))
+
+# Status codes that say "try again", anything else is the request's own fault
+TRANSIENT_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    TimeoutError,
+    httpx.TransportError,
+    openai.APIConnectionError,
+    urllib3.exceptions.HTTPError,
+)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_http_clients = {}
+
+
+class UpstreamUnavailable(Overloaded):
+    """
+    Raised when an upstream's circuit is open or a call still fails after its retries.
+    """
+
+
+def is_transient(error):
+    """
+    Whether a failed call may succeed if tried again: connection errors, timeouts and
+    overload / server error statuses (OpenAI SDK, httpx and Pinecone exceptions).
+    """
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status in TRANSIENT_STATUS
+
+
+def http_client_options():
+    return {
+        "http2": UPSTREAM_HTTP2 and h2 is not None,
+        "limits": httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS,
+                               max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+                               keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY),
+        "timeout": httpx.Timeout(UPSTREAM_READ_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+    }
+
+
+def get_http_client():
+    """
+    The worker's pooled httpx.Client, for the SDK calls made from worker threads.
+    """
+    if "sync" not in _http_clients:
+        _http_clients["sync"] = httpx.Client(**http_client_options())
+    return _http_clients["sync"]
+
+
+def get_async_http_client():
+    """
+    The worker's pooled httpx.AsyncClient, shared by the NVIDIA LLM and embedding clients.
+    """
+    if "async" not in _http_clients:
+        _http_clients["async"] = httpx.AsyncClient(**http_client_options())
+    return _http_clients["async"]
+
+
+async def close_http_clients():
+    client = _http_clients.pop("async", None)
+    if client is not None:
+        await client.aclose()
+    client = _http_clients.pop("sync", None)
+    if client is not None:
+        client.close()
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_SECONDS):
+        """
+        Stops calling an upstream that keeps failing. After failure_threshold consecutive
+        failures the circuit opens and calls fail fast; once reset_timeout has passed a single
+        probe call is let through, closing the circuit again if it succeeds.
+
+        Args:
+            name (str): The upstream, used as the metrics label.
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a probe.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        UPSTREAM_CIRCUIT_STATE.labels(name).set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state):
+        self.state = state
+        UPSTREAM_CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+
+    def allow(self):
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            # Only one probe at a time, the others keep failing fast until it comes back
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def release(self):
+        # The call ended without saying anything about the upstream (cancelled, or a bad request)
+        self._probing = False
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures}
+
+
+class UpstreamPolicy:
+    def __init__(self, name, retries=UPSTREAM_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 attempt_timeout=None, hedge_delay=None, breaker=None):
+        """
+        How calls to one upstream are made: each attempt goes through the circuit breaker, a
+        transient failure is retried after a jittered exponential backoff, and a slow attempt
+        can be hedged with a second identical request.
+
+        Args:
+            name (str): The upstream, used as the metrics label.
+            retries (int): Extra attempts after a transient failure, for idempotent calls only.
+            base_delay (float): Backoff of the first retry, in seconds, doubled on every retry.
+            max_delay (float): Cap of the backoff, in seconds.
+            attempt_timeout (float, optional): Seconds before an attempt counts as failed.
+            hedge_delay (float, optional): Seconds after which a still-running attempt gets a
+                concurrent duplicate, the first to succeed wins. Only for idempotent reads.
+            breaker (CircuitBreaker, optional): Defaults to a breaker of its own.
+        """
+        self.name = name
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.hedge_delay = hedge_delay
+        self.breaker = breaker or CircuitBreaker(name)
+        self.counts = {}
+
+    def _count(self, outcome):
+        UPSTREAM_CALLS.labels(self.name, outcome).inc()
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def backoff(self, attempt):
+        # "Full jitter": retries of many callers spread out instead of arriving together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, func, idempotent=True, hedge=False):
+        """
+        Calls func() under the policy.
+
+        Args:
+            func (callable): A coroutine function, called without arguments for every attempt.
+            idempotent (bool): Safe to send more than once, enables retries.
+            hedge (bool): Hedge slow attempts (needs hedge_delay and an idempotent call).
+
+        Returns:
+            Any: Whatever func() returns.
+
+        Raises:
+            UpstreamUnavailable: The circuit is open or every attempt failed transiently.
+        """
+        attempts = self.retries + 1 if idempotent else 1
+        hedge = hedge and idempotent and self.hedge_delay is not None
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise UpstreamUnavailable(f"The {self.name} circuit is open")
+            try:
+                result = await (self._hedged(func) if hedge else self._attempt(func))
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 == attempts:
+                    self._count("error")
+                    raise UpstreamUnavailable(f"{self.name} failed: {e!r}") from e
+                self._count("retry")
+                await asyncio.sleep(self.backoff(attempt))
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                self._count("ok")
+                return result
+
+    async def _attempt(self, func):
+        if self.attempt_timeout is None:
+            return await func()
+        return await asyncio.wait_for(func(), self.attempt_timeout)
+
+    async def _hedged(self, func):
+        tasks = [asyncio.ensure_future(self._attempt(func))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                self._count("hedged")
+                tasks.append(asyncio.ensure_future(self._attempt(func)))
+
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # The loser is cancelled (a call running on a worker thread still finishes there)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        return {**self.breaker.stats(), **self.counts}
+
+
+# Shared by every chat pipeline of the worker, so an outage seen by one turn fails the next ones fast
+llm_policy = UpstreamPolicy("llm")
+embed_policy = UpstreamPolicy("embed", attempt_timeout=EMBED_ATTEMPT_TIMEOUT)
+retrieval_policy = UpstreamPolicy("vector_store", attempt_timeout=RETRIEVAL_ATTEMPT_TIMEOUT,
+                                  hedge_delay=RETRIEVAL_HEDGE_DELAY or None)
@@ -0,0 +1,202 @@
+import asyncio
+import io
+import json
+import struct
+import tempfile
+import warnings
+
+import numpy as np
+
+NPY_MAGIC = b"\x93NUMPY"
+# Bytes read from a spooled body at a time
+SPOOL_READ_SIZE = 1 << 16
+
+# np.fromstring warns when it stops at something that is not a number, parse_ndjson_rows detects
+# that itself (warnings.catch_warnings is not thread-safe, and the parsing runs on worker threads)
+warnings.filterwarnings("ignore", message="string or file could not be read to its end", category=DeprecationWarning)
+
+
+class BulkFormatError(ValueError):
+    pass
+
+
+def parse_ndjson_rows(lines, n_features):
+    """
+    Parses NDJSON lines of the form "[1.0, 2.5, 3]" into one (rows, n_features) float64 array
+    with a single C-level parse, no per-element Python objects.
+    """
+    for line in lines:
+        if line.count(b",") != n_features - 1:
+            raise BulkFormatError(f"Every row must have {n_features} values")
+
+    text = b",".join(line.strip().strip(b"[]") for line in lines).decode("ascii", errors="replace")
+    try:
+        # numpy stops at the first thing that is not a number: the trailing sentinel is only read
+        # when every value before it was
+        values = np.fromstring(text + ",0", dtype=np.float64, sep=",")
+    except ValueError:
+        raise BulkFormatError("Rows must be JSON arrays of numbers")
+
+    if values.size != len(lines) * n_features + 1:
+        raise BulkFormatError("Rows must be JSON arrays of numbers")
+    return values[:-1].reshape(len(lines), n_features)
+
+
+async def ndjson_arrays(chunks, chunk_rows):
+    """
+    Turns a stream of NDJSON bytes into (chunk_rows, n_features) arrays as the bytes arrive.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body.
+        chunk_rows (int): Rows per yielded array (the last one may be shorter).
+    """
+    loop = asyncio.get_running_loop()
+    pending, lines, n_features = b"", [], None
+
+    async def parse(batch):
+        # Parsing thousands of rows takes milliseconds, keep it off the event loop
+        return await loop.run_in_executor(None, parse_ndjson_rows, batch, n_features)
+
+    async for data in chunks:
+        *complete, pending = (pending + data).split(b"\n")
+        lines.extend(line for line in complete if line.strip())
+        if n_features is None and lines:
+            n_features = lines[0].count(b",") + 1
+
+        while len(lines) >= chunk_rows:
+            batch, lines = lines[:chunk_rows], lines[chunk_rows:]
+            yield await parse(batch)
+
+    if pending.strip():
+        lines.append(pending)
+        if n_features is None:
+            n_features = lines[0].count(b",") + 1
+    if lines:
+        yield await parse(lines)
+
+
+def parse_npy_header(buffer):
+    """
+    Reads a .npy header from the start of buffer.
+
+    Returns:
+        tuple: (shape, dtype, header length in bytes), or None if the header is not complete yet.
+    """
+    if len(buffer) < 10:
+        return None
+    if bytes(buffer[:6]) != NPY_MAGIC:
+        raise BulkFormatError("Not a .npy payload")
+
+    major = buffer[6]
+    if major == 1:
+        header_length = 10 + struct.unpack("<H", bytes(buffer[8:10]))[0]
+    elif major in (2, 3):
+        if len(buffer) < 12:
+            return None
+        header_length = 12 + struct.unpack("<I", bytes(buffer[8:12]))[0]
+    else:
+        raise BulkFormatError(f"Unsupported .npy version {major}")
+    if len(buffer) < header_length:
+        return None
+
+    file = io.BytesIO(bytes(buffer[:header_length]))
+    np.lib.format.read_magic(file)
+    if major == 1:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+
+    if fortran_order or dtype.kind not in "biuf" or not shape:
+        raise BulkFormatError("The array must be C-ordered, numeric and at least one-dimensional")
+    if any(dim < 0 for dim in shape):
+        raise BulkFormatError("The array shape must not be negative")
+    # A row of zero bytes could never be read
+    if 0 in shape[1:]:
+        raise BulkFormatError("Every row must hold at least one value")
+    return shape, dtype, header_length
+
+
+async def npy_arrays(chunks, chunk_rows):
+    """
+    Turns a streamed .npy payload into arrays of chunk_rows rows, reading rows straight out of
+    the received bytes. A one-dimensional array is read as one value per row.
+    """
+    buffer = bytearray()
+    header, row_shape, row_bytes, rows_read = None, None, None, 0
+
+    async for data in chunks:
+        buffer += data
+        if header is None:
+            header = parse_npy_header(buffer)
+            if header is None:
+                continue
+            shape, dtype, header_length = header
+            row_shape = shape[1:] or (1,)
+            row_bytes = int(np.prod(row_shape)) * dtype.itemsize
+            del buffer[:header_length]
+
+        while len(buffer) >= chunk_rows * row_bytes:
+            size = chunk_rows * row_bytes
+            yield np.frombuffer(buffer[:size], dtype=dtype).reshape((chunk_rows,) + row_shape)
+            del buffer[:size]
+            rows_read += chunk_rows
+
+    if header is None:
+        raise BulkFormatError("Incomplete .npy header")
+    if len(buffer) % row_bytes or rows_read + len(buffer) // row_bytes != shape[0]:
+        raise BulkFormatError(f"The payload does not hold the {shape[0]} rows its header declares")
+    if buffer:
+        yield np.frombuffer(bytes(buffer), dtype=dtype).reshape((-1,) + row_shape)
+
+
+async def spool_body(chunks, max_memory):
+    """
+    Reads a request body into a SpooledTemporaryFile, kept in memory up to max_memory bytes and
+    moved to disk past that.
+
+    Returns:
+        SpooledTemporaryFile: The body, rewound. The caller closes it.
+    """
+    loop = asyncio.get_running_loop()
+    file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        async for data in chunks:
+            # Once rolled over to disk a write can block
+            await loop.run_in_executor(None, file.write, data)
+        file.seek(0)
+    except BaseException:
+        file.close()
+        raise
+    return file
+
+
+async def file_chunks(file, size=SPOOL_READ_SIZE):
+    """
+    Reads a file as a stream of bytes, like a request body.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        data = await loop.run_in_executor(None, file.read, size)
+        if not data:
+            return
+        yield data
+
+
+def encode_predictions(predictions):
+    """
+    Formats predictions as NDJSON, one line per row: a number, or an array for multi-output models.
+    """
+    predictions = np.asarray(predictions)
+    if predictions.dtype.kind in "iub":
+        fmt = "%d"
+    elif predictions.dtype.kind == "f":
+        fmt = "%.7g" if predictions.dtype.itemsize <= 4 else "%.17g"
+    else:
+        # String class labels and the like
+        return "".join(json.dumps(row) + "\n" for row in predictions.tolist())
+
+    buffer = io.StringIO()
+    np.savetxt(buffer, predictions.reshape(len(predictions), -1), fmt=fmt, delimiter=",")
+    if predictions.ndim == 1:
+        return buffer.getvalue()
+    return "".join(f"[{line}]\n" for line in buffer.getvalue().splitlines())
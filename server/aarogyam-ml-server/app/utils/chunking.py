@@ -0,0 +1,124 @@
+import os
+import re
+
+from dotenv import load_dotenv
+
+from app.utils.tokenizer import get_tokenizer
+
+load_dotenv()
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+
+# "# Title" and "## Section" lines written by WisdomLibScraper
+HEADING_PATTERN = re.compile(r"^(#{1,2})[ \t]+(.*?)[ \t]*$", re.MULTILINE)
+
+
+def split_sections(text):
+    """
+    Splits a scraped Markdown page on its headings.
+
+    Args:
+        text (str): The Markdown text.
+
+    Returns:
+        tuple: The page title (the first "# " heading) and a list of (section heading, body) pairs.
+    """
+    title = ""
+    heading = ""
+    sections = []
+    position = 0
+
+    for match in HEADING_PATTERN.finditer(text):
+        body = text[position:match.start()].strip()
+        if body:
+            sections.append((heading, body))
+
+        if match.group(1) == "#" and not title:
+            title, heading = match.group(2), ""
+        else:
+            heading = match.group(2)
+        position = match.end()
+
+    body = text[position:].strip()
+    if body:
+        sections.append((heading, body))
+    return title, sections
+
+
+class MarkdownChunker:
+    def __init__(self, max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP_TOKENS, tokenizer=None):
+        """
+        Splits Markdown documents into overlapping, token-bounded chunks. Every section is covered
+        in full, chunks never span two sections, and the page title and section heading are kept
+        as chunk metadata.
+
+        Args:
+            max_tokens (int): The maximum number of tokens in a chunk.
+            overlap (int): The number of tokens shared by two consecutive chunks of a section.
+            tokenizer (Tokenizer, optional): A fast tokenizer, defaults to the shared one.
+        """
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("overlap must be smaller than max_tokens")
+
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        return self._tokenizer or get_tokenizer()
+
+    def chunk(self, text):
+        """
+        Returns the chunks of one document as dicts with "text" and "metadata" keys.
+        """
+        return self.chunk_batch([text])[0]
+
+    def chunk_batch(self, texts):
+        """
+        Chunks several documents with a single batch encode call.
+
+        Args:
+            texts (list): The Markdown documents.
+
+        Returns:
+            list: One list of chunks per document.
+        """
+        parsed = [split_sections(text) for text in texts]
+        bodies = [body for _, sections in parsed for _, body in sections]
+        encodings = iter(self.tokenizer.encode_batch(bodies, add_special_tokens=False))
+
+        results = []
+        for title, sections in parsed:
+            chunks = []
+            for heading, body in sections:
+                # Token offsets map every window back to a slice of the original text
+                offsets = next(encodings).offsets
+                for start, end in self._windows(body, offsets):
+                    chunk_text = body[offsets[start][0]:offsets[end - 1][1]].strip()
+                    if chunk_text:
+                        chunks.append({"text": chunk_text, "metadata": {"title": title, "section": heading}})
+            results.append(chunks)
+        return results
+
+    def _windows(self, body, offsets):
+        n_tokens = len(offsets)
+        start = 0
+        while start < n_tokens:
+            end = min(start + self.max_tokens, n_tokens)
+            if end < n_tokens:
+                # Prefer to cut between words, as long as the window stays at least half full
+                end = next((i for i in range(end, start + self.max_tokens // 2, -1)
+                            if _starts_word(body, offsets, i)), end)
+            yield start, end
+            if end == n_tokens:
+                break
+
+            next_start = max(end - self.overlap, start + 1)
+            start = next((i for i in range(next_start, end) if _starts_word(body, offsets, i)), next_start)
+
+
+def _starts_word(body, offsets, i):
+    char = offsets[i][0]
+    return char == 0 or body[char].isspace() or body[char - 1].isspace()
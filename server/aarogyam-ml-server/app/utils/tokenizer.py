@@ -0,0 +1,36 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+from tokenizers import Tokenizer
+
+load_dotenv()
+
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "gpt2")
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name=TOKENIZER_NAME):
+    """
+    Loads the Rust-backed tokenizer once per process.
+
+    Args:
+        name (str): The Hugging Face Hub name of the tokenizer, or the path of a local tokenizer.json.
+
+    Returns:
+        Tokenizer: The shared tokenizer instance.
+    """
+    # A local file lets offline environments (CI, air-gapped hosts) skip the Hub download
+    if os.path.isfile(name):
+        return Tokenizer.from_file(name)
+    return Tokenizer.from_pretrained(name)
+
+
+def count_tokens(text, tokenizer=None):
+    tokenizer = tokenizer or get_tokenizer()
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def count_tokens_batch(texts, tokenizer=None):
+    tokenizer = tokenizer or get_tokenizer()
+    return [len(encoding.ids) for encoding in tokenizer.encode_batch(list(texts), add_special_tokens=False)]
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import jwt
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+# Make the server package importable from the benchmarks directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.jwt_service import verify_jwt
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+def uncached_verify_jwt(token: str = Depends(oauth2_scheme)):
+    # The previous dependency: a sync HS256 decode on the thread pool for every use
+    try:
+        return jwt.decode(token, os.environ["JWT_SECRET"], algorithms=["HS256"])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+
+def build_app(dependency):
+    app = FastAPI()
+    if dependency is None:
+        router = APIRouter()
+
+        @router.post("/predict")
+        async def predict():
+            return {}
+    else:
+        # Same layout as ml_router: router-level dependency plus the payload parameter
+        router = APIRouter(dependencies=[Depends(dependency)])
+
+        @router.post("/predict")
+        async def predict(payload: dict = Depends(dependency)):
+            return {}
+
+    app.include_router(router)
+    return app
+
+
+async def measure(app, token, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            response = await client.post("/predict")
+            assert response.status_code == 200, response.text
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])  # Warm up
+        remaining = iter(range(requests))
+        started_at = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        return (time.perf_counter() - started_at) / requests * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the per-request cost of JWT authentication")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    token = jwt.encode({"id": "bench-user", "email": "bench@example.com", "exp": int(time.time()) + 3600},
+                       os.environ["JWT_SECRET"], algorithm="HS256")
+
+    baseline = asyncio.run(measure(build_app(None), token, args.requests, args.concurrency))
+    results = {
+        "uncached": asyncio.run(measure(build_app(uncached_verify_jwt), token, args.requests,
+                                                        args.concurrency)),
+        "cached": asyncio.run(measure(build_app(verify_jwt), token, args.requests,
+                                                     args.concurrency)),
+    }
+
+    print(f"{'no auth':<26} {baseline:8.1f} us/request")
+    for name, micros in results.items():
+        print(f"{name:<26} {micros:8.1f} us/request   auth overhead {micros - baseline:7.1f} us")
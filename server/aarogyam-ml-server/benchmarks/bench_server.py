@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+
+# Make the server package importable from the benchmarks directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Values per row sent by load_test.py to the predict endpoint
+PREDICT_FEATURES = 3
+
+
+def add_arguments(parser):
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-token-ms", type=float, default=15.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--embed-ms", type=float, default=40.0)
+    parser.add_argument("--corpus-size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+
+
+def build_chat(args):
+    """
+    The production AarogyamChat pipeline, with the network-bound components replaced by local stand-ins.
+    """
+    from app.models import AarogyamChat
+    from fakes import FakeEmbedding, FakeLLM, build_vector_store
+
+    return AarogyamChat(
+        llm=FakeLLM(first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms,
+                    reply_tokens=args.reply_tokens),
+        embed_model=FakeEmbedding(dim=args.dim, latency_ms=args.embed_ms),
+        vector_store=build_vector_store(args.corpus_size, args.dim),
+        semantic_cache=None,
+        retrieval_mode="simple",
+    )
+
+
+def serve(args):
+    # Imported here so load_test.py can share add_arguments without loading the app
+    import uvicorn
+
+    # fakes first: it points TOKENIZER_NAME at the bundled tokenizer before the app reads it
+    from fakes import InMemoryCollection
+    from app.db.message_store import MessageStore
+    from app.main import app
+    from app.resources import resources
+    from inference_benchmark import synthetic_model
+
+    resources.chat = build_chat(args)
+    # Served as /api/ml_service/v1/predict/synthetic, through the registry's MicroBatcher
+    resources.models.register(synthetic_model(PREDICT_FEATURES, 64, 1))
+    resources.message_store = MessageStore(collection=InMemoryCollection())
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the FastAPI app with fake LLM, embedding and vector store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    add_arguments(parser)
+    serve(parser.parse_args())
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Make the server package importable from the benchmarks directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# fakes first: it points TOKENIZER_NAME at the bundled tokenizer before the app reads it
+from fakes import FakeEmbedding, FakeLLM, build_vector_store
+from app.models import AarogyamChat
+
+# Spellings of the same question, coalesced after normalisation
+VARIANTS = ["What is Ayurveda?", "what is ayurveda", "What is  Ayurveda ?", "WHAT IS AYURVEDA?!"]
+
+
+def build_chat(args, coalesce):
+    return AarogyamChat(
+        llm=FakeLLM(first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms,
+                    reply_tokens=args.reply_tokens),
+        embed_model=FakeEmbedding(dim=args.dim, latency_ms=args.embed_ms),
+        vector_store=build_vector_store(args.corpus_size, args.dim),
+        semantic_cache=None,
+        retrieval_mode="simple",
+        coalesce=coalesce,
+    )
+
+
+async def ask(chat, query, stream, delay):
+    await asyncio.sleep(delay)
+    if not stream:
+        response, _ = await chat.chat_with_model(query)
+        return response.message.content
+
+    deltas, _ = await chat.stream_chat_with_model(query)
+    return "".join([delta async for delta in deltas])
+
+
+async def run(chat, args, stream):
+    # Clients arrive spread over the first half of the reply, late ones join a stream in progress
+    spread = args.llm_first_token_ms / 1000 / 2
+    started_at = time.perf_counter()
+    replies = await asyncio.gather(*[ask(chat, VARIANTS[i % len(VARIANTS)], stream, spread * i / args.clients)
+                                     for i in range(args.clients)])
+    return replies, time.perf_counter() - started_at
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that concurrent identical questions make one LLM call")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-token-ms", type=float, default=15.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--embed-ms", type=float, default=40.0)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    failed = False
+    for stream in (False, True):
+        for coalesce in (False, True):
+            chat = build_chat(args, coalesce)
+            replies, elapsed = asyncio.run(run(chat, args, stream))
+            expected_calls = 1 if coalesce else args.clients
+            ok = chat.llm.calls == expected_calls and len(set(replies)) == 1 and replies[0]
+            failed |= not ok
+
+            mode = "stream" if stream else "chat"
+            print(f"{mode:<7} coalesce={str(coalesce):<5} {args.clients} clients: {chat.llm.calls:3d} LLM calls "
+                  f"in {elapsed:.2f}s  {'ok' if ok else 'FAILED'}")
+    sys.exit(1 if failed else 0)
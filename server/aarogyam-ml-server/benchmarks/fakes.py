@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import (
+    ChatMessage,
+    ChatResponse,
+    CompletionResponse,
+    CustomLLM,
+    LLMMetadata,
+)
+from llama_index.core.schema import TextNode
+
+# The bundled tokenizer (see fixtures/make_tokenizer.py), so token counting needs no Hub download.
+# Set before the app modules are imported, they read TOKENIZER_NAME once.
+TOKENIZER_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "tokenizer.json")
+os.environ.setdefault("TOKENIZER_NAME", TOKENIZER_FIXTURE)
+
+from app.db.local_vector_store import LocalVectorStore  # noqa: E402
+
+REPLY_WORDS = ("Ayurveda", "recommends", "a", "balanced", "diet", "warm", "water", "rest", "and", "herbs")
+
+
+class FakeLLM(CustomLLM):
+    """
+    Stands in for the NVIDIA LLM: waits first_token_ms before the first token, then token_ms
+    between tokens, without blocking the event loop.
+    """
+
+    first_token_ms: float = 300.0
+    token_ms: float = 15.0
+    reply_tokens: int = 60
+    # Generations started, to check how many LLM calls a run made
+    calls: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake-llm", is_chat_model=True)
+
+    def _reply_words(self):
+        return [REPLY_WORDS[i % len(REPLY_WORDS)] + " " for i in range(self.reply_tokens)]
+
+    def _total_seconds(self):
+        return (self.first_token_ms + self.token_ms * max(self.reply_tokens - 1, 0)) / 1000
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        self.calls += 1
+        time.sleep(self._total_seconds())
+        return CompletionResponse(text="".join(self._reply_words()))
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        self.calls += 1
+        text = ""
+        for i, word in enumerate(self._reply_words()):
+            time.sleep((self.first_token_ms if i == 0 else self.token_ms) / 1000)
+            text += word
+            yield CompletionResponse(text=text, delta=word)
+
+    async def achat(self, messages, **kwargs: Any) -> ChatResponse:
+        self.calls += 1
+        await asyncio.sleep(self._total_seconds())
+        return ChatResponse(message=ChatMessage(role="assistant", content="".join(self._reply_words())))
+
+    async def astream_chat(self, messages, **kwargs: Any):
+        self.calls += 1
+        async def gen():
+            text = ""
+            for i, word in enumerate(self._reply_words()):
+                await asyncio.sleep((self.first_token_ms if i == 0 else self.token_ms) / 1000)
+                text += word
+                yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=word)
+
+        return gen()
+
+
+def fake_vector(text, dim):
+    # Deterministic: the same text always gets the same vector
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    Stands in for NVIDIAEmbedding: deterministic random vectors after latency_ms.
+    """
+
+    dim: int = 1024
+    latency_ms: float = 40.0
+
+    def _get_query_embedding(self, query: str):
+        time.sleep(self.latency_ms / 1000)
+        return fake_vector(query, self.dim).tolist()
+
+    def _get_text_embedding(self, text: str):
+        return self._get_query_embedding(text)
+
+    async def _aget_query_embedding(self, query: str):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return fake_vector(query, self.dim).tolist()
+
+
+def build_vector_store(corpus_size, dim, seed=0):
+    """
+    A LocalVectorStore filled with corpus_size synthetic chunks.
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((corpus_size, dim)).astype(np.float32)
+    nodes = [
+        TextNode(id_=f"chunk-{i}", text=f"Synthetic Ayurveda passage {i}. " + " ".join(REPLY_WORDS) * 20,
+                 embedding=embeddings[i].tolist())
+        for i in range(corpus_size)
+    ]
+    store = LocalVectorStore()
+    store.add(nodes)
+    return store
+
+
+class InMemoryCollection:
+    """
+    The subset of a pymongo collection used by MessageStore, so runs need no MongoDB.
+    """
+
+    def __init__(self):
+        self.documents = []
+
+    def create_index(self, keys, **kwargs):
+        return "_".join(key for key, _ in keys)
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+    def find(self, query, projection=None):
+        return _Cursor([document for document in self.documents
+                        if all(document.get(key) == value for key, value in query.items())])
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
@@ -0,0 +1,26 @@
+import os
+
+from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+
+# Regenerates tokenizer.json: a small byte-level BPE tokenizer, so the benchmarks (and the tests)
+# count tokens offline instead of downloading "gpt2" from the Hugging Face Hub. Byte-level means it
+# encodes any text, counts are only a rough stand-in for the production tokenizer's.
+CORPUS = [
+    "What is ayurveda? Ayurveda recommends a balanced diet, warm water, rest and herbs.",
+    "I have not slept in 4 days, is there any risk to my health?",
+    "Which herbs help with digestion? Ginger, cumin and triphala support agni.",
+    "How do I balance vata dosha in winter? Favour warm, moist and grounding food.",
+    "I have a headache which medicine i can take? Rest and consult a physician.",
+    "What should I eat for breakfast if I have a pitta constitution? Cooling foods.",
+    "The physician should prescribe it with warm water, honey or ghee after meals and observe the patient "
+    "for seven days according to the strength of the body and the season.",
+    "Context Chunk 1: Synthetic Ayurveda passage. Summary of the earlier conversation: the user asked.",
+]
+
+if __name__ == "__main__":
+    tokenizer = Tokenizer(models.BPE(unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    trainer = trainers.BpeTrainer(vocab_size=600, special_tokens=["[UNK]"],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    tokenizer.train_from_iterator(CORPUS * 20, trainer=trainer)
+    tokenizer.save(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokenizer.json"))
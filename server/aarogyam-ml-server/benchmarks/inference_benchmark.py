@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Make the server package importable from the benchmarks directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.models.ml_model import MLModel
+from app.services.batching import MicroBatcher
+
+
+def synthetic_model(features, hidden, outputs, seed=0):
+    """
+    A two-layer NumPy MLP, standing in for a served model when no model file is given.
+    """
+    rng = np.random.default_rng(seed)
+    w1 = rng.standard_normal((features, hidden)).astype(np.float32) / np.sqrt(features)
+    w2 = rng.standard_normal((hidden, hidden)).astype(np.float32) / np.sqrt(hidden)
+    w3 = rng.standard_normal((hidden, outputs)).astype(np.float32) / np.sqrt(hidden)
+
+    def predict_fn(data):
+        hidden_1 = np.maximum(data @ w1, 0)
+        hidden_2 = np.maximum(hidden_1 @ w2, 0)
+        return hidden_2 @ w3
+
+    return MLModel("synthetic", predict_fn)
+
+
+async def run_clients(score, clients, requests, features):
+    latencies = []
+    remaining = iter(range(requests))
+    rng = np.random.default_rng(1)
+    inputs = rng.standard_normal((64, 1, features))
+
+    async def client():
+        for i in remaining:
+            started_at = time.perf_counter()
+            await score(inputs[i % len(inputs)])
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(clients)])
+    elapsed = time.perf_counter() - started_at
+    latencies.sort()
+    return {
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+async def benchmark(model, args):
+    executor = ThreadPoolExecutor(max_workers=args.threads)
+
+    async def per_request(rows):
+        return await asyncio.get_running_loop().run_in_executor(executor, model.predict, rows)
+
+    batcher = MicroBatcher(model.predict, executor, max_batch_size=args.max_batch_size,
+                           max_wait_ms=args.max_wait_ms, max_concurrent_batches=args.threads)
+
+    # Warm up both paths outside of the timed runs
+    await run_clients(per_request, args.clients, args.clients, args.features)
+    await run_clients(batcher.submit, args.clients, args.clients, args.features)
+
+    results = {
+        "per-request": await run_clients(per_request, args.clients, args.requests, args.features),
+        "batched": await run_clients(batcher.submit, args.clients, args.requests, args.features),
+    }
+    executor.shutdown()
+    return results, batcher.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-request and micro-batched model inference")
+    parser.add_argument("--model", help="A .onnx, .joblib or .pkl model file, defaults to a synthetic NumPy MLP")
+    parser.add_argument("--features", type=int, default=64, help="Input features per row")
+    parser.add_argument("--hidden", type=int, default=512, help="Hidden units of the synthetic model")
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=5000, help="Total single-row requests per mode")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Inference threads")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = MLModel.load(args.model) if args.model else synthetic_model(args.features, args.hidden, 8)
+    results, batch_stats = asyncio.run(benchmark(model, args))
+
+    for mode, result in results.items():
+        print(f"{mode:<12} {result['throughput_rps']:>10.1f} req/s   p50 {result['p50_ms']:.2f}ms   "
+              f"p99 {result['p99_ms']:.2f}ms")
+    speedup = results["batched"]["throughput_rps"] / results["per-request"]["throughput_rps"]
+    print(f"Batched throughput: {speedup:.1f}x per-request, {batch_stats['avg_batch_rows']} rows per batch on average")
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import jwt
+import websockets
+
+from bench_server import PREDICT_FEATURES, add_arguments
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+JWT_SECRET = "benchmark-secret"
+
+QUESTIONS = [
+    "What is ayurveda?",
+    "I have not slept in 4 days, is there any risk to my health?",
+    "Which herbs help with digestion?",
+    "How do I balance vata dosha in winter?",
+    "I have a headache which medicine i can take?",
+    "What should I eat for breakfast if I have a pitta constitution?",
+]
+
+
+def make_token(user_id, secret):
+    return jwt.encode({"id": user_id, "email": f"{user_id}@example.com"}, secret, algorithm="HS256")
+
+
+def percentile(values, q):
+    # Nearest-rank percentile, fine for the few thousand samples of a run
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def summarize(samples, elapsed):
+    latencies = [sample["latency_ms"] for sample in samples if sample["ok"]]
+    first_tokens = [sample["ttft_ms"] for sample in samples if sample["ok"] and sample.get("ttft_ms") is not None]
+    summary = {
+        "requests": len(samples),
+        "errors": sum(not sample["ok"] for sample in samples),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    for name, values in (("latency_ms", latencies), ("ttft_ms", first_tokens)):
+        if values:
+            summary[name] = {f"p{q}": round(percentile(values, q), 1) for q in (50, 95, 99)}
+    return summary
+
+
+async def websocket_client(ws_url, token, stream, messages, samples):
+    url = f"{ws_url}/chatbot/?token={token}&stream={'true' if stream else 'false'}"
+    async with websockets.connect(url, max_size=None) as websocket:
+        for i in range(messages):
+            started_at = time.perf_counter()
+            await websocket.send(QUESTIONS[i % len(QUESTIONS)])
+
+            if not stream:
+                await websocket.recv()
+                latency_ms = (time.perf_counter() - started_at) * 1000
+                samples.append({"ok": True, "latency_ms": latency_ms, "ttft_ms": latency_ms})
+                continue
+
+            first_token_ms = None
+            while True:
+                frame = json.loads(await websocket.recv())
+                if frame["type"] == "delta" and first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started_at) * 1000
+                if frame["type"] in ("end", "error"):
+                    break
+            samples.append({"ok": frame["type"] == "end", "ttft_ms": first_token_ms,
+                            "latency_ms": (time.perf_counter() - started_at) * 1000})
+
+
+async def run_websocket_load(ws_url, secret, clients, messages, stream):
+    samples = []
+    started_at = time.perf_counter()
+    results = await asyncio.gather(*[
+        websocket_client(ws_url, make_token(f"bench-user-{i}", secret), stream, messages, samples)
+        for i in range(clients)
+    ], return_exceptions=True)
+    elapsed = time.perf_counter() - started_at
+
+    summary = summarize(samples, elapsed)
+    summary["client_failures"] = sum(isinstance(result, Exception) for result in results)
+    return summary
+
+
+async def run_http_load(http_url, secret, clients, requests):
+    samples = []
+    headers = {"Authorization": f"Bearer {make_token('bench-http', secret)}"}
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            started_at = time.perf_counter()
+            try:
+                response = await client.post("/api/ml_service/v1/predict/synthetic",
+                                             json={"data": [[1.0] * PREDICT_FEATURES]})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            samples.append({"ok": ok, "latency_ms": (time.perf_counter() - started_at) * 1000})
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=http_url, headers=headers, limits=limits, timeout=30) as client:
+        started_at = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(clients)])
+        elapsed = time.perf_counter() - started_at
+    return summarize(samples, elapsed)
+
+
+def start_server(args):
+    env = {**os.environ, "JWT_SECRET": args.jwt_secret}
+    command = [sys.executable, os.path.join(BENCHMARK_DIR, "bench_server.py"), "--port", str(args.port),
+               "--llm-first-token-ms", str(args.llm_first_token_ms), "--llm-token-ms", str(args.llm_token_ms),
+               "--reply-tokens", str(args.reply_tokens), "--embed-ms", str(args.embed_ms),
+               "--corpus-size", str(args.corpus_size), "--dim", str(args.dim)]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+
+
+def wait_until_ready(http_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{http_url}/api/ml_service/v1/ready", timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def check_thresholds(report, args):
+    failures = []
+    chat = report.get("websocket", {})
+    p95 = chat.get("latency_ms", {}).get("p95")
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"WebSocket p95 {p95}ms over {args.max_p95_ms}ms")
+    ttft_p95 = chat.get("ttft_ms", {}).get("p95")
+    if args.max_ttft_p95_ms is not None and (ttft_p95 is None or ttft_p95 > args.max_ttft_p95_ms):
+        failures.append(f"WebSocket time-to-first-token p95 {ttft_p95}ms over {args.max_ttft_p95_ms}ms")
+    http_p95 = report.get("http", {}).get("latency_ms", {}).get("p95")
+    if args.max_http_p95_ms is not None and (http_p95 is None or http_p95 > args.max_http_p95_ms):
+        failures.append(f"HTTP p95 {http_p95}ms over {args.max_http_p95_ms}ms")
+    for name in ("websocket", "http"):
+        if report.get(name, {}).get("errors") or report.get(name, {}).get("client_failures"):
+            failures.append(f"{name} requests failed")
+    return failures
+
+
+async def main(args):
+    http_url = args.url or f"http://127.0.0.1:{args.port}"
+    ws_url = http_url.replace("http", "ws", 1)
+    report = {}
+
+    if args.ws_clients:
+        report["websocket"] = await run_websocket_load(ws_url, args.jwt_secret, args.ws_clients, args.messages,
+                                                       args.stream)
+    if args.http_clients:
+        report["http"] = await run_http_load(http_url, args.jwt_secret, args.http_clients, args.http_requests)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the chatbot WebSocket and the predict endpoint. Without --url a local server "
+                    "with fake LLM, embedding and vector store is started, so the run needs no network.")
+    parser.add_argument("--url", help="Benchmark an already running server instead, e.g. http://localhost:80")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--jwt-secret", default=JWT_SECRET, help="Must match the server's JWT_SECRET")
+    parser.add_argument("--ws-clients", type=int, default=50, help="Concurrent WebSocket clients")
+    parser.add_argument("--messages", type=int, default=5, help="Messages sent by each WebSocket client")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming WebSocket protocol")
+    parser.add_argument("--http-clients", type=int, default=20, help="Concurrent HTTP clients")
+    parser.add_argument("--http-requests", type=int, default=1000, help="Total predict requests")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if the WebSocket reply p95 is above this")
+    parser.add_argument("--max-ttft-p95-ms", type=float, help="Fail if the time-to-first-token p95 is above this")
+    parser.add_argument("--max-http-p95-ms", type=float, help="Fail if the predict p95 is above this")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = None if args.url else start_server(args)
+    try:
+        if not wait_until_ready(args.url or f"http://127.0.0.1:{args.port}", args.startup_timeout):
+            print("Server did not become ready")
+            exit(1)
+        report = asyncio.run(main(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    failures = check_thresholds(report, args)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    exit(1 if failures else 0)
@@ -0,0 +1,150 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Make the server package importable from the benchmarks directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from app.db.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from app.db.local_vector_store import LocalVectorStore
+
+SYLLABLES = ("ha", "rī", "ta", "kī", "gu", "dū", "chī", "ā", "ma", "la", "kī", "vi", "bhī", "ta", "ki",
+             "śa", "ta", "va", "rī", "pi", "ppa", "lī", "ya", "ṣṭi", "ma", "dhu", "ku", "ṭa", "ja", "ṭā")
+TOPICS = ("digestion and agni", "sleep and the mind", "joint pain", "skin diseases", "cough and breathing",
+          "fever", "vata imbalance", "pitta imbalance", "kapha imbalance", "strength and ojas",
+          "diet in the rainy season", "wound healing", "eye care", "fertility", "memory", "urinary disorders",
+          "headache", "obesity", "anaemia", "daily routine")
+FILLER = ("the physician should prescribe it with warm water honey or ghee after meals and observe the "
+          "patient for seven days according to the strength of the body and the season").split()
+
+
+def herb_name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4)))
+
+
+def build_corpus(chunks, dim, noise, seed=0):
+    """
+    Synthetic Samhita chunks, one herb each. The embeddings only know a chunk's topic (a centroid
+    plus noise), never the herb's name, which is how dense retrieval loses exact Sanskrit terms.
+
+    Returns:
+        tuple: The nodes, their embeddings, the topic centroids and the (herb, topic) of each chunk.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    centroids = np_rng.standard_normal((len(TOPICS), dim)).astype(np.float32)
+
+    herbs = set()
+    while len(herbs) < chunks:
+        herbs.add(herb_name(rng))
+    herbs = sorted(herbs)
+    rng.shuffle(herbs)
+
+    nodes, labels = [], []
+    embeddings = np.empty((chunks, dim), dtype=np.float32)
+    for i, herb in enumerate(herbs):
+        topic = i % len(TOPICS)
+        filler = " ".join(rng.choice(FILLER) for _ in range(60))
+        text = f"{herb.capitalize()} is praised for {TOPICS[topic]}. {filler}. In {TOPICS[topic]} give {herb}."
+        nodes.append(TextNode(id_=f"chunk-{i}", text=text, metadata={"section": TOPICS[topic]}))
+        embeddings[i] = centroids[topic] + noise * np_rng.standard_normal(dim)
+        labels.append((herb, topic))
+    for node, embedding in zip(nodes, embeddings):
+        node.embedding = embedding.tolist()
+    return nodes, centroids, labels
+
+
+def build_queries(nodes, centroids, labels, count, noise, seed=1):
+    """
+    A fixed query set: half name a herb as a user would type it (no diacritics), the relevant
+    chunk being that herb's; half only describe a topic, any chunk on the topic being relevant.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    queries = []
+    for i in range(count):
+        doc = rng.randrange(len(nodes))
+        herb, topic = labels[doc]
+        embedding = centroids[topic] + noise * np_rng.standard_normal(centroids.shape[1])
+        if i % 2 == 0:
+            plain = herb.translate(str.maketrans("āīūśṣṭ", "aiusst"))
+            queries.append(("term", f"What is {plain} good for?", embedding, {nodes[doc].node_id}))
+        else:
+            relevant = {node.node_id for node, label in zip(nodes, labels) if label[1] == topic}
+            queries.append(("topic", f"Which remedies help with {TOPICS[topic]}?", embedding, relevant))
+    return queries
+
+
+def dense_search(store, embedding, top_k):
+    result = store.query(VectorStoreQuery(query_embedding=embedding.tolist(), similarity_top_k=top_k))
+    return [NodeWithScore(node=node, score=score) for node, score in zip(result.nodes, result.similarities)]
+
+
+def evaluate(queries, retrieve, top_k):
+    """
+    Returns hit rate at top_k and MRR per query kind, plus the per-query latency percentiles.
+    """
+    hits, reciprocal_ranks, latencies = {}, {}, []
+    for kind, text, embedding, relevant in queries:
+        started_at = time.perf_counter()
+        nodes = retrieve(text, embedding)[:top_k]
+        latencies.append((time.perf_counter() - started_at) * 1e6)
+
+        ranks = [rank for rank, node in enumerate(nodes, start=1) if node.node.node_id in relevant]
+        hits.setdefault(kind, []).append(1.0 if ranks else 0.0)
+        reciprocal_ranks.setdefault(kind, []).append(1.0 / ranks[0] if ranks else 0.0)
+
+    result = {f"{kind}_hit@{top_k}": np.mean(values) for kind, values in hits.items()}
+    result.update({f"{kind}_mrr": np.mean(values) for kind, values in reciprocal_ranks.items()})
+    result["p50_us"] = np.percentile(latencies, 50)
+    result["p99_us"] = np.percentile(latencies, 99)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dense, BM25 and hybrid (RRF) retrieval")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--noise", type=float, default=0.6, help="Embedding noise around the topic centroids")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=10, help="Candidates per retriever before fusion")
+    args = parser.parse_args()
+
+    nodes, centroids, labels = build_corpus(args.chunks, args.dim, args.noise)
+    queries = build_queries(nodes, centroids, labels, args.queries, args.noise)
+
+    store = LocalVectorStore()
+    store.add(nodes)
+
+    started_at = time.perf_counter()
+    keyword_index = KeywordIndex.from_nodes(nodes)
+    build_seconds = time.perf_counter() - started_at
+    with tempfile.TemporaryDirectory() as persist_dir:
+        keyword_index.persist(persist_dir)
+        size = sum(os.path.getsize(os.path.join(persist_dir, name)) for name in os.listdir(persist_dir))
+        started_at = time.perf_counter()
+        keyword_index = KeywordIndex.from_persist_dir(persist_dir)
+        load_seconds = time.perf_counter() - started_at
+    print(f"{args.chunks} chunks, {len(keyword_index.term_ids)} terms, {len(keyword_index.doc_ids)} postings: "
+          f"built in {build_seconds:.2f}s, {size / 2 ** 20:.1f} MiB on disk, loaded in {load_seconds * 1000:.0f}ms")
+
+    retrievers = {
+        "dense": lambda text, embedding: dense_search(store, embedding, args.top_k),
+        "bm25": lambda text, embedding: keyword_index.search(text, args.top_k),
+        "hybrid": lambda text, embedding: reciprocal_rank_fusion(
+            [dense_search(store, embedding, args.candidates), keyword_index.search(text, args.candidates)],
+            args.top_k),
+    }
+    for name, retrieve in retrievers.items():
+        result = evaluate(queries, retrieve, args.top_k)
+        print(f"{name:<7} " + "  ".join(f"{key} {value:.3f}" if "us" not in key else f"{key} {value:.0f}"
+                                         for key, value in result.items()))
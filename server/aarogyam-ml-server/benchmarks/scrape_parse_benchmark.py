@@ -0,0 +1,94 @@
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+# Make the scrapers importable from the benchmarks directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-chat", "scrapers"))
+
+from wisdomlib_scraper import lxml_html, parse_page
+
+WORDS = ("vata pitta kapha dosha agni ojas rasa rakta mamsa meda asthi majja shukra srotas ama "
+         "the of and is in by with which are from this disease treatment body").split()
+
+
+def synthetic_page(index, paragraphs, rng):
+    """
+    A chapter page laid out like wisdomlib's, with the markup the extraction has to get right:
+    verse numbers, superscripts, entities, inline tags, comments and scripts.
+    """
+    def sentence(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    body = []
+    for number in range(1, paragraphs + 1):
+        if number % 12 == 1:
+            body.append(f"<h2>Section {number // 12 + 1}: <i>{sentence(3)}</i></h2>")
+        body.append(f"<p>{number}. {sentence(20)} <b>{sentence(2)}</b>&nbsp;&amp; {sentence(15)}"
+                    f"<sup>{rng.choice('¹²³')}</sup><!-- note {number} --> {sentence(10)}</p>")
+    body.append("<p>¹ Footnote &mdash; <a href='/definition/dosha'>dosha</a> <span>see also</span></p>")
+
+    links = "".join(f'<li><a href="/hinduism/book/charaka/d/doc{index * 50 + i}.html">{sentence(3)}</a></li>'
+                    for i in range(60))
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>Chapter {index}</title>
+<style>body {{ font-family: serif; }}</style><script>window.dataLayer = [];</script></head><body>
+<div class="row"><nav class="col col-sm px-2 text-center order-2 order-sm-2">
+<a href="/hinduism/book/charaka/d/doc1.html"><span>Sutrasthana</span></a></nav>
+<div class="col-auto col-sm-auto order-3 order-sm-3"><a href="/hinduism/book/charaka/d/doc{index + 1}.html">Next</a></div></div>
+<h1 class="h2 pt-2">Chapter {index} - {sentence(4)}</h1>
+<div class="col-12 mt-3 mb-5 chapter-content" id="scontent">{"".join(body)}<script>track({index});</script></div>
+<footer><ul>{links}</ul></footer></body></html>""".encode("utf-8")
+
+
+def load_pages(fixtures, pages, paragraphs):
+    if fixtures:
+        paths = sorted(glob.glob(os.path.join(fixtures, "*.html")))
+        if not paths:
+            sys.exit(f"No .html files in {fixtures}")
+        result = []
+        for path in paths:
+            with open(path, "rb") as file:
+                result.append((os.path.basename(path), file.read()))
+        return result
+
+    rng = random.Random(0)
+    return [(f"synthetic-{index}", synthetic_page(index, paragraphs, rng)) for index in range(pages)]
+
+
+def measure(pages, parser, rounds):
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        for _, html in pages:
+            parse_page(html, parser=parser)
+    return len(pages) * rounds / (time.perf_counter() - started_at)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare BeautifulSoup and lxml page extraction")
+    parser.add_argument("--fixtures", help="A directory of saved wisdomlib .html pages, e.g. tests/fixtures/wisdomlib "
+                                           "(synthetic pages otherwise)")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=120)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if lxml_html is None:
+        sys.exit("lxml is not installed: pip install lxml")
+
+    pages = load_pages(args.fixtures, args.pages, args.paragraphs)
+    size = sum(len(html) for _, html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size:.1f} KiB on average")
+
+    # The BeautifulSoup output is the reference, every page has to come out identical
+    mismatches = [name for name, html in pages
+                  if parse_page(html, parser="lxml") != parse_page(html, parser="html.parser")]
+    for name in mismatches:
+        print(f"Output differs: {name}")
+
+    soup_rate = measure(pages, "html.parser", args.rounds)
+    lxml_rate = measure(pages, "lxml", args.rounds)
+    print(f"{'html.parser':<12} {soup_rate:8.1f} pages/s")
+    print(f"{'lxml':<12} {lxml_rate:8.1f} pages/s   {lxml_rate / soup_rate:.1f}x")
+    sys.exit(1 if mismatches else 0)
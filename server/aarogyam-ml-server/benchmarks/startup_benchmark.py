@@ -0,0 +1,65 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def measure_import():
+    # A fresh interpreter, so nothing is already in sys.modules
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url, expected_status, started_at, timeout):
+    while time.perf_counter() - started_at < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == expected_status:
+                    return time.perf_counter() - started_at
+        except urllib.error.HTTPError as e:
+            if e.code == expected_status:
+                return time.perf_counter() - started_at
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def measure_server(port, timeout):
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}/api/ml_service/v1"
+        first_response = wait_for(base_url, 200, started_at, timeout)
+        ready = wait_for(f"{base_url}/ready", 200, started_at, timeout)
+        return first_response, ready
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def format_seconds(seconds):
+    return "timed out" if seconds is None else f"{seconds:.2f}s"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure server import time, time to first response and time to ready")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for the server")
+    args = parser.parse_args()
+
+    for run in range(1, args.runs + 1):
+        import_seconds = measure_import()
+        first_response, ready = measure_server(args.port, args.timeout)
+        print(f"Run {run}: import {import_seconds:.2f}s, first response {format_seconds(first_response)}, "
+              f"ready {format_seconds(ready)}")
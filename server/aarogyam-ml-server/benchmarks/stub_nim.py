@@ -0,0 +1,99 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from fakes import REPLY_WORDS, fake_vector
+
+
+class StubNIM:
+    """
+    A local stand-in for an NVIDIA NIM (the OpenAI-compatible /v1 API) with fault injection:
+    a share of requests fail with 503, and an endpoint can be taken down entirely.
+    """
+
+    def __init__(self, models, dim=256, latency_ms=20.0, reply_tokens=20, fail_rate=0.0, seed=0):
+        self.models = models
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.reply_tokens = reply_tokens
+        self.fail_rate = fail_rate
+        # "embeddings" and/or "chat"
+        self.down = set()
+        self.requests = {"embeddings": 0, "chat": 0}
+        self._rng = random.Random(seed)
+        self._server = None
+        self.app = self._build_app()
+
+    def _fails(self, endpoint):
+        self.requests[endpoint] += 1
+        return endpoint in self.down or self._rng.random() < self.fail_rate
+
+    def _build_app(self):
+        app = FastAPI()
+        unavailable = {"error": {"message": "Service temporarily unavailable", "type": "server_error"}}
+
+        @app.get("/v1/models")
+        async def models():
+            return {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "stub"}
+                                               for model in self.models]}
+
+        @app.post("/v1/embeddings")
+        async def embeddings(request: Request):
+            body = await request.json()
+            if self._fails("embeddings"):
+                return JSONResponse(unavailable, status_code=503)
+            await asyncio.sleep(self.latency_ms / 1000)
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            return {"object": "list", "model": body["model"],
+                    "data": [{"object": "embedding", "index": i, "embedding": fake_vector(text, self.dim).tolist()}
+                             for i, text in enumerate(texts)],
+                    "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)}}
+
+        @app.post("/v1/chat/completions")
+        async def chat(request: Request):
+            body = await request.json()
+            if self._fails("chat"):
+                return JSONResponse(unavailable, status_code=503)
+            words = [REPLY_WORDS[i % len(REPLY_WORDS)] + " " for i in range(self.reply_tokens)]
+            if body.get("stream"):
+                return StreamingResponse(self._stream(body["model"], words), media_type="text/event-stream")
+
+            await asyncio.sleep(self.latency_ms / 1000)
+            return {"id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(words)}}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": len(words), "total_tokens": len(words) + 1}}
+
+        return app
+
+    async def _stream(self, model, words):
+        for word in words:
+            await asyncio.sleep(self.latency_ms / 1000 / 4)
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "finish_reason": None,
+                                  "delta": {"role": "assistant", "content": word}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    def start(self, host="127.0.0.1", port=8790):
+        """
+        Serves the stub from a background thread.
+
+        Returns:
+            str: The base URL to give the NVIDIA clients.
+        """
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        threading.Thread(target=self._server.run, daemon=True).start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return f"http://{host}:{port}/v1"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
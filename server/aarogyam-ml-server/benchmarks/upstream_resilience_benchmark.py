@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Make the server package importable from the benchmarks directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+
+from app.db.keyword_index import KeywordIndex
+from app.db.local_vector_store import LocalVectorStore
+from fakes import REPLY_WORDS, build_vector_store, fake_vector
+from stub_nim import StubNIM
+
+LLM_MODEL = "meta/llama3-70b-instruct"
+EMBED_MODEL = "nvidia/nv-embedqa-e5-v5"
+
+
+class SlowTailVectorStore(LocalVectorStore):
+    """
+    Behaves like Pinecone from the pipeline's point of view: only a blocking query, and now and
+    then a very slow one.
+    """
+
+    latency_ms: float = 20.0
+    tail_ms: float = 1000.0
+    tail_rate: float = 0.05
+
+    aquery = BasePydanticVectorStore.aquery
+
+    def query(self, query, **kwargs):
+        time.sleep((self.tail_ms if random.random() < self.tail_rate else self.latency_ms) / 1000)
+        return super().query(query, **kwargs)
+
+
+def build_policies(retries, failures=5, reset=30.0, hedge_delay=None):
+    from app.services.upstream import CircuitBreaker, UpstreamPolicy
+
+    return {name: UpstreamPolicy(name, retries=retries, base_delay=0.05, max_delay=0.5, attempt_timeout=3.0,
+                                 hedge_delay=hedge_delay, breaker=CircuitBreaker(name, failures, reset))
+            for name in ("llm", "embed", "vector_store")}
+
+
+def build_chat(args, policies, keyword_index=None, vector_store=None):
+    # Imported here: NVIDIA_BASE_URL has to point at the stub before the module reads it
+    from app.models.aarogyam_chat import AarogyamChat, build_nvidia_embedding, build_nvidia_llm
+
+    return AarogyamChat(
+        llm=build_nvidia_llm("stub-key"),
+        embed_model=build_nvidia_embedding("stub-key"),
+        vector_store=vector_store or build_vector_store(args.corpus_size, args.dim),
+        semantic_cache=None,
+        retrieval_mode="simple",
+        keyword_index=keyword_index,
+        coalesce=False,
+        policies=policies,
+    )
+
+
+def build_keyword_index(size=200):
+    nodes = [TextNode(id_=f"keyword-{i}", text=f"Ayurveda passage {i}. " + " ".join(REPLY_WORDS))
+             for i in range(size)]
+    return KeywordIndex.from_nodes(nodes)
+
+
+async def turns(chat, count, concurrency, stream=False):
+    """
+    Runs count distinct chat turns, concurrency at a time.
+
+    Returns:
+        tuple: The outcome of each turn ("ok" or the exception's class name) and their latencies.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def turn(i):
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                query = f"What does Ayurveda say about question {i}?"
+                if stream:
+                    deltas, _ = await chat.stream_chat_with_model(query)
+                    reply = "".join([delta async for delta in deltas])
+                else:
+                    response, _ = await chat.chat_with_model(query)
+                    reply = response.message.content
+                outcome = "ok" if reply else "empty"
+            except Exception as e:
+                outcome = type(e).__name__
+            return outcome, time.perf_counter() - started_at
+
+    results = await asyncio.gather(*[turn(i) for i in range(count)])
+    return [outcome for outcome, _ in results], [seconds for _, seconds in results]
+
+
+def success_rate(outcomes):
+    return sum(outcome == "ok" for outcome in outcomes) / len(outcomes)
+
+
+async def flaky(args, stub):
+    # Breakers that never open, so the retries alone are measured
+    stub.fail_rate = args.fail_rate
+    rates = {}
+    for stream in (False, True):
+        for retries in (0, args.retries):
+            chat = build_chat(args, build_policies(retries, failures=10 ** 6))
+            outcomes, _ = await turns(chat, args.turns, args.concurrency, stream)
+            rates[(stream, retries)] = success_rate(outcomes)
+            print(f"flaky {'stream' if stream else 'chat':<6} {args.fail_rate:.0%} failures, retries={retries}: "
+                  f"{rates[(stream, retries)]:.1%} turns ok")
+    stub.fail_rate = 0.0
+    return all(rates[(stream, args.retries)] > rates[(stream, 0)] for stream in (False, True))
+
+
+async def outage(args, stub):
+    stub.down = {"embeddings"}
+    ok = True
+
+    # With a keyword index the turns are answered from local retrieval while the circuit is open
+    policies = build_policies(args.retries, failures=args.breaker_failures, reset=args.breaker_reset)
+    chat = build_chat(args, policies, keyword_index=build_keyword_index())
+    requests_before = stub.requests["embeddings"]
+    started_at = time.perf_counter()
+    outcomes, _ = await turns(chat, args.turns, 1)
+    # The failures that open the circuit, then one probe per reset_timeout
+    probes = int((time.perf_counter() - started_at) / args.breaker_reset)
+    sent = stub.requests["embeddings"] - requests_before
+    degraded = success_rate(outcomes)
+    print(f"outage with keyword index: {degraded:.0%} turns answered, {sent} embedding requests sent for "
+          f"{args.turns} turns (retries alone would send {args.turns * (args.retries + 1)}), "
+          f"circuit {policies['embed'].breaker.state}")
+    ok &= degraded == 1.0 and sent <= args.breaker_failures + probes
+
+    # Without one they fail fast instead of each waiting out its retries
+    chat = build_chat(args, build_policies(args.retries, failures=args.breaker_failures, reset=args.breaker_reset))
+    outcomes, seconds = await turns(chat, args.turns, 1)
+    fast = seconds[args.breaker_failures:]
+    print(f"outage without keyword index: {set(outcomes)}, first turn {seconds[0] * 1000:.0f}ms, "
+          f"turns after the circuit opened {np.mean(fast) * 1000:.2f}ms on average")
+    ok &= set(outcomes) == {"UpstreamUnavailable"} and np.mean(fast) < 0.05
+
+    # Recovery: once the endpoint is back the probe after reset_timeout closes the circuit
+    stub.down = set()
+    await asyncio.sleep(args.breaker_reset)
+    outcomes, _ = await turns(chat, 3, 1)
+    state = chat.policies["embed"].breaker.state
+    print(f"recovery after {args.breaker_reset}s: {outcomes}, circuit {state}")
+    ok &= outcomes == ["ok"] * 3 and state == "closed"
+    return ok
+
+
+async def hedging(args):
+    queries = [f"hedged question {i}" for i in range(args.retrievals)]
+    embeddings = {query: fake_vector(query, args.dim).tolist() for query in queries}
+    nodes = [TextNode(id_=f"chunk-{i}", text=f"Ayurveda passage {i}.", embedding=fake_vector(str(i), args.dim).tolist())
+             for i in range(args.corpus_size)]
+
+    latencies = {}
+    for hedge_delay in (None, args.hedge_delay):
+        store = SlowTailVectorStore(tail_ms=args.tail_ms, tail_rate=args.tail_rate)
+        store.add(nodes)
+        chat = build_chat(args, build_policies(args.retries, hedge_delay=hedge_delay), vector_store=store)
+
+        seconds = []
+        for query in queries:
+            started_at = time.perf_counter()
+            await chat._aretrieve(query, embeddings[query])
+            seconds.append(time.perf_counter() - started_at)
+        latencies[hedge_delay] = np.percentile(seconds, [50, 99]) * 1000
+        label = f"hedge after {hedge_delay * 1000:.0f}ms" if hedge_delay else "no hedging"
+        print(f"retrieval, {args.tail_rate:.0%} of queries take {args.tail_ms:.0f}ms, {label}: "
+              f"p50 {latencies[hedge_delay][0]:.1f}ms  p99 {latencies[hedge_delay][1]:.1f}ms")
+    return latencies[args.hedge_delay][1] < latencies[None][1] / 2
+
+
+async def main(args):
+    stub = StubNIM(models=[LLM_MODEL, EMBED_MODEL], dim=args.dim, latency_ms=args.latency_ms)
+    stub.start(port=args.port)
+    try:
+        results = {"flaky": await flaky(args, stub), "outage": await outage(args, stub),
+                   "hedging": await hedging(args)}
+    finally:
+        stub.stop()
+    print(", ".join(f"{name} {'ok' if ok else 'FAILED'}" for name, ok in results.items()))
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check retries, circuit breaking and hedging against a stub NIM")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-reset", type=float, default=1.0)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--retrievals", type=int, default=200)
+    parser.add_argument("--tail-ms", type=float, default=1000.0)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--hedge-delay", type=float, default=0.1)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    # The NVIDIA clients talk to the stub, as they would to an on-premises NIM
+    os.environ["NVIDIA_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("NVIDIA_API_KEY", "stub-key")
+    sys.exit(0 if asyncio.run(main(args)) else 1)
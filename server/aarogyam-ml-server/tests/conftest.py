@@ -0,0 +1,33 @@
+import pytest
+
+# fakes first: it points TOKENIZER_NAME at the bundled tokenizer before the app modules read it
+from fakes import FakeEmbedding, FakeLLM, build_vector_store
+from app.models import AarogyamChat
+from app.services.admission import FairSemaphore
+from app.services.upstream import UpstreamPolicy
+
+DIM = 64
+
+
+@pytest.fixture
+def make_chat():
+    """
+    Builds AarogyamChat pipelines on the local stand-ins. Every pipeline gets its own upstream
+    slots and circuit breakers, so no state leaks from one test into the next.
+    """
+
+    def make(**kwargs):
+        options = {
+            "llm": FakeLLM(first_token_ms=50, token_ms=1, reply_tokens=5),
+            "embed_model": FakeEmbedding(dim=DIM, latency_ms=1),
+            "vector_store": build_vector_store(50, DIM),
+            "semantic_cache": None,
+            "retrieval_mode": "simple",
+            "coalesce": False,
+            "upstream": FairSemaphore(limit=64),
+            "policies": {name: UpstreamPolicy(name) for name in ("llm", "embed", "vector_store")},
+        }
+        options.update(kwargs)
+        return AarogyamChat(**options)
+
+    return make
@@ -0,0 +1,82 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.utils.array_stream import BulkFormatError, npy_arrays, parse_ndjson_rows
+
+
+def npy_payload(shape, descr="<f8", data=b""):
+    file = io.BytesIO()
+    np.lib.format.write_array_header_1_0(file, {"descr": descr, "fortran_order": False, "shape": shape})
+    return file.getvalue() + data
+
+
+async def read_all(payload, chunk_rows=4, chunk_bytes=7):
+    async def chunks():
+        for start in range(0, len(payload), chunk_bytes):
+            yield payload[start:start + chunk_bytes]
+
+    return [array async for array in npy_arrays(chunks(), chunk_rows)]
+
+
+async def test_npy_rows_are_read_in_chunks():
+    array = np.arange(30, dtype=np.float32).reshape(10, 3)
+    file = io.BytesIO()
+    np.save(file, array)
+
+    arrays = await read_all(file.getvalue())
+
+    assert [len(chunk) for chunk in arrays] == [4, 4, 2]
+    np.testing.assert_array_equal(np.concatenate(arrays), array)
+
+
+@pytest.mark.parametrize("shape, descr", [
+    ((5, 0), "<f8"),
+    ((5, 3, 0), "<f8"),
+    ((), "<f8"),
+    ((-1, 3), "<f8"),
+    ((5, -3), "<f8"),
+    ((5, 3), "|S0"),
+    ((5, 3), "<U4"),
+])
+async def test_unreadable_shapes_and_types_are_rejected_with_the_header(shape, descr):
+    # Raised before any row is read, which the bulk endpoint answers with a 422
+    with pytest.raises(BulkFormatError):
+        await read_all(npy_payload(shape, descr, data=b"\0" * 64))
+
+
+def test_ndjson_rows_are_parsed():
+    rows = parse_ndjson_rows([b"[1, 2.5, 3]", b"[4,5e-1,-6]"], 3)
+
+    np.testing.assert_array_equal(rows, [[1, 2.5, 3], [4, 0.5, -6]])
+
+
+@pytest.mark.parametrize("lines", [
+    [b"[1, 2, x]"],
+    [b"[1, 2, 3abc]"],
+    [b"[1, 2, 3] x"],
+    [b"[1, 2, null]", b"[1, 2, 3]"],
+    [b"[1, 2, 3]", b"[1, 2, \"3\"]"],
+    [b"[true, 2, 3]"],
+])
+def test_ndjson_rows_that_are_not_numbers_are_rejected(lines):
+    with pytest.raises(BulkFormatError):
+        parse_ndjson_rows(lines, 3)
+
+
+def test_ndjson_rows_are_validated_from_worker_threads():
+    # How the bulk endpoint parses, many requests at once
+    good, bad = [b"[1, 2, 3]"] * 100, [b"[1, 2, 3]"] * 99 + [b"[1, 2, 3oops]"]
+
+    def parse(lines):
+        try:
+            return parse_ndjson_rows(lines, 3).shape
+        except BulkFormatError:
+            return "rejected"
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(parse, [good, bad] * 200))
+
+    assert results == [(100, 3), "rejected"] * 200
@@ -0,0 +1,62 @@
+import io
+
+import httpx
+import numpy as np
+import pytest
+
+from app.main import app
+from app.models.ml_model import MLModel
+from app.resources import resources
+from app.services.jwt_service import verify_jwt
+
+URL = "/api/ml_service/v1/predict/row-sum/bulk"
+
+
+@pytest.fixture
+async def client():
+    # Sums each row: the predictions say which rows made it through
+    resources.models.register(MLModel("row-sum", lambda rows: rows.sum(axis=1), input_dtype=np.float64))
+    app.dependency_overrides[verify_jwt] = lambda: {"id": "test-user"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+def in_chunks(payload, size):
+    async def chunks():
+        for start in range(0, len(payload), size):
+            yield payload[start:start + size]
+
+    return chunks()
+
+
+async def test_a_multi_chunk_ndjson_upload_scores_every_row(client):
+    rows = np.arange(20_000 * 3, dtype=np.float64).reshape(-1, 3)
+    payload = "".join(f"[{a:g}, {b:g}, {c:g}]\n" for a, b, c in rows.tolist()).encode()
+
+    response = await client.post(URL, content=in_chunks(payload, 4096),
+                                 headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    predictions = np.array(response.text.splitlines(), dtype=np.float64)
+    np.testing.assert_array_equal(predictions, rows.sum(axis=1))
+
+
+async def test_a_multi_chunk_npy_upload_scores_every_row(client):
+    rows = np.random.default_rng(0).random((50_000, 4))
+    file = io.BytesIO()
+    np.save(file, rows)
+
+    response = await client.post(URL, content=in_chunks(file.getvalue(), 65536),
+                                 headers={"Content-Type": "application/x-npy"})
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == len(rows)
+    np.testing.assert_allclose(np.array(response.text.splitlines(), dtype=np.float64), rows.sum(axis=1))
+
+
+async def test_a_malformed_upload_is_refused_before_the_response_starts(client):
+    response = await client.post(URL, content=in_chunks(b"[1, 2]\n[3, oops]\n", 4),
+                                 headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 422
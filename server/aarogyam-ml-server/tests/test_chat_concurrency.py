@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from fakes import FakeLLM
+
+LLM_SECONDS = 0.5
+TURNS = 20
+
+
+async def test_concurrent_turns_wait_on_the_llm_together(make_chat):
+    # A blocked event loop would run the turns one after the other, TURNS * LLM_SECONDS in total
+    llm = FakeLLM(first_token_ms=LLM_SECONDS * 1000, token_ms=0, reply_tokens=1)
+    chat = make_chat(llm=llm)
+
+    started_at = time.perf_counter()
+    results = await asyncio.gather(*[chat.chat_with_model(f"What helps with sleep, question {i}?")
+                                     for i in range(TURNS)])
+    elapsed = time.perf_counter() - started_at
+
+    assert llm.calls == TURNS
+    assert all(response.message.content for response, _ in results)
+    assert elapsed < LLM_SECONDS * 2
+
+
+async def test_concurrent_streams_wait_on_the_llm_together(make_chat):
+    llm = FakeLLM(first_token_ms=LLM_SECONDS * 1000, token_ms=1, reply_tokens=3)
+    chat = make_chat(llm=llm)
+
+    async def turn(i):
+        deltas, _ = await chat.stream_chat_with_model(f"What helps with sleep, question {i}?")
+        return "".join([delta async for delta in deltas])
+
+    started_at = time.perf_counter()
+    replies = await asyncio.gather(*[turn(i) for i in range(TURNS)])
+    elapsed = time.perf_counter() - started_at
+
+    assert llm.calls == TURNS
+    assert all(replies)
+    assert elapsed < LLM_SECONDS * 2
@@ -0,0 +1,49 @@
+from fakes import FakeLLM, InMemoryCollection
+from app.db.message_store import MessageStore
+from app.services.chat_memory import ConversationMemory
+from app.services.semantic_cache import InMemoryCacheBackend, SemanticCache
+
+QUESTION = "What should I eat for breakfast if I have a pitta constitution?"
+
+
+async def turn(chat, store, memory, question):
+    # What the chatbot router does with each message
+    response, source_nodes = await chat.chat_with_model(question, await memory.history(),
+                                                        follow_up=memory.session_turns > 0)
+    await store.save({"user_id": memory.user_id, "message": question, "reply": response.message.content,
+                      "source_nodes": source_nodes})
+    await memory.add_turn(question, response.message.content)
+    return response
+
+
+async def test_a_returning_users_repeat_question_hits_the_cache(make_chat):
+    llm = FakeLLM(first_token_ms=1, token_ms=0, reply_tokens=5)
+    chat = make_chat(llm=llm, semantic_cache=SemanticCache(InMemoryCacheBackend()))
+    store = MessageStore(collection=InMemoryCollection(), flush_interval=0.01)
+
+    await turn(chat, store, ConversationMemory("user-1", message_store=store), QUESTION)
+    await store.stop()
+    assert llm.calls == 1
+
+    # A new session: the stored exchange is loaded as history, but the question is not a follow-up
+    memory = ConversationMemory("user-1", message_store=store)
+    response = await turn(chat, store, memory, QUESTION)
+
+    assert len(await memory.history()) == 4
+    assert llm.calls == 1
+    assert chat.semantic_cache.stats()["hits"] == 1
+    assert response.message.content
+
+
+async def test_a_follow_up_skips_the_cache(make_chat):
+    llm = FakeLLM(first_token_ms=1, token_ms=0, reply_tokens=5)
+    chat = make_chat(llm=llm, semantic_cache=SemanticCache(InMemoryCacheBackend()))
+    store = MessageStore(collection=InMemoryCollection(), flush_interval=0.01)
+    memory = ConversationMemory("user-1", message_store=store)
+
+    await turn(chat, store, memory, QUESTION)
+    await turn(chat, store, memory, QUESTION)
+    await store.stop()
+
+    assert llm.calls == 2
+    assert chat.semantic_cache.stats()["hits"] == 0
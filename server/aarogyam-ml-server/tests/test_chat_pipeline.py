@@ -0,0 +1,27 @@
+from fakes import FakeLLM
+
+QUESTION = "I have not slept in 4 days, is there any risk to my health?"
+
+
+async def test_a_turn_makes_one_llm_call(make_chat):
+    # Retrieval only, the answer is generated once from the retrieved nodes
+    llm = FakeLLM(first_token_ms=1, token_ms=0, reply_tokens=5)
+    chat = make_chat(llm=llm)
+
+    response, source_nodes = await chat.chat_with_model(QUESTION)
+
+    assert llm.calls == 1
+    assert response.message.content
+    assert source_nodes
+
+
+async def test_a_streamed_turn_makes_one_llm_call(make_chat):
+    llm = FakeLLM(first_token_ms=1, token_ms=0, reply_tokens=5)
+    chat = make_chat(llm=llm)
+
+    deltas, source_nodes = await chat.stream_chat_with_model(QUESTION)
+    reply = "".join([delta async for delta in deltas])
+
+    assert llm.calls == 1
+    assert reply
+    assert source_nodes
@@ -0,0 +1,41 @@
+import pytest
+from fastapi import WebSocketDisconnect
+
+from fakes import FakeLLM
+from app.routers import chatbot_router
+
+
+class LeavingWebSocket:
+    """
+    A client that goes away once it has been sent its first delta.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, message):
+        if message["type"] == "delta":
+            raise WebSocketDisconnect(1001)
+        self.sent.append(message)
+
+
+class NewSession:
+    session_turns = 0
+
+    async def history(self):
+        return []
+
+
+async def test_a_client_leaving_mid_stream_frees_the_upstream_slot(make_chat, monkeypatch):
+    chat = make_chat(llm=FakeLLM(first_token_ms=1, token_ms=1, reply_tokens=50))
+
+    async def get_chat():
+        return chat
+
+    monkeypatch.setattr(chatbot_router.resources, "get_chat", get_chat)
+
+    # The raised exception keeps the stream referenced, only closing it releases the slot
+    with pytest.raises(WebSocketDisconnect):
+        await chatbot_router.stream_reply(LeavingWebSocket(), "user-1", "What is Pitta?", NewSession())
+
+    assert chat.upstream.active == 0
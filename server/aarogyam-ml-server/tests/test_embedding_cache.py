@@ -0,0 +1,18 @@
+from fakes import FakeEmbedding
+from app.services.embedding_cache import CachedEmbedding
+
+
+def test_a_persisted_cache_is_not_shared_across_models(tmp_path):
+    path = str(tmp_path / "embedding_cache.npz")
+    first = CachedEmbedding(FakeEmbedding(model_name="model-a", dim=8, latency_ms=0), persist_path=path)
+    first.get_query_embedding("What is Vata?")
+    first.persist()
+
+    same = CachedEmbedding(FakeEmbedding(model_name="model-a", dim=8, latency_ms=0), persist_path=path)
+    same.get_query_embedding("What is Vata?")
+    assert same.stats()["hits"] == 1
+
+    # Another model (say the SDK default instead of EMBED_MODEL) computes its own vectors
+    other = CachedEmbedding(FakeEmbedding(model_name="model-b", dim=16, latency_ms=0), persist_path=path)
+    assert len(other.get_query_embedding("What is Vata?")) == 16
+    assert other.stats()["hits"] == 0
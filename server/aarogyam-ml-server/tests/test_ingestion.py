@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from fakes import FakeEmbedding
+from app.db.local_vector_store import LocalVectorStore
+from app.utils.chunking import MarkdownChunker
+import ingestion
+from ingestion import IngestionManifest, IngestionPipeline, with_retry
+
+DIM = 16
+
+
+class FailingEmbedding(FakeEmbedding):
+    """
+    Fails on any chunk mentioning "unreachable", like an embedding endpoint that keeps erroring.
+    """
+
+    def _get_text_embedding(self, text: str):
+        if "unreachable" in text:
+            raise ConnectionError("embedding endpoint unreachable")
+        return super()._get_text_embedding(text)
+
+
+class RecordingManifest(IngestionManifest):
+    def __init__(self, path):
+        super().__init__(path)
+        self.saves = []
+
+    def save(self):
+        self.saves.append(len(self.files))
+        super().save()
+
+
+def write_corpus(data_dir, texts):
+    os.makedirs(data_dir, exist_ok=True)
+    for name, text in texts.items():
+        with open(os.path.join(data_dir, name), "w", encoding="utf-8") as file:
+            file.write(text)
+
+
+def build_pipeline(store, checkpoint_every=1):
+    return IngestionPipeline(store, FailingEmbedding(dim=DIM, latency_ms=0), MarkdownChunker(), embed_batch_size=1,
+                             max_concurrency=1, upsert_batch_size=1, max_retries=0,
+                             checkpoint_every=checkpoint_every, on_checkpoint=store.persist)
+
+
+def test_a_failed_run_keeps_the_files_it_completed(tmp_path):
+    data_dir, store_dir = str(tmp_path / "md"), str(tmp_path / "store")
+    write_corpus(data_dir, {"a.md": "# Vata\n\nVata governs movement.",
+                            "b.md": "# Pitta\n\nPitta governs digestion.",
+                            "c.md": "# Kapha\n\nThe endpoint is unreachable for this one."})
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    store = LocalVectorStore(persist_dir=store_dir)
+
+    with pytest.raises(ConnectionError):
+        build_pipeline(store, checkpoint_every=50).run(data_dir, manifest)
+
+    # Saved on the failure path although the checkpoint interval was never reached
+    saved = IngestionManifest(manifest.path)
+    assert sorted(saved.files) == ["a.md", "b.md"]
+    persisted = LocalVectorStore.from_persist_dir(store_dir, mmap=False)
+    assert len(persisted) == sum(len(entry["chunks"]) for entry in saved.files.values())
+
+    # The re-run only embeds the file that failed
+    write_corpus(data_dir, {"c.md": "# Kapha\n\nKapha governs structure."})
+    stats = build_pipeline(persisted).run(data_dir, saved)
+    assert stats["files_unchanged"] == 2 and stats["files_updated"] == 1
+    assert sorted(IngestionManifest(manifest.path).files) == ["a.md", "b.md", "c.md"]
+
+
+def test_the_manifest_is_saved_every_checkpoint_every_files(tmp_path):
+    data_dir = str(tmp_path / "md")
+    write_corpus(data_dir, {f"{i}.md": f"# Chapter {i}\n\nVerse {i}." for i in range(5)})
+    manifest = RecordingManifest(str(tmp_path / "manifest.json"))
+    store = LocalVectorStore(persist_dir=str(tmp_path / "store"))
+
+    build_pipeline(store, checkpoint_every=2).run(data_dir, manifest)
+
+    # After files 2 and 4, then the final save
+    assert manifest.saves == [2, 4, 5]
+
+
+def test_only_transient_errors_are_retried(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ingestion.time, "sleep", sleeps.append)
+    calls = []
+
+    def flaky():
+        calls.append(None)
+        if len(calls) < 3:
+            raise ConnectionError("connection reset")
+        return "ok"
+
+    assert with_retry(flaky, max_retries=5) == "ok"
+    assert len(sleeps) == 2
+
+    def unsupported():
+        calls.append(None)
+        raise NotImplementedError("delete_nodes is not supported")
+
+    calls.clear()
+    sleeps.clear()
+    with pytest.raises(NotImplementedError):
+        with_retry(unsupported, max_retries=5)
+    assert len(calls) == 1 and sleeps == []
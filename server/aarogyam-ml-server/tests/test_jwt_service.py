@@ -0,0 +1,20 @@
+import pytest
+
+from app.services.jwt_service import JWKSVerifier, SecretVerifier, create_verifier
+
+JWKS_URL = "https://auth.example.com/.well-known/jwks.json"
+
+
+def test_a_jwks_url_selects_the_jwks_verifier():
+    verifier = create_verifier(jwks_url=JWKS_URL, algorithm="RS256")
+    assert isinstance(verifier, JWKSVerifier) and verifier.algorithm == "RS256"
+
+
+def test_an_hmac_algorithm_with_a_jwks_url_is_refused():
+    with pytest.raises(ValueError, match="JWT_JWKS_URL"):
+        create_verifier(jwks_url=JWKS_URL, algorithm="HS256")
+
+
+def test_without_a_jwks_url_the_secret_is_used():
+    verifier = create_verifier(jwks_url=None, algorithm="HS256", secret="secret")
+    assert isinstance(verifier, SecretVerifier)
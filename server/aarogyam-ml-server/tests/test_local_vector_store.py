@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from app.db.local_vector_store import LocalVectorStore, normalize_rows, quantize_rows
+
+DIM = 8
+
+
+def make_nodes(ids, rng):
+    return [TextNode(id_=f"node-{i}", text=f"passage {i}", embedding=rng.standard_normal(DIM).tolist()) for i in ids]
+
+
+def unit(node):
+    return normalize_rows(np.array([node.embedding], dtype=np.float32))[0]
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_adds_upserts_and_deletes_match_a_rebuilt_matrix(quantize):
+    rng = np.random.default_rng(0)
+    store, expected = LocalVectorStore(quantize=quantize), {}
+
+    for batch in range(40):
+        # Ids repeat across batches, so some rows are overwritten in place
+        nodes = make_nodes(rng.integers(0, 600, 30), rng)
+        store.add(nodes)
+        expected.update((node.node_id, unit(node)) for node in nodes)
+        if batch % 7 == 3:
+            removed = [f"node-{i}" for i in rng.integers(0, 600, 25)]
+            store.delete_nodes(removed)
+            for node_id in removed:
+                expected.pop(node_id, None)
+
+    matrix = np.array([expected[node_id] for node_id in store._ids])
+    assert sorted(store._ids) == sorted(expected)
+    np.testing.assert_allclose(store._matrix, matrix)
+    if quantize:
+        quantized, scales = quantize_rows(matrix)
+        np.testing.assert_array_equal(store._quantized, quantized)
+        np.testing.assert_allclose(store._scales, scales)
+
+
+def test_appends_grow_the_buffer_geometrically():
+    rng = np.random.default_rng(0)
+    store, capacities = LocalVectorStore(quantize=True), set()
+
+    for i in range(5000):
+        store.add(make_nodes([i], rng))
+        capacities.add(len(store._matrix_buffer))
+
+    assert capacities == {256, 512, 1024, 2048, 4096, 8192}
+    assert len(store) == 5000 and len(store._quantized) == 5000
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_a_loaded_store_can_be_modified(tmp_path, quantize):
+    rng = np.random.default_rng(0)
+    store = LocalVectorStore()
+    store.add(make_nodes(range(100), rng))
+    store.persist(str(tmp_path))
+
+    # Memory-mapped and read-only until the first change
+    loaded = LocalVectorStore.from_persist_dir(str(tmp_path), quantize=quantize)
+    new_nodes = make_nodes([100, 101], rng)
+    loaded.add(new_nodes)
+    loaded.delete_nodes(["node-0", "node-100"])
+
+    assert len(loaded) == 100
+    result = loaded.query(VectorStoreQuery(query_embedding=new_nodes[1].embedding, similarity_top_k=1))
+    assert result.ids == ["node-101"]
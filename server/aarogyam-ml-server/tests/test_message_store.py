@@ -0,0 +1,84 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+
+from app.db.message_store import MessageStore
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().aarogyam.message
+
+
+def message(i, user_id="user-1"):
+    return {"user_id": user_id, "message": f"question {i}", "reply": f"reply {i}", "source_nodes": []}
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def test_full_batches_are_written_without_waiting_for_the_timer(collection):
+    store = MessageStore(collection=collection, batch_size=10, flush_interval=60)
+    for i in range(25):
+        await store.save(message(i))
+
+    await wait_for(lambda: store.stats()["saved"] == 20)
+    assert store.stats()["batches"] == 2
+    assert collection.count_documents({}) == 20
+
+    await store.stop()
+    assert collection.count_documents({}) == 25
+    assert store.stats()["batches"] == 3
+
+
+async def test_a_partial_batch_is_written_after_the_flush_interval(collection):
+    store = MessageStore(collection=collection, batch_size=100, flush_interval=0.05)
+    for i in range(3):
+        await store.save(message(i))
+    assert collection.count_documents({}) == 0
+
+    await wait_for(lambda: collection.count_documents({}) == 3)
+    assert store.stats()["batches"] == 1
+    await store.stop()
+
+
+async def test_stop_drains_the_queue(collection):
+    store = MessageStore(collection=collection, batch_size=100, flush_interval=60)
+    for i in range(5):
+        await store.save(message(i))
+
+    await store.stop()
+
+    assert collection.count_documents({}) == 5
+    assert store.stats() == {"saved": 5, "batches": 1, "dropped": 0, "retries": 0, "pending": 0}
+    assert all("created_at" in document for document in collection.find())
+
+
+async def test_start_creates_the_indexes(collection):
+    store = MessageStore(collection=collection)
+    await store.start()
+    await store.stop()
+
+    keys = [index["key"] for index in collection.index_information().values()]
+    assert [("user_id", 1), ("created_at", -1)] in keys
+    assert [("created_at", -1)] in keys
+
+
+async def test_recent_returns_the_users_last_messages_oldest_first(collection):
+    store = MessageStore(collection=collection, flush_interval=0.01)
+    # Explicit timestamps, BSON keeps milliseconds only
+    started_at = datetime.now(timezone.utc)
+    for i in range(5):
+        for user_id in ("user-1", "user-2"):
+            await store.save({**message(i, user_id), "created_at": started_at + timedelta(seconds=i)})
+    await store.stop()
+
+    assert [document["message"] for document in store.recent("user-1", 3)] == \
+        ["question 2", "question 3", "question 4"]
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main
+from app.resources import Resources
+
+
+@pytest.fixture
+async def failed_chat(monkeypatch):
+    # The chat pipeline cannot be built (say NVIDIA is unreachable), the models load fine
+    resources = Resources()
+
+    def unreachable():
+        raise ConnectionError("NVIDIA is unreachable")
+
+    monkeypatch.setattr(resources, "_build_chat", unreachable)
+    monkeypatch.setattr(resources.models, "load_all", lambda: None)
+    await resources.warm_up()
+    return resources
+
+
+async def test_a_chat_failure_does_not_fail_the_models(failed_chat):
+    assert failed_chat.components["models"] == {"ready": True, "error": None}
+    assert not failed_chat.components["chat"]["ready"]
+    assert "unreachable" in failed_chat.components["chat"]["error"]
+    assert not failed_chat.ready
+    assert {"chat_warmup_seconds", "models_warmup_seconds", "warmup_seconds"} <= failed_chat.timings.keys()
+
+
+def test_readiness_is_reported_per_component(failed_chat, monkeypatch):
+    monkeypatch.setattr(app.main, "resources", failed_chat)
+    # Not entered as a context manager: the lifespan (and its warm-up) does not run
+    client = TestClient(app.main.app)
+
+    assert client.get("/api/ml_service/v1/ready/models").status_code == 200
+    assert client.get("/api/ml_service/v1/ready/chat").status_code == 503
+    assert client.get("/api/ml_service/v1/ready/unknown").status_code == 404
+
+    response = client.get("/api/ml_service/v1/ready")
+    assert response.status_code == 503
+    assert response.json()["components"]["models"]["ready"]
+
@@ -0,0 +1,26 @@
+import mongomock
+import numpy as np
+import pytest
+
+from app.services import semantic_cache
+from app.services.semantic_cache import bump_index_generation, create_semantic_cache
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().aarogyam
+
+
+@pytest.mark.parametrize("backend", ["memory", "mongodb"])
+def test_repopulating_the_index_clears_the_cache(db, backend, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_BACKEND", backend)
+    cache = create_semantic_cache(lambda: db)
+    cache.generation_check_interval = 0
+    embedding = np.ones(8)
+
+    cache.store(embedding, "reply", [])
+    assert cache.lookup(embedding)["reply"] == "reply"
+
+    # What ai_chat_populate.py does once it has repopulated the index
+    bump_index_generation(db)
+    assert cache.lookup(embedding) is None
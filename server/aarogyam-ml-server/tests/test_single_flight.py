@@ -0,0 +1,101 @@
+import asyncio
+
+from fakes import FakeLLM
+from app.services.single_flight import SingleFlight, StreamFanout
+
+
+class SlowCloseStream:
+    """
+    Yields numbers until closed; closing takes close_seconds, like shutting an HTTP response down.
+    """
+
+    def __init__(self, close_seconds=0.2):
+        self.close_seconds = close_seconds
+        self.closed = False
+        self.count = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0.01)
+        self.count += 1
+        return self.count
+
+    async def aclose(self):
+        await asyncio.sleep(self.close_seconds)
+        self.closed = True
+
+
+async def stream_call(flights, streams):
+    async def start():
+        streams.append(SlowCloseStream())
+        return StreamFanout(streams[-1])
+
+    return await flights.do("question", start, until=lambda fanout: fanout.finished,
+                            joinable=lambda fanout: not fanout.abandoned)
+
+
+async def test_a_single_call_runs_once_and_releases_its_key():
+    flights = SingleFlight()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        return "answer"
+
+    assert await flights.do("question", func) == "answer"
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 0}
+
+
+async def test_concurrent_calls_share_one_run():
+    flights = SingleFlight()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return object()
+
+    results = await asyncio.gather(*[flights.do("question", func) for _ in range(10)])
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats()["followers"] == 9
+
+
+async def test_an_abandoned_stream_is_not_joined_while_it_closes():
+    flights, streams = SingleFlight(), []
+
+    fanout = await stream_call(flights, streams)
+    deltas = fanout.subscribe()
+    assert await deltas.__anext__() == 1
+    # The only subscriber leaves: the stream is cancelled but takes a while to close
+    await deltas.aclose()
+    assert fanout.abandoned and not streams[0].closed
+
+    # The same question right away gets a stream of its own instead of ConnectionAbortedError
+    fanout = await stream_call(flights, streams)
+    deltas = fanout.subscribe()
+    assert [await deltas.__anext__() for _ in range(3)] == [1, 2, 3]
+    await deltas.aclose()
+
+    assert len(streams) == 2
+    await asyncio.sleep(0.3)
+    assert all(stream.closed for stream in streams)
+    assert flights.stats()["in_flight"] == 0
+
+
+async def test_concurrent_identical_streams_make_one_llm_call(make_chat):
+    llm = FakeLLM(first_token_ms=50, token_ms=1, reply_tokens=5)
+    chat = make_chat(llm=llm, coalesce=True)
+
+    async def turn():
+        deltas, _ = await chat.stream_chat_with_model("What is Ayurveda?")
+        return "".join([delta async for delta in deltas])
+
+    replies = await asyncio.gather(*[turn() for _ in range(10)])
+
+    assert llm.calls == 1
+    assert len(set(replies)) == 1 and replies[0]
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from wisdomlib_scraper import BREADCRUMB_CLASS, CHECKPOINT_FILE, HEADING_CLASS, NEXT_CLASS, WisdomLibScraper
+
+BOOK = "/hinduism/book/test-samhita"
+# doc4 is missing from the table of contents, only the "next" link of doc3 leads to it
+CHAPTERS = {f"{BOOK}/d/doc{i}.html": f"Chapter {i}" for i in range(1, 5)}
+TOC = [f"{BOOK}/d/doc{i}.html" for i in range(1, 4)]
+
+
+def chapter_html(path):
+    number = int(path.rsplit("doc", 1)[1][:-len(".html")])
+    next_path = f"{BOOK}/d/doc{number + 1}.html"
+    next_link = f'<a href="{next_path}">Next</a>' if next_path in CHAPTERS else ""
+    return (f'<html><body><nav class="{BREADCRUMB_CLASS}"><span>Sutrasthana</span><a href="{BOOK}">Contents</a></nav>'
+            f'<h1 class="{HEADING_CLASS}">{CHAPTERS[path]}</h1>'
+            f'<div id="scontent"><p>1. Text of {CHAPTERS[path].lower()}.</p></div>'
+            f'<div class="{NEXT_CLASS}">{next_link}</div></body></html>')
+
+
+class FixtureSite(ThreadingHTTPServer):
+    """
+    A small wisdomlib book served locally: a table of contents and four chapters, with ETags,
+    and failures injected per path.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.requests = []
+        # Path -> statuses answered (with Retry-After: 0) before the page itself
+        self.failures = {}
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        site = self.server
+        site.requests.append((self.path, self.headers.get("If-None-Match")))
+
+        failures = site.failures.get(self.path)
+        if failures:
+            self.send_response(failures.pop(0))
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        if self.path == BOOK:
+            body = "".join(f'<a href="{path}">{CHAPTERS[path]}</a>' for path in TOC)
+        elif self.path in CHAPTERS:
+            body = chapter_html(self.path)
+        else:
+            self.send_error(404)
+            return
+
+        etag = f'"{hash(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    site = FixtureSite()
+    thread = threading.Thread(target=site.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    site.shutdown()
+    site.server_close()
+
+
+def scraper(site, save_dir, **kwargs):
+    options = {"base_url": site.base_url, "rate": 0, "backoff": 0, "max_retries": 2}
+    options.update(kwargs)
+    return WisdomLibScraper(f"{BOOK}/d/doc1.html", str(save_dir), **options)
+
+
+def fetched(site):
+    return sorted(path for path, _ in site.requests)
+
+
+def test_the_crawl_follows_the_contents_and_the_next_links(site, tmp_path):
+    result = scraper(site, tmp_path).scrape()
+
+    assert result["pages"] == 4 and result["failed"] == 0
+    for title in CHAPTERS.values():
+        path = tmp_path / "Sutrasthana" / f"{title.replace(' ', '_').lower()}.md"
+        assert path.read_text(encoding="utf-8") == f"# {title}\n\nText of {title.lower()}."
+    # Every page once: the start page downloaded for discovery is the one saved
+    assert fetched(site) == sorted([BOOK, *CHAPTERS])
+
+    with open(os.path.join(tmp_path, CHECKPOINT_FILE), encoding="utf-8") as file:
+        checkpoint = json.load(file)
+    assert set(checkpoint["pages"]) == {site.base_url + path for path in CHAPTERS}
+
+
+def test_a_finished_crawl_resumes_without_a_request(site, tmp_path):
+    scraper(site, tmp_path).scrape()
+    site.requests.clear()
+
+    result = scraper(site, tmp_path).scrape()
+
+    assert result["pages"] == 4
+    assert site.requests == []
+
+
+def test_an_interrupted_crawl_fetches_only_the_missing_pages(site, tmp_path):
+    # doc3 keeps failing on the first run, so doc4 (linked from it) is not reached either
+    site.failures[f"{BOOK}/d/doc3.html"] = [503] * 3
+    first = scraper(site, tmp_path).scrape()
+    assert first["failed"] == 1
+    site.requests.clear()
+
+    second = scraper(site, tmp_path).scrape()
+
+    assert second["failed"] == 0
+    assert fetched(site) == [f"{BOOK}/d/doc3.html", f"{BOOK}/d/doc4.html"]
+
+
+def test_a_refresh_revalidates_the_saved_pages(site, tmp_path):
+    scraper(site, tmp_path).scrape()
+    site.requests.clear()
+
+    result = scraper(site, tmp_path, refresh=True).scrape()
+
+    assert result["pages"] == 4 and result["failed"] == 0
+    # The start page and the contents are read again to rediscover the book, the other chapters
+    # are conditional requests answered with 304
+    assert fetched(site) == sorted([BOOK, *CHAPTERS])
+    conditional = {path for path, etag in site.requests if etag}
+    assert conditional == set(CHAPTERS) - {f"{BOOK}/d/doc1.html"}
+
+
+def test_transient_errors_are_retried(site, tmp_path):
+    site.failures[f"{BOOK}/d/doc2.html"] = [503, 429]
+
+    # The backoff would wait a minute, the server's Retry-After: 0 is what is waited instead
+    started_at = time.monotonic()
+    result = scraper(site, tmp_path, backoff=60).scrape()
+
+    assert time.monotonic() - started_at < 10
+    assert result["failed"] == 0
+    assert fetched(site).count(f"{BOOK}/d/doc2.html") == 3
+
+
+def test_a_page_still_failing_after_its_retries_is_recorded(site, tmp_path):
+    site.failures[f"{BOOK}/d/doc2.html"] = [503] * 10
+    crawler = scraper(site, tmp_path)
+
+    result = crawler.scrape()
+
+    assert result["failed"] == 1
+    assert crawler.failed == {f"{site.base_url}{BOOK}/d/doc2.html": "HTTP 503"}
+    # max_retries=2: three attempts
+    assert fetched(site).count(f"{BOOK}/d/doc2.html") == 3
@@ -0,0 +1,27 @@
+import glob
+import json
+import os
+
+import pytest
+
+from wisdomlib_scraper import lxml_html, parse_page, to_markdown
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "wisdomlib")
+PAGES = sorted(os.path.basename(path)[:-len(".html")] for path in glob.glob(os.path.join(FIXTURES, "*.html")))
+PARSERS = ["html.parser", pytest.param("lxml", marks=pytest.mark.skipif(lxml_html is None, reason="no lxml"))]
+
+
+def read(name):
+    with open(os.path.join(FIXTURES, name), "rb") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("name", PAGES)
+def test_parse_page_reproduces_the_saved_markdown(name, parser):
+    # The golden files were written from the BeautifulSoup extraction, the reference for lxml
+    page = parse_page(read(f"{name}.html"), parser=parser)
+
+    assert to_markdown(page["heading"], page["content"]) == read(f"{name}.md").decode("utf-8")
+    assert {key: page[key] for key in ("heading", "parent_text", "next_href", "toc_href")} == \
+        json.loads(read(f"{name}.json"))